@@ -1,13 +1,12 @@
+import os
 import sys
 import pygame
 import chess
 
 # Import the Minimax class
-from Minimax_w_AB import find_best_move
-from Minimax_w_AB_2 import find_best_move_2
-
-# Initialize Pygame
-pygame.init()
+from Minimax_w_AB import expected_reply, find_best_move
+from Minimax_w_AB_2 import expected_reply as expected_reply_2, find_best_move_2
+from engine_thread import EngineThread
 
 # Board settings
 BOARD_SIZE = 512  # Size of the board in pixels
@@ -16,17 +15,24 @@ BOARD_COLOR_1 = (240, 224, 200)  # Light square color
 BOARD_COLOR_2 = (182, 113, 13)  # Dark square color
 HIGHLIGHT_COLOR = (255, 0, 0)
 
-# Load images
+# Posted by the engine thread when a search is finished
+ENGINE_MOVE_EVENT = pygame.USEREVENT + 1
+
+# Piece images, loaded by main() when the GUI starts (headless.py never imports this module)
+PIECE_IMAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pieceImages')
 piece_images = {}
-for color in ['w', 'b']:
-    for piece in ['P', 'N', 'B', 'R', 'Q', 'K']:
-        filename = f"pieceImages/{color}{piece}.svg"
-        piece_images[color+piece] = pygame.transform.scale(pygame.image.load(filename), (140, 140))
 
 # Initialize the board
 board = chess.Board()
 
 
+def load_piece_images():
+    for color in ['w', 'b']:
+        for piece in ['P', 'N', 'B', 'R', 'Q', 'K']:
+            filename = os.path.join(PIECE_IMAGE_DIR, f"{color}{piece}.svg")
+            piece_images[color+piece] = pygame.transform.scale(pygame.image.load(filename), (140, 140))
+
+
 def draw_board(screen):
     for rank in range(8):
         for file in range(8):
@@ -71,7 +77,24 @@ def draw_new_game_button(screen):
     screen.blit(text, text_rect)
 
 
+def draw_thinking_indicator(screen, depth, nodes, label="Thinking"):
+    font = pygame.font.SysFont(None, 24)
+    text = font.render("%s... depth %s, %d nodes" % (label, depth, nodes), True, (255, 255, 255))
+    text_rect = text.get_rect(topleft=(8, 8))
+    pygame.draw.rect(screen, (0, 0, 255), text_rect.inflate(8, 8), border_radius=5)
+    screen.blit(text, text_rect)
+
+
+# Called on the engine thread: hand the move to the pygame loop
+def post_engine_move(search_id, move):
+    pygame.event.post(pygame.event.Event(ENGINE_MOVE_EVENT, search_id=search_id, move=move))
+
+
 def main():
+    # Initialize Pygame
+    pygame.init()
+    load_piece_images()
+
     screen = pygame.display.set_mode((BOARD_SIZE, BOARD_SIZE))
     pygame.display.set_caption('AI Chess')
 
@@ -84,14 +107,38 @@ def main():
     new_game_button_rect = pygame.Rect(BOARD_SIZE // 2 - 75, BOARD_SIZE // 2 + 100, 150, 40)
     rendered = False
 
+    # Searches run on a background thread so the window keeps drawing while the bot thinks,
+    # and the bot keeps searching the expected replies (pondering) while the human thinks
+    engine = EngineThread(find_best_move, post_engine_move, predict=expected_reply)
+    engine_2 = EngineThread(find_best_move_2, post_engine_move, predict=expected_reply_2)
+    engine_search_id = None
+    active_engine = None
+    engine_settings = None
+
     while True:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                engine.cancel()
+                engine_2.cancel()
                 pygame.quit()
                 sys.exit()
+            elif event.type == ENGINE_MOVE_EVENT:
+                # Ignore results of searches that were cancelled in the meantime
+                if event.search_id == engine_search_id:
+                    engine_search_id = None
+
+                    if event.move:
+                        print("White played:" if board.turn == chess.WHITE else "Black played:", event.move)
+                        board.push(event.move)
+
+                        if not board.is_checkmate() and not board.is_stalemate():
+                            active_engine.start_ponder(board, **engine_settings)
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if game_over and new_game_button_rect.collidepoint(event.pos):
                     # Reset the game
+                    engine.cancel()
+                    engine_2.cancel()
+                    engine_search_id = None
                     board.set_fen(initial_board_fen)
                     game_over = False
                     rendered = False
@@ -102,7 +149,8 @@ def main():
                 square = chess.square(file, rank)
                 piece = board.piece_at(square)
 
-                if piece and piece.color == board.turn:
+                # The human can only move while no bot is thinking
+                if piece and piece.color == board.turn and engine_search_id is None:
                     selected_piece = piece
                     selected_piece_pos = square
                 else:
@@ -142,6 +190,12 @@ def main():
         highlight_king_square(screen, board)
         draw_pieces(screen, board)
 
+        for thread in (engine, engine_2):
+            if thread.is_thinking():
+                draw_thinking_indicator(screen, *thread.progress())
+            elif thread.is_pondering():
+                draw_thinking_indicator(screen, *thread.progress(), label="Pondering")
+
         # Check for game over conditions
         if game_over:
             game_over_message(screen, "Draw!" if board.is_stalemate() else "Black Wins!" if board.turn == chess.WHITE else "White Wins!")
@@ -175,40 +229,28 @@ def main():
         if game_over and (board.is_stalemate() or board.is_checkmate()) and not rendered:
             draw_new_game_button(screen)
 
-        if not board.is_checkmate() and not board.is_stalemate():
+        if not board.is_checkmate() and not board.is_stalemate() and engine_search_id is None:
             ######### BOT 1 ########
             if board.turn == chess.BLACK:
                 print('BLACK Bot 1 AI is thinking...')
-                move = find_best_move(board=board, depth=2)
-
-                if move:
-                    board.push(move)
-                    print("Black played:", move)
+                active_engine, engine_settings = engine, {'depth': 2}
+                engine_search_id = active_engine.start_search(board, **engine_settings)
 
             # if board.turn == chess.WHITE:
             #     print('WHITE Bot 1 AI is thinking...')
-            #     move = find_best_move(board=board, depth=3)
-            #
-            #     if move:
-            #         board.push(move)
-            #         print("White played:", move)
+            #     active_engine, engine_settings = engine, {'depth': 3}
+            #     engine_search_id = active_engine.start_search(board, **engine_settings)
 
             ######### BOT 2 ########
             # if board.turn == chess.BLACK:
             #     print('BLACK Bot 2 AI is thinking...')
-            #     move = find_best_move(board=board, depth=20)
-            #
-            #     if move:
-            #         board.push(move)
-            #         print("Black played:", move)
+            #     active_engine, engine_settings = engine, {'time_limit_ms': 3000}
+            #     engine_search_id = active_engine.start_search(board, **engine_settings)
 
             # if board.turn == chess.WHITE:
             #     print('WHITE Bot 2 AI is thinking...')
-            #     move = find_best_move_2(board=board, depth=20)
-            #
-            #     if move:
-            #         board.push(move)
-            #         print("White played:", move)
+            #     active_engine, engine_settings = engine_2, {'time_limit_ms': 3000}
+            #     engine_search_id = active_engine.start_search(board, **engine_settings)
 
 
 if __name__ == '__main__':
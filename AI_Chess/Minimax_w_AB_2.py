@@ -1,58 +1,59 @@
 import chess
 import math
 
+from compact_search import BOARD_COMPACT, CompactNegamax
+from endgame_tables import probe_root
+from eval_cache import eval_key, shared_eval_cache
+from evaluation import IncrementalBoard, bitboard_evaluate, search_board
+from move_ordering import MAX_PLY
+from negamax import SEARCH_NEGAMAX, Negamax, negamax_salt
+from opening_book import probe_book
+from quiescence import QUIESCENCE_CAPTURES, capture_quiescence
+from search_context import MAX_DEPTH, SearchContext, iterative_deepening
+from transposition_table import EXACT, LOWER, UPPER, ENGINE_2_KEY, MAXIMIZING_KEY, position_key, shared_table
+
 # Global constants for null move pruning
 NULL_MOVE_REDUCTION = 2  # Reduction depth for null move
 NULL_MOVE_MARGIN = 100  # Score margin for null move cutoff
 
-# Initialize hashmaps
-history_score = {}
-capture_moves = {}
-
-# Define number of top moves
-N = 3
-
 
 # Function for null-move pruning
-def null_move_pruning(board, depth, alpha, beta, maximizing_player):  # Add maximizing_player parameter
+def null_move_pruning(board, depth, alpha, beta, maximizing_player, context=None):  # Add maximizing_player parameter
     if depth <= 0:
-        return quiescence_search(board, alpha, beta, depth)
+        return quiescence_search(board, alpha, beta, context)
 
     # Null move cutoff condition
     if not board.is_check() and depth >= NULL_MOVE_REDUCTION:
         board.push(chess.Move.null())
-        null_move_score = -null_move_pruning(board, depth - NULL_MOVE_REDUCTION - 1, -beta, -beta + 1, maximizing_player)
+        null_move_score = -null_move_pruning(board, depth - NULL_MOVE_REDUCTION - 1, -beta, -beta + 1, maximizing_player, context)
         board.pop()
 
         if null_move_score >= beta:
+            if context is not None and context.stats is not None:
+                context.stats.null_move_cutoffs += 1
             return beta
 
-    return -minimax(board, depth - 1, -beta, -alpha, not maximizing_player)
+    return -minimax(board, depth - 1, -beta, -alpha, not maximizing_player, context)
 
 
-# Function to update killer moves
-def update_capture_moves(move, depth):
-    if depth not in capture_moves:
-        capture_moves[depth] = [move]
-    else:
-        if move not in capture_moves[depth]:
-            capture_moves[depth].insert(0, move)
-            # Keep only the top N killer moves (N is defined above)
-            capture_moves[depth] = capture_moves[depth][:N]
+# Function to update killer moves (the capture killer slots of the ply, see move_ordering.SearchTables)
+def update_capture_moves(board, move, context):
+    if context is not None:
+        context.tables.add_capture_killer(move, context.ply(board))
 
 
 # Function for history heuristic
-def prioritize_moves(board, maximizing_player):
+def prioritize_moves(board, maximizing_player, context=None):
     moves = list(board.legal_moves)
     # print('MOVES: ', moves)
-    moves.sort(key=lambda move: -get_move_score(board, move, maximizing_player))
+    moves.sort(key=lambda move: -get_move_score(board, move, maximizing_player, context))
 
     return moves
 
 
 # Function to get the score of a move based on history and evaluation score
-def get_move_score(board, move, maximizing_player):
-    score = history_score.get(move, 0)
+def get_move_score(board, move, maximizing_player, context=None):
+    score = context.tables.history_score(move) if context is not None else 0
 
     if maximizing_player:
         return score + evaluate_move(board, move)
@@ -67,10 +68,10 @@ def evaluate_move(board, move):
     board_copy.push(move)
 
     # Evaluate the new position after making the move
-    score_after_move = evaluate_board(board_copy)
+    score_after_move = static_evaluation(board_copy)
 
     # Evaluate the current position before making the move
-    score_before_move = evaluate_board(board)
+    score_before_move = static_evaluation(board)
 
     # Calculate the delta score (the difference between the scores after and before the move)
     delta_score = score_after_move - score_before_move
@@ -79,86 +80,282 @@ def evaluate_move(board, move):
 
 
 # Update history table during search
-def update_history(move, depth):
-    if move in history_score:
-        history_score[move] += depth * depth  # Adjust the increment based on depth
+def update_history(move, depth, context=None):
+    if context is not None:
+        context.tables.add_history(move, depth)
+
+
+# root_moves restricts the search to those moves, searched in the given order
+# stats (a SearchStats) is filled in with node counts, cut-offs and per-iteration results
+def find_best_move_2(board, depth=None, time_limit_ms=None, node_limit=None, tt=shared_table, context=None, root_moves=None,
+                     stats=None):
+    if context is None:
+        context = SearchContext(tt=tt, time_limit_ms=time_limit_ms, node_limit=node_limit, stats=stats)
     else:
-        history_score[move] = depth * depth
+        if stats is not None:
+            context.stats = stats
+        context.start()
+
+    if context.stats is not None:
+        context.stats.begin(context)
+
+    if context.tt is not None:
+        context.tt.new_search()
+
+    # A book move (SearchContext book=<polyglot file>) is played without searching
+    if probe_book(board, context, root_moves) is not None:
+        if context.stats is not None:
+            context.stats.finish(context)
+        return context.best_move
+
+    # So is the table move of a position in the endgame tables (SearchContext endgame_tables=<directory>)
+    if probe_root(board, context, root_moves) is not None:
+        if context.stats is not None:
+            context.stats.finish(context)
+        return context.best_move
+
+    # Incremental evaluation and attack mobility search on an IncrementalBoard copy
+    board = search_board(board, context)
+    context.root_ply = len(board.move_stack)
+
+    if context.search == SEARCH_NEGAMAX:
+        if context.board == BOARD_COMPACT and not board.chess960:
+            negamax = CompactNegamax(context, ENGINE_2_KEY, board, null_move=True)
+        else:
+            negamax = Negamax(context, static_evaluation, ENGINE_2_KEY, board.turn, null_move=True)
+
+        # Also at a fixed depth: the shallower iterations order the moves and seed the aspiration window
+        if depth is None and not context.has_limits():
+            raise ValueError("find_best_move_2 needs a depth, a time_limit_ms or a node_limit")
+        iterative_deepening(board, depth or MAX_DEPTH, context, negamax.search_root, root_moves)
+    elif not context.has_limits():
+        # Fixed depth search, as before
+        if depth is None:
+            raise ValueError("find_best_move_2 needs a depth, a time_limit_ms or a node_limit")
+
+        context.best_move, context.best_score, context.root_order = search_root(board, depth, context, root_moves)
+        context.completed_depth = depth
+        if context.stats is not None:
+            context.stats.record_iteration(depth, context, context.best_move, context.best_score)
+    else:
+        # Time or node budget: deepen one ply at a time
+        iterative_deepening(board, depth or MAX_DEPTH, context, search_root, root_moves)
+
+    if context.stats is not None:
+        context.stats.finish(context)
+
+    return context.best_move
+
+
+# Reply the last search expects on the board (the opponent to move after the engine's move),
+# taken from the transposition table; None when the table has no usable entry
+def expected_reply(board, tt=shared_table):
+    if tt is None:
+        return None
+
+    # The engine searched the position before: its side is the one not to move now
+    for salt in (negamax_salt(ENGINE_2_KEY, not board.turn), ENGINE_2_KEY):
+        move = tt.best_move(position_key(board, salt))
+        if move is not None and move in board.legal_moves:
+            return move
+    return None
 
 
-def find_best_move_2(board, depth):
-    global history_score
+# Line of best moves the last search left in the transposition table for the board
+def principal_variation(board, max_length=MAX_DEPTH, tt=shared_table):
+    if tt is None:
+        return []
+
+    moves = tt.principal_variation(board, negamax_salt(ENGINE_2_KEY, board.turn), max_length, toggle=0)
+    if not moves:
+        moves = tt.principal_variation(board, ENGINE_2_KEY ^ MAXIMIZING_KEY, max_length)
+    return moves
+
+
+# Search all root moves to the given depth; returns (best_move, best_score, moves ordered best first)
+def search_root(board, depth, context, root_moves=None):
     best_move = None
     max_eval = -math.inf
     alpha = -math.inf
     beta = math.inf
     maximizing_player = True
+    tt = context.tt
+
+    key = None
+    if tt is not None:
+        key = position_key(board, ENGINE_2_KEY ^ MAXIMIZING_KEY)
 
-    moves = prioritize_moves(board, maximizing_player)
+    # Later iterations reuse the order of the previous one instead of scoring every move again
+    if root_moves is None:
+        hash_move = tt.best_move(key) if tt is not None else None
+        if context.orderer is not None:
+            moves = order_moves(board, hash_move, context)
+        else:
+            moves = hash_move_first(prioritize_moves(board, maximizing_player, context), hash_move)
+    else:
+        moves = root_moves
 
+    scored_moves = []
     for move in moves:
         board.push(move)
-        eval_score = null_move_pruning(board, depth - 1, alpha, beta, maximizing_player)
-        update_history(move, depth)
+        eval_score = null_move_pruning(board, depth - 1, alpha, beta, maximizing_player, context)
+        update_history(move, depth, context)
         board.pop()
 
         if eval_score is None:
             eval_score = -math.inf
 
+        scored_moves.append((eval_score, move))
+
         if eval_score > max_eval:
             max_eval = eval_score
             best_move = move
 
         alpha = max(alpha, eval_score)
 
-    return best_move
+    if tt is not None and best_move is not None:
+        tt.store(key, depth, max_eval, EXACT, best_move)
+
+    # Stable sort keeps the previous order among equal scores
+    scored_moves.sort(key=lambda item: -item[0])
+
+    return best_move, max_eval, [move for _, move in scored_moves]
+
+
+# Move the transposition table move to the front of the list
+def hash_move_first(moves, hash_move):
+    if hash_move is not None and hash_move in moves:
+        moves.remove(hash_move)
+        moves.insert(0, hash_move)
+
+    return moves
+
+
+# Legal moves with the transposition table move searched first, then captures, killers and history
+def order_moves(board, hash_move, context=None):
+    if context is not None and context.timing:
+        moves = context.stats.timed_movegen(list, board.legal_moves)
+    else:
+        moves = list(board.legal_moves)
+
+    if context is not None and context.orderer is not None:
+        return context.orderer.order(board, moves, hash_move, context.ply(board))
+
+    return hash_move_first(moves, hash_move)
 
 
-def minimax(board, depth, alpha, beta, maximizing_player):
+# Killer and history updates for the move that caused a cut-off
+def record_cutoff(board, move, depth, context, move_index):
+    if context is None:
+        return
+    if context.orderer is not None:
+        context.orderer.record_cutoff(board, move, depth, context.ply(board))
+    if context.stats is not None:
+        context.stats.record_cutoff(move_index)
+
+
+def minimax(board, depth, alpha, beta, maximizing_player, context=None):
+
+    if context is not None:
+        context.count_node()
 
     if depth == 0:
-        return quiescence_search(board, alpha, beta, depth)
+        return quiescence_search(board, alpha, beta, context)
+
+    tt = context.tt if context is not None else None
+
+    # Probe the transposition table
+    key = None
+    hash_move = None
+    if tt is not None:
+        key = position_key(board, ENGINE_2_KEY ^ (MAXIMIZING_KEY if maximizing_player else 0))
+        entry = tt.probe(key)
+
+        if entry is not None:
+            tt_depth, tt_score, tt_flag, hash_move = entry
+
+            if tt_depth >= depth:
+                if tt_flag == EXACT:
+                    return tt_score
+                if tt_flag == LOWER and tt_score >= beta:
+                    return tt_score
+                if tt_flag == UPPER and tt_score <= alpha:
+                    return tt_score
+
+    alpha_orig = alpha
+    beta_orig = beta
+    best_move = None
 
     if maximizing_player:
         max_eval = -math.inf
 
-        for move in board.legal_moves:
+        for move_index, move in enumerate(order_moves(board, hash_move, context)):
             board.push(move)
-            eval_score = minimax(board, depth - 1, alpha, beta, False)
+            eval_score = minimax(board, depth - 1, alpha, beta, False, context)
             board.pop()
+
+            if eval_score > max_eval or best_move is None:
+                best_move = move
             max_eval = max(max_eval, eval_score)
             alpha = max(alpha, eval_score)
 
             if beta <= alpha:
+                record_cutoff(board, move, depth, context, move_index)
                 break  # Beta cut-off
 
             # Update capture moves if it's a capture
             if board.is_capture(move):
-                update_capture_moves(move, depth)
+                update_capture_moves(board, move, context)
 
-        return max_eval
+        result = max_eval
     else:
         min_eval = math.inf
 
-        for move in board.legal_moves:
+        for move_index, move in enumerate(order_moves(board, hash_move, context)):
             board.push(move)
-            eval_score = minimax(board, depth - 1, alpha, beta, True)
+            eval_score = minimax(board, depth - 1, alpha, beta, True, context)
             board.pop()
+
+            if eval_score < min_eval or best_move is None:
+                best_move = move
             min_eval = min(min_eval, eval_score)
             beta = min(beta, eval_score)
 
             if beta <= alpha:
+                record_cutoff(board, move, depth, context, move_index)
                 break  # Alpha cut-off
 
             # Update capture moves if it's a capture
             if board.is_capture(move):
-                update_capture_moves(move, depth)
+                update_capture_moves(board, move, context)
 
-        return min_eval
+        result = min_eval
+
+    # Store the result with the bound it represents
+    if tt is not None:
+        if result <= alpha_orig:
+            flag = UPPER
+        elif result >= beta_orig:
+            flag = LOWER
+        else:
+            flag = EXACT
+        tt.store(key, depth, result, flag, best_move)
+
+    return result
 
 
-def quiescence_search(board, alpha, beta, depth):
-    stand_pat = evaluate_board(board)
+def quiescence_search(board, alpha, beta, context=None):
+    if context is not None:
+        if context.quiescence == QUIESCENCE_CAPTURES:
+            return capture_quiescence(board, alpha, beta, context, static_evaluation)
+
+        context.count_node()
+        context.qnodes += 1
+
+    if context is not None and context.timing:
+        stand_pat = context.stats.timed_eval(static_evaluation, board)
+    else:
+        stand_pat = static_evaluation(board)
 
     if stand_pat >= beta:
         return beta
@@ -166,19 +363,15 @@ def quiescence_search(board, alpha, beta, depth):
     if alpha < stand_pat:
         alpha = stand_pat
 
-    # Consider only capturing moves and checks
-    if depth in capture_moves:
-        moves = capture_moves[depth]
-    else:
-        moves = [move for move in board.legal_moves if board.is_capture(move) or board.is_check()]
+    # Consider only capturing moves and checks, the capture killers of this ply first
+    moves = [move for move in board.legal_moves if board.is_capture(move) or board.is_check()]
+    if context is not None:
+        killers = context.tables.capture_killers[min(context.ply(board), MAX_PLY - 1)]
+        moves.sort(key=lambda move: move not in killers)
 
     for move in moves:
-
-        if move not in board.legal_moves:
-            continue
-
         board.push(move)
-        score = -quiescence_search(board, -beta, -alpha, depth)
+        score = -quiescence_search(board, -beta, -alpha, context)
         board.pop()
 
         if score >= beta:
@@ -188,11 +381,26 @@ def quiescence_search(board, alpha, beta, depth):
 
         # Update capture moves during quiescence search
         if board.is_capture(move):
-            update_capture_moves(move, depth)
+            update_capture_moves(board, move, context)
 
     return alpha
 
 
+# Incremental boards keep material and piece-square terms up to date themselves; other boards
+# use bitboard_evaluate, which returns exactly what evaluate_board does. Scores are cached per
+# position (see eval_cache.py).
+def static_evaluation(board):
+    key = eval_key(board, ENGINE_2_KEY)
+    score = shared_eval_cache.probe(key)
+    if score is None:
+        if isinstance(board, IncrementalBoard):
+            score = board.evaluate()
+        else:
+            score = bitboard_evaluate(board)
+        shared_eval_cache.store(key, score)
+    return score
+
+
 def evaluate_board(board):
 
     white_score = 0
@@ -0,0 +1,232 @@
+import argparse
+import collections
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import chess
+import chess.pgn
+
+from benchmark import parse_options
+from parallel_search import ENGINES, default_workers, engine_function
+from search_context import SearchContext
+from transposition_table import shared_table
+
+# Input formats
+FORMAT_FEN = 'fen'  # One FEN per line
+FORMAT_EPD = 'epd'  # EPD records; the id operation names the position
+FORMAT_PGN = 'pgn'  # Every position of every game, the final one included
+
+# Positions sent to a worker at once; fewer round trips per position on large inputs
+DEFAULT_CHUNK_SIZE = 16
+
+# Chunks in flight per worker. Results are written in input order, so this bounds how many
+# finished results wait for a slow position ahead of them.
+CHUNKS_PER_WORKER = 4
+
+PROGRESS_INTERVAL = 5.0  # Seconds between two progress lines
+
+
+def guess_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.pgn':
+        return FORMAT_PGN
+    if extension == '.epd':
+        return FORMAT_EPD
+    return FORMAT_FEN
+
+
+# Positions of the stream as (id, fen, error), one at a time; blank lines and # comments are
+# skipped. error is None, or the message of an EPD line that does not parse (fen is then the line).
+def read_positions(stream, input_format):
+    if input_format == FORMAT_PGN:
+        game_number = 0
+        while True:
+            game = chess.pgn.read_game(stream)
+            if game is None:
+                break
+            game_number += 1
+
+            board = game.board()
+            yield 'game %d ply 0' % game_number, board.fen(), None
+            for ply, move in enumerate(game.mainline_moves(), 1):
+                board.push(move)
+                yield 'game %d ply %d' % (game_number, ply), board.fen(), None
+        return
+
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        if input_format == FORMAT_EPD:
+            try:
+                board, operations = chess.Board.from_epd(line)
+            except ValueError as error:
+                yield str(line_number), line, str(error)
+                continue
+            yield str(operations.get('id', line_number)), board.fen(), None
+        else:
+            yield str(line_number), line, None
+
+
+# Runs in a worker: search every position of the chunk
+def analyse_chunk(engine, chunk, depth, time_limit_ms, options):
+    search = engine_function(engine)
+    results = []
+
+    for position_id, fen, error in chunk:
+        result = {'id': position_id, 'fen': fen}
+        if error is None:
+            try:
+                board = chess.Board(fen)
+            except ValueError as parse_error:
+                error = str(parse_error)
+            else:
+                # Positions no game reaches (two kings, the side not to move in check, ...)
+                status = board.status()
+                if status:
+                    error = 'invalid position: %s' % ', '.join(
+                        flag.name.lower() for flag in chess.Status if flag and flag & status)
+        if error is not None:
+            result['error'] = error
+            results.append(result)
+            continue
+
+        context = SearchContext(tt=shared_table, time_limit_ms=time_limit_ms, **options)
+        start = time.perf_counter()
+        move = search(board, depth=depth, context=context)
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+
+        score = context.best_score
+        if score is not None and math.isinf(score):
+            score = str(score)  # Not a valid JSON number
+
+        result.update({
+            'move': move.uci() if move else None,
+            'score': score,
+            'depth': context.completed_depth,
+            'nodes': context.nodes,
+            'time_ms': round(elapsed_ms, 3),
+        })
+        results.append(result)
+
+    return results
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Progress:
+
+    def __init__(self, out=sys.stderr, interval=PROGRESS_INTERVAL):
+        self.out = out
+        self.interval = interval
+        self.start = time.perf_counter()
+        self.last_report = self.start
+        self.positions = 0
+        self.nodes = 0
+
+    def update(self, results):
+        self.positions += len(results)
+        self.nodes += sum(result.get('nodes', 0) for result in results)
+
+        now = time.perf_counter()
+        if self.interval is not None and now - self.last_report >= self.interval:
+            self.last_report = now
+            self.report()
+
+    def report(self, final=False):
+        elapsed = time.perf_counter() - self.start
+        rate = self.positions / elapsed if elapsed > 0 else 0.0
+        nps = int(self.nodes / elapsed) if elapsed > 0 else 0
+        self.out.write("%s%d positions in %.1f s, %.1f positions/s, %d nodes/s\n" % (
+            'done: ' if final else '', self.positions, elapsed, rate, nps))
+        self.out.flush()
+
+
+# Analyse the positions on a process pool and write one JSON line per position, in input order.
+# At most workers * CHUNKS_PER_WORKER chunks are in flight, so memory use does not grow with the input.
+def analyse(positions, out, engine='minimax_w_ab', depth=None, time_limit_ms=None, workers=None,
+            chunk_size=DEFAULT_CHUNK_SIZE, options=None, progress=None):
+    workers = workers or default_workers()
+    options = options or {}
+    chunks = chunked(positions, chunk_size)
+
+    def write(results):
+        for result in results:
+            out.write(json.dumps(result) + "\n")
+        if progress is not None:
+            progress.update(results)
+
+    if workers == 1:
+        for chunk in chunks:
+            write(analyse_chunk(engine, chunk, depth, time_limit_ms, options))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = collections.deque()
+
+        for chunk in chunks:
+            pending.append(pool.submit(analyse_chunk, engine, chunk, depth, time_limit_ms, options))
+            if len(pending) >= workers * CHUNKS_PER_WORKER:
+                write(pending.popleft().result())
+
+        while pending:
+            write(pending.popleft().result())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse FEN, EPD or PGN positions and write JSONL results.")
+    parser.add_argument('input', nargs='?', default='-', help="input file, - for stdin (default)")
+    parser.add_argument('-o', '--output', default='-', help="JSONL output file, - for stdout (default)")
+    parser.add_argument('--format', choices=[FORMAT_FEN, FORMAT_EPD, FORMAT_PGN],
+                        help="input format (default: from the file extension, fen for stdin)")
+    parser.add_argument('--engine', default='minimax_w_ab', choices=sorted(ENGINES))
+    parser.add_argument('--depth', type=int, help="search depth per position (default 2 without a time limit)")
+    parser.add_argument('--time-limit', type=int, metavar='MS', help="time budget per position in milliseconds")
+    parser.add_argument('--workers', type=int, default=default_workers(), help="worker processes (default %(default)s)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="positions per worker task (default %(default)s)")
+    parser.add_argument('--option', action='append', metavar='KEY=VALUE',
+                        help="SearchContext option, e.g. mobility=legal (repeatable)")
+    parser.add_argument('--progress-interval', type=float, default=PROGRESS_INTERVAL, metavar='SECONDS',
+                        help="seconds between progress lines on stderr (default %(default)s)")
+    parser.add_argument('--quiet', action='store_true', help="no progress output")
+    args = parser.parse_args(argv)
+
+    depth = args.depth
+    if depth is None and args.time_limit is None:
+        depth = 2
+
+    input_format = args.format or (FORMAT_FEN if args.input == '-' else guess_format(args.input))
+    source = sys.stdin if args.input == '-' else open(args.input)
+    out = sys.stdout if args.output == '-' else open(args.output, 'w')
+    progress = None if args.quiet else Progress(interval=args.progress_interval)
+
+    try:
+        analyse(read_positions(source, input_format), out, args.engine, depth, args.time_limit, args.workers,
+                args.chunk_size, parse_options(args.option), progress)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+
+    if progress is not None:
+        progress.report(final=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,351 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import chess
+
+from eval_cache import shared_eval_cache
+from node_cache import shared_node_cache
+from parallel_search import ENGINES, engine_function
+from search_context import SearchContext
+from search_stats import SearchStats
+from transposition_table import TranspositionTable
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+POSITIONS_FILE = os.path.join(BENCHMARK_DIR, 'benchmark_positions.txt')
+BASELINE_FILE = os.path.join(BENCHMARK_DIR, 'benchmark_baseline.json')
+
+# Fixed depth of every engine
+DEFAULT_DEPTHS = {
+    'minimax_w_ab': 2,
+    'minimax_w_ab_2': 3,
+}
+
+# Relative slowdown (in percent) reported as a regression
+DEFAULT_THRESHOLD = 10.0
+
+# Transposition table size of every search; a fresh table per position keeps runs reproducible
+BENCHMARK_TT_MB = 16
+
+# Recorded in the metadata: every position starts on empty shared caches (see clear_shared_caches).
+# Baselines without it ran on warm caches and their times depend on the order of the run.
+BENCHMARK_CACHES = 'cold'
+
+# Cold start: a fresh interpreter imports headless.py and searches the start position to depth 1.
+# The median wall time of the process must stay under the budget, and pygame must not be loaded.
+COLD_START_BUDGET_MS = 1000.0
+COLD_START_RUNS = 5
+COLD_START_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import chess, headless
+imported = time.perf_counter()
+headless.find_best_move(chess.Board(), depth=1)
+searched = time.perf_counter()
+print(json.dumps({'import_ms': (imported - start) * 1000.0, 'search_ms': (searched - imported) * 1000.0,
+                  'pygame': 'pygame' in sys.modules}))
+"""
+
+
+# Evaluation microbenchmark: every position and every position one move later, evaluated this
+# many times by each evaluator
+EVAL_BENCHMARK_ROUNDS = 20
+
+
+# Lines of "id;category;fen", # starts a comment
+def load_positions(path=POSITIONS_FILE):
+    positions = []
+    with open(path) as handle:
+        for line in handle:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            position_id, category, fen = line.split(';', 2)
+            positions.append((position_id, category, fen))
+    return positions
+
+
+# "key=value" pairs for the SearchContext; None, booleans and integers are converted
+def parse_options(pairs):
+    options = {}
+    for pair in pairs or []:
+        key, _, value = pair.partition('=')
+        if value == 'None':
+            value = None
+        elif value in ('True', 'False'):
+            value = value == 'True'
+        elif value.lstrip('-').isdigit():
+            value = int(value)
+        options[key] = value
+    return options
+
+
+# The process-wide caches every search shares, emptied before each position like the table
+def clear_shared_caches():
+    shared_eval_cache.clear()
+    shared_node_cache.clear()
+
+
+def run_position(engine, fen, depth, options):
+    search = engine_function(engine)
+    board = chess.Board(fen)
+    clear_shared_caches()
+    stats = SearchStats()
+    context = SearchContext(tt=TranspositionTable(BENCHMARK_TT_MB), stats=stats, **options)
+
+    start = time.perf_counter()
+    move = search(board, depth=depth, context=context)
+    elapsed_ms = (time.perf_counter() - start) * 1000.0
+
+    return {
+        'move': move.uci() if move else None,
+        'nodes': stats.nodes,
+        'qnodes': stats.qnodes,
+        'time_ms': round(elapsed_ms, 3),
+        'nps': int(stats.nodes * 1000 / elapsed_ms) if elapsed_ms > 0 else 0,
+        'pruning': stats.pruning(),
+    }
+
+
+def run_benchmark(engines, depths, positions, options, out=sys.stdout):
+    results = {}
+
+    for engine in engines:
+        depth = depths[engine]
+        results[engine] = {}
+        total_nodes = 0
+        total_ms = 0.0
+        pruning = {}
+
+        out.write("%s (depth %d)\n" % (engine, depth))
+        out.write("  %-12s %-11s %-7s %10s %10s %9s\n" % ('position', 'category', 'move', 'nodes', 'time ms', 'nps'))
+
+        for position_id, category, fen in positions:
+            result = run_position(engine, fen, depth, options)
+            result['category'] = category
+            results[engine][position_id] = result
+            total_nodes += result['nodes']
+            total_ms += result['time_ms']
+            for name, count in result['pruning'].items():
+                pruning[name] = pruning.get(name, 0) + count
+
+            out.write("  %-12s %-11s %-7s %10d %10.1f %9d\n" % (
+                position_id, category, result['move'], result['nodes'], result['time_ms'], result['nps']))
+            out.flush()
+
+        total_nps = int(total_nodes * 1000 / total_ms) if total_ms > 0 else 0
+        out.write("  %-12s %-11s %-7s %10d %10.1f %9d\n" % ('total', '', '', total_nodes, total_ms, total_nps))
+        out.write("  %s\n\n" % '  '.join('%s %d' % item for item in sorted(pruning.items())))
+
+    return results
+
+
+def metadata(depths, options):
+    return {
+        'python': platform.python_version(),
+        'python_chess': chess.__version__,
+        'machine': platform.machine(),
+        'depths': depths,
+        'options': options,
+        'caches': BENCHMARK_CACHES,
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def percent_change(old, new):
+    if old == 0:
+        return 0.0 if new == 0 else float('inf')
+    return (new - old) * 100.0 / old
+
+
+# Compare a run with a baseline; returns the list of regressions over the threshold
+def compare(baseline, results, threshold, out=sys.stdout):
+    regressions = []
+
+    for engine, positions in results.items():
+        old_positions = baseline['results'].get(engine)
+        if old_positions is None:
+            out.write("%s: not in baseline\n" % engine)
+            continue
+
+        out.write("%s against baseline\n" % engine)
+        old_total_ms = 0.0
+        new_total_ms = 0.0
+
+        for position_id, new in positions.items():
+            old = old_positions.get(position_id)
+            if old is None:
+                out.write("  %-12s not in baseline\n" % position_id)
+                continue
+
+            old_total_ms += old['time_ms']
+            new_total_ms += new['time_ms']
+            time_change = percent_change(old['time_ms'], new['time_ms'])
+            nodes_change = percent_change(old['nodes'], new['nodes'])
+
+            flags = []
+            if time_change > threshold:
+                flags.append('SLOWER')
+            if nodes_change > threshold:
+                flags.append('MORE NODES')
+            if old['move'] != new['move']:
+                flags.append('move %s -> %s' % (old['move'], new['move']))
+
+            if 'SLOWER' in flags or 'MORE NODES' in flags:
+                regressions.append((engine, position_id, time_change, nodes_change))
+
+            line = "  %-12s time %+7.1f%%  nodes %+7.1f%%  %s" % (position_id, time_change, nodes_change, ' '.join(flags))
+            out.write(line.rstrip() + "\n")
+
+        total_change = percent_change(old_total_ms, new_total_ms)
+        if total_change > threshold:
+            regressions.append((engine, 'total', total_change, 0.0))
+        out.write("  %-12s time %+7.1f%%\n\n" % ('total', total_change))
+
+    return regressions
+
+
+def cold_start(runs=COLD_START_RUNS, out=sys.stdout):
+    samples = []
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', COLD_START_SCRIPT], cwd=BENCHMARK_DIR, check=True,
+                                stdout=subprocess.PIPE, universal_newlines=True).stdout
+        sample = json.loads(output.strip().splitlines()[-1])
+        sample['process_ms'] = (time.perf_counter() - start) * 1000.0
+        samples.append(sample)
+
+        out.write("  process %7.1f ms  import %7.1f ms  first search %7.1f ms%s\n" % (
+            sample['process_ms'], sample['import_ms'], sample['search_ms'], '  (pygame loaded)' if sample['pygame'] else ''))
+
+    return samples
+
+
+# Evaluations per second of evaluate_board and bitboard_evaluate. Returns the number of boards
+# where bitboard_evaluate differs from the evaluate_board of either engine.
+def eval_benchmark(positions, rounds=EVAL_BENCHMARK_ROUNDS, out=sys.stdout):
+    import Minimax_w_AB
+    import Minimax_w_AB_2
+    from evaluation import bitboard_evaluate
+
+    boards = []
+    for _, _, fen in positions:
+        board = chess.Board(fen)
+        boards.append(board)
+        for move in board.legal_moves:
+            child = board.copy(stack=False)
+            child.push(move)
+            boards.append(child)
+
+    mismatches = 0
+    for board in boards:
+        expected = Minimax_w_AB.evaluate_board(board)
+        if bitboard_evaluate(board) != expected or Minimax_w_AB_2.evaluate_board(board) != expected:
+            mismatches += 1
+            out.write("  mismatch: %s\n" % board.fen())
+
+    out.write("%d boards, %d rounds, %d mismatches\n" % (len(boards), rounds, mismatches))
+    evaluators = (('evaluate_board', Minimax_w_AB.evaluate_board), ('bitboard_evaluate', bitboard_evaluate))
+    rates = {}
+    for name, evaluate in evaluators:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for board in boards:
+                evaluate(board)
+        elapsed = time.perf_counter() - start
+        rates[name] = len(boards) * rounds / elapsed
+        out.write("  %-18s %10.0f evaluations/s\n" % (name, rates[name]))
+
+    out.write("  speedup %.2fx\n" % (rates['bitboard_evaluate'] / rates['evaluate_board']))
+    return mismatches
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark find_best_move and find_best_move_2 on fixed positions.")
+    parser.add_argument('--engine', action='append', choices=sorted(ENGINES),
+                        help="engine to run (repeatable, default: both)")
+    parser.add_argument('--depth', type=int, help="depth for every engine")
+    parser.add_argument('--depth-1', type=int, default=DEFAULT_DEPTHS['minimax_w_ab'], help="depth of Minimax_w_AB")
+    parser.add_argument('--depth-2', type=int, default=DEFAULT_DEPTHS['minimax_w_ab_2'], help="depth of Minimax_w_AB_2")
+    parser.add_argument('--positions', default=POSITIONS_FILE, help="positions file (id;category;fen)")
+    parser.add_argument('--category', action='append', help="only positions of this category (repeatable)")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="baseline JSON file")
+    parser.add_argument('--save', action='store_true', help="write the results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="regression threshold in percent (default %(default)s)")
+    parser.add_argument('--option', action='append', metavar='KEY=VALUE',
+                        help="SearchContext option, e.g. mobility=legal (repeatable)")
+    parser.add_argument('--cold-start', action='store_true',
+                        help="only measure the cold start of the headless engine against --cold-start-budget")
+    parser.add_argument('--cold-start-budget', type=float, default=COLD_START_BUDGET_MS, metavar='MS',
+                        help="cold start budget in milliseconds (default %(default)s)")
+    parser.add_argument('--eval', action='store_true',
+                        help="only compare evaluate_board with bitboard_evaluate and measure evaluations per second")
+    args = parser.parse_args(argv)
+
+    if args.eval:
+        return 1 if eval_benchmark(load_positions(args.positions)) else 0
+
+    if args.cold_start:
+        print("Cold start of headless.py (%d runs)" % COLD_START_RUNS)
+        samples = cold_start()
+        process_ms = median([sample['process_ms'] for sample in samples])
+        print("  median  %7.1f ms, budget %.1f ms" % (process_ms, args.cold_start_budget))
+
+        if any(sample['pygame'] for sample in samples):
+            print("headless.py imported pygame")
+            return 1
+        if process_ms > args.cold_start_budget:
+            print("Cold start over budget")
+            return 1
+        return 0
+
+    engines = args.engine or sorted(ENGINES)
+    depths = {'minimax_w_ab': args.depth or args.depth_1, 'minimax_w_ab_2': args.depth or args.depth_2}
+    options = parse_options(args.option)
+
+    positions = load_positions(args.positions)
+    if args.category:
+        positions = [position for position in positions if position[1] in args.category]
+
+    results = run_benchmark(engines, depths, positions, options)
+    run = {'meta': metadata(depths, options), 'results': results}
+
+    # Without a baseline (or with --save) this run becomes the baseline
+    if args.save or not os.path.exists(args.baseline):
+        with open(args.baseline, 'w') as handle:
+            json.dump(run, handle, indent=2, sort_keys=True)
+        print("Baseline written to %s" % args.baseline)
+        return 0
+
+    with open(args.baseline) as handle:
+        baseline = json.load(handle)
+
+    if baseline['meta'].get('depths') != depths or baseline['meta'].get('options') != options:
+        print("Warning: baseline was recorded with depths %s and options %s" % (
+            baseline['meta'].get('depths'), baseline['meta'].get('options')))
+    if baseline['meta'].get('caches') != BENCHMARK_CACHES:
+        print("Warning: baseline was recorded on warm caches; record a new one with --save")
+
+    regressions = compare(baseline, results, args.threshold)
+    if regressions:
+        print("%d regression(s) over %.1f%%" % (len(regressions), args.threshold))
+        return 1
+
+    print("No regressions over %.1f%%" % args.threshold)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
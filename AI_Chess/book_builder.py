@@ -0,0 +1,121 @@
+import argparse
+import struct
+import sys
+
+import chess
+import chess.pgn
+import chess.polyglot
+
+from opening_book import open_book
+
+# Polyglot entry: key, move, weight, learn; big endian, sorted by key
+ENTRY_STRUCT = struct.Struct('>QHHI')
+MAX_WEIGHT = 0xFFFF
+
+DEFAULT_BOOK_PLIES = 20  # Only positions this close to the start of a game
+DEFAULT_MIN_GAMES = 2  # Moves played in fewer games are left out
+RESULT_POINTS = {'1-0': (2, 0), '0-1': (0, 2), '1/2-1/2': (1, 1)}  # Weight per game for (White, Black)
+
+
+# Polyglot encoding of a move: castling is stored as the king taking its own rook
+def encode_move(board, move):
+    to_square = move.to_square
+    if board.is_castling(move):
+        rook_file = 7 if board.is_kingside_castling(move) else 0
+        to_square = chess.square(rook_file, chess.square_rank(move.from_square))
+
+    promotion = move.promotion - 1 if move.promotion else 0
+    return to_square | (move.from_square << 6) | (promotion << 12)
+
+
+# Count the moves of the first max_plies plies of every game in the PGN files. Every game adds
+# its result points (2 for a win, 1 for a draw) to the weight of the moves of the side that scored
+# them. Returns {(key, raw_move): [games, points]}.
+def collect_moves(paths, max_plies=DEFAULT_BOOK_PLIES):
+    moves = {}
+
+    for path in paths:
+        with open(path) as handle:
+            while True:
+                game = chess.pgn.read_game(handle)
+                if game is None:
+                    break
+
+                board = game.board()
+                if board.chess960 or game.errors:
+                    continue
+                points = RESULT_POINTS.get(game.headers.get('Result'), (0, 0))
+
+                for ply, move in enumerate(game.mainline_moves()):
+                    if ply >= max_plies:
+                        break
+
+                    entry = moves.setdefault((chess.polyglot.zobrist_hash(board), encode_move(board, move)), [0, 0])
+                    entry[0] += 1
+                    entry[1] += points[0] if board.turn == chess.WHITE else points[1]
+                    board.push(move)
+
+    return moves
+
+
+# Write a polyglot book from the PGN files; returns the number of entries written. Weights are
+# scaled down per position when the points do not fit in 16 bits, and moves without points
+# (only ever lost) are left out.
+def build_book(paths, output, max_plies=DEFAULT_BOOK_PLIES, min_games=DEFAULT_MIN_GAMES):
+    by_key = {}
+    for (key, raw_move), (games, points) in collect_moves(paths, max_plies).items():
+        if games >= min_games and points > 0:
+            by_key.setdefault(key, []).append((points, raw_move))
+
+    count = 0
+    with open(output, 'wb') as handle:
+        for key in sorted(by_key):
+            entries = sorted(by_key[key], key=lambda entry: (-entry[0], entry[1]))
+            scale = max(1, -(-entries[0][0] // MAX_WEIGHT))
+            for points, raw_move in entries:
+                handle.write(ENTRY_STRUCT.pack(key, raw_move, max(1, points // scale), 0))
+                count += 1
+
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a polyglot opening book from PGN files, or probe one.")
+    subparsers = parser.add_subparsers(dest='command')
+
+    build = subparsers.add_parser('build', help="build a book from PGN files")
+    build.add_argument('pgn', nargs='+', help="PGN files")
+    build.add_argument('-o', '--output', required=True, help="book file to write (.bin)")
+    build.add_argument('--plies', type=int, default=DEFAULT_BOOK_PLIES,
+                       help="plies of every game to include (default %(default)s)")
+    build.add_argument('--min-games', type=int, default=DEFAULT_MIN_GAMES,
+                       help="games a move must appear in (default %(default)s)")
+
+    probe = subparsers.add_parser('probe', help="list the book moves of a position")
+    probe.add_argument('book', help="book file (.bin)")
+    probe.add_argument('fen', nargs='?', default=chess.STARTING_FEN, help="position (default: start position)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        count = build_book(args.pgn, args.output, args.plies, args.min_games)
+        print("%d entries written to %s" % (count, args.output))
+        return 0
+
+    if args.command == 'probe':
+        board = chess.Board(args.fen)
+        entries = list(open_book(args.book).find_all(board))
+        total = sum(entry.weight for entry in entries)
+        for entry in entries:
+            print("%-6s %-7s %6d %5.1f%%" % (entry.move.uci(), board.san(entry.move), entry.weight,
+                                            100.0 * entry.weight / total))
+        if not entries:
+            print("Position not in the book")
+        return 0
+
+    parser.print_help()
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,668 @@
+import chess
+import chess.polyglot
+
+# Moves are plain ints in the layout of transposition_table.pack_move:
+# from_square | to_square << 6 | promotion << 12. 0 is the null move.
+NULL_MOVE = 0
+
+# Promotions in the order python-chess generates them
+PROMOTION_TYPES = (chess.QUEEN, chess.ROOK, chess.BISHOP, chess.KNIGHT)
+
+BB_SQUARES = chess.BB_SQUARES
+BB_ALL = chess.BB_ALL
+BB_KNIGHT_ATTACKS = chess.BB_KNIGHT_ATTACKS
+BB_KING_ATTACKS = chess.BB_KING_ATTACKS
+BB_PAWN_ATTACKS = chess.BB_PAWN_ATTACKS
+BB_DIAG_ATTACKS = chess.BB_DIAG_ATTACKS
+BB_DIAG_MASKS = chess.BB_DIAG_MASKS
+BB_RANK_ATTACKS = chess.BB_RANK_ATTACKS
+BB_RANK_MASKS = chess.BB_RANK_MASKS
+BB_FILE_ATTACKS = chess.BB_FILE_ATTACKS
+BB_FILE_MASKS = chess.BB_FILE_MASKS
+BB_RAYS = chess.BB_RAYS
+BB_BETWEEN = [[chess.between(a, b) for b in chess.SQUARES] for a in chess.SQUARES]  # Squares strictly between
+BB_BACKRANKS = chess.BB_RANK_8, chess.BB_RANK_1  # Indexed by colour
+BB_EP_RANKS = chess.BB_RANK_4, chess.BB_RANK_5  # Ranks a pawn captures en passant from, by colour
+
+PAWN = chess.PAWN
+KNIGHT = chess.KNIGHT
+BISHOP = chess.BISHOP
+ROOK = chess.ROOK
+QUEEN = chess.QUEEN
+KING = chess.KING
+
+# Polyglot Zobrist keys (the keys of chess.polyglot.zobrist_hash), so positions hash the same
+# as on a chess.Board and share transposition table entries
+ZOBRIST = chess.polyglot.POLYGLOT_RANDOM_ARRAY
+ZOBRIST_CASTLING = ((chess.H1, ZOBRIST[768]), (chess.A1, ZOBRIST[769]), (chess.H8, ZOBRIST[770]), (chess.A8, ZOBRIST[771]))
+ZOBRIST_EP = ZOBRIST[772:780]
+ZOBRIST_TURN = ZOBRIST[780]
+
+
+# Piece code of the mailbox: piece_type | colour << 3, 0 for an empty square
+def piece_code(piece_type, color):
+    return piece_type | (int(color) << 3)
+
+
+# ZOBRIST_PIECES[code][square]
+ZOBRIST_PIECES = [[0] * 64 for _ in range(16)]
+for _color in chess.COLORS:
+    for _piece_type in chess.PIECE_TYPES:
+        ZOBRIST_PIECES[piece_code(_piece_type, _color)] = [
+            ZOBRIST[64 * ((_piece_type - 1) * 2 + int(_color)) + _square] for _square in chess.SQUARES]
+
+
+def castling_key(castling_rights):
+    key = 0
+    for square, value in ZOBRIST_CASTLING:
+        if castling_rights & BB_SQUARES[square]:
+            key ^= value
+    return key
+
+
+# Search board with plain int bitboards, a mailbox and int moves. push() and pop() update the
+# bitboards, the mailbox and the Zobrist key in place, and generate_legal_moves() yields the same
+# moves in the same order as chess.Board.generate_legal_moves(), so a search on either board
+# visits the same tree. Standard chess only; converted from and to chess.Board at the search
+# boundary (from_board / to_board).
+class CompactBoard:
+
+    __slots__ = ('pieces', 'occupied_co', 'mailbox', 'turn', 'castling_rights', 'ep_square', 'ep_key',
+                 'halfmove_clock', 'fullmove_number', 'key', 'move_stack', '_stack')
+
+    def __init__(self):
+        self.pieces = [0] * 7  # Indexed by piece type
+        self.occupied_co = [0, 0]  # Indexed by colour
+        self.mailbox = [0] * 64
+        self.turn = chess.WHITE
+        self.castling_rights = 0
+        self.ep_square = None
+        self.ep_key = 0  # En passant part of the key
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
+        self.key = 0
+        self.move_stack = []
+        self._stack = []
+
+    @classmethod
+    def from_board(cls, board):
+        if board.chess960:
+            raise ValueError("CompactBoard does not support Chess960")
+
+        compact = cls()
+        for square, piece in board.piece_map().items():
+            compact.put(square, piece.piece_type, piece.color)
+
+        compact.turn = board.turn
+        compact.castling_rights = board.clean_castling_rights()
+        compact.ep_square = board.ep_square
+        compact.halfmove_clock = board.halfmove_clock
+        compact.fullmove_number = board.fullmove_number
+
+        compact.ep_key = compact.ep_key_of(board.ep_square, board.turn)
+        compact.key ^= castling_key(compact.castling_rights) ^ compact.ep_key
+        if compact.turn == chess.WHITE:
+            compact.key ^= ZOBRIST_TURN
+        return compact
+
+    @classmethod
+    def from_fen(cls, fen):
+        return cls.from_board(chess.Board(fen))
+
+    # The position as a chess.Board (without the move stack)
+    def to_board(self):
+        board = chess.Board(None)
+        for square in chess.SQUARES:
+            code = self.mailbox[square]
+            if code:
+                board.set_piece_at(square, chess.Piece(code & 7, bool(code >> 3)))
+
+        board.turn = self.turn
+        board.castling_rights = self.castling_rights
+        board.ep_square = self.ep_square
+        board.halfmove_clock = self.halfmove_clock
+        board.fullmove_number = self.fullmove_number
+        return board
+
+    def fen(self):
+        return self.to_board().fen()
+
+    def copy(self):
+        board = CompactBoard()
+        board.pieces = self.pieces[:]
+        board.occupied_co = self.occupied_co[:]
+        board.mailbox = self.mailbox[:]
+        board.turn = self.turn
+        board.castling_rights = self.castling_rights
+        board.ep_square = self.ep_square
+        board.ep_key = self.ep_key
+        board.halfmove_clock = self.halfmove_clock
+        board.fullmove_number = self.fullmove_number
+        board.key = self.key
+        board.move_stack = self.move_stack[:]
+        board._stack = self._stack[:]
+        return board
+
+    def put(self, square, piece_type, color):
+        code = piece_code(piece_type, color)
+        self.pieces[piece_type] |= BB_SQUARES[square]
+        self.occupied_co[color] |= BB_SQUARES[square]
+        self.mailbox[square] = code
+        self.key ^= ZOBRIST_PIECES[code][square]
+
+    # Key of an en passant square, only when a pawn of the side to move stands next to the pawn
+    # that just moved (as chess.polyglot hashes it)
+    def ep_key_of(self, ep_square, turn):
+        if not ep_square:
+            return 0
+        capturers = BB_PAWN_ATTACKS[not turn][ep_square] & BB_EP_RANKS[turn]
+        if capturers & self.pieces[PAWN] & self.occupied_co[turn]:
+            return ZOBRIST_EP[ep_square & 7]
+        return 0
+
+    # Attribute names of chess.Board, for the evaluation and ordering helpers that read bitboards
+    @property
+    def pawns(self):
+        return self.pieces[PAWN]
+
+    @property
+    def knights(self):
+        return self.pieces[KNIGHT]
+
+    @property
+    def bishops(self):
+        return self.pieces[BISHOP]
+
+    @property
+    def rooks(self):
+        return self.pieces[ROOK]
+
+    @property
+    def queens(self):
+        return self.pieces[QUEEN]
+
+    @property
+    def kings(self):
+        return self.pieces[KING]
+
+    @property
+    def occupied(self):
+        return self.occupied_co[0] | self.occupied_co[1]
+
+    def pieces_mask(self, piece_type, color):
+        return self.pieces[piece_type] & self.occupied_co[color]
+
+    def piece_type_at(self, square):
+        return self.mailbox[square] & 7
+
+    def king(self, color):
+        king = self.pieces[KING] & self.occupied_co[color]
+        return king.bit_length() - 1 if king else None
+
+    def attackers_mask(self, color, square, occupied):
+        pieces = self.pieces
+        queens_and_rooks = pieces[QUEEN] | pieces[ROOK]
+        queens_and_bishops = pieces[QUEEN] | pieces[BISHOP]
+
+        attackers = (
+            (BB_KING_ATTACKS[square] & pieces[KING])
+            | (BB_KNIGHT_ATTACKS[square] & pieces[KNIGHT])
+            | (BB_RANK_ATTACKS[square][BB_RANK_MASKS[square] & occupied] & queens_and_rooks)
+            | (BB_FILE_ATTACKS[square][BB_FILE_MASKS[square] & occupied] & queens_and_rooks)
+            | (BB_DIAG_ATTACKS[square][BB_DIAG_MASKS[square] & occupied] & queens_and_bishops)
+            | (BB_PAWN_ATTACKS[not color][square] & pieces[PAWN]))
+
+        return attackers & self.occupied_co[color]
+
+    def checkers_mask(self):
+        king = self.king(self.turn)
+        if king is None:
+            return 0
+        return self.attackers_mask(not self.turn, king, self.occupied_co[0] | self.occupied_co[1])
+
+    def is_check(self):
+        return bool(self.checkers_mask())
+
+    def is_capture(self, move):
+        to_square = (move >> 6) & 63
+        if self.mailbox[to_square]:
+            return True
+        return to_square == self.ep_square and self.is_en_passant(move)
+
+    def is_en_passant(self, move):
+        from_square = move & 63
+        to_square = (move >> 6) & 63
+        return (to_square == self.ep_square and self.mailbox[from_square] & 7 == PAWN
+                and (to_square - from_square) & 7 != 0 and not self.mailbox[to_square])
+
+    def gives_check(self, move):
+        self.push(move)
+        try:
+            return self.is_check()
+        finally:
+            self.pop()
+
+    def push(self, move):
+        turn = self.turn
+        key = self.key ^ self.ep_key ^ ZOBRIST_TURN
+        self._stack.append((move, self.mailbox[(move >> 6) & 63], self.castling_rights, self.ep_square, self.ep_key,
+                            self.halfmove_clock, self.key))
+        self.move_stack.append(move)
+
+        ep_square = self.ep_square
+        self.ep_square = None
+        self.ep_key = 0
+        self.halfmove_clock += 1
+        if turn == chess.BLACK:
+            self.fullmove_number += 1
+        self.turn = not turn
+
+        if not move:
+            self.key = key
+            return
+
+        mailbox = self.mailbox
+        pieces = self.pieces
+        occupied_co = self.occupied_co
+        from_square = move & 63
+        to_square = (move >> 6) & 63
+        promotion = move >> 12
+        from_bb = BB_SQUARES[from_square]
+        to_bb = BB_SQUARES[to_square]
+        code = mailbox[from_square]
+        piece_type = code & 7
+        captured = mailbox[to_square]
+
+        rights = self.castling_rights
+        if rights:
+            new_rights = rights & ~from_bb & ~to_bb
+            if piece_type == KING:
+                new_rights &= ~BB_BACKRANKS[turn]
+            if new_rights != rights:
+                key ^= castling_key(rights) ^ castling_key(new_rights)
+                self.castling_rights = new_rights
+
+        if captured:
+            self.halfmove_clock = 0
+            pieces[captured & 7] ^= to_bb
+            occupied_co[not turn] ^= to_bb
+            key ^= ZOBRIST_PIECES[captured][to_square]
+
+        # Lift the piece
+        pieces[piece_type] ^= from_bb
+        occupied_co[turn] ^= from_bb | to_bb
+        mailbox[from_square] = 0
+        key ^= ZOBRIST_PIECES[code][from_square]
+
+        if piece_type == PAWN:
+            self.halfmove_clock = 0
+            difference = to_square - from_square
+            if difference == 16 or difference == -16:
+                self.ep_square = from_square + difference // 2
+                self.ep_key = self.ep_key_of(self.ep_square, not turn)
+                key ^= self.ep_key
+            elif to_square == ep_square and not captured and difference & 7:
+                # En passant: the captured pawn is behind the target square
+                captured_square = to_square - 8 if turn == chess.WHITE else to_square + 8
+                captured_bb = BB_SQUARES[captured_square]
+                pieces[PAWN] ^= captured_bb
+                occupied_co[not turn] ^= captured_bb
+                key ^= ZOBRIST_PIECES[mailbox[captured_square]][captured_square]
+                mailbox[captured_square] = 0
+            if promotion:
+                code = promotion | (code & 8)
+                piece_type = promotion
+        elif piece_type == KING and (to_square - from_square == 2 or from_square - to_square == 2):
+            # Castling: the rook jumps over the king
+            if to_square > from_square:
+                rook_from = to_square + 1
+                rook_to = to_square - 1
+            else:
+                rook_from = to_square - 2
+                rook_to = to_square + 1
+            rook_code = mailbox[rook_from]
+            rook_bb = BB_SQUARES[rook_from] | BB_SQUARES[rook_to]
+            pieces[ROOK] ^= rook_bb
+            occupied_co[turn] ^= rook_bb
+            mailbox[rook_from] = 0
+            mailbox[rook_to] = rook_code
+            key ^= ZOBRIST_PIECES[rook_code][rook_from] ^ ZOBRIST_PIECES[rook_code][rook_to]
+
+        # Put it down
+        pieces[piece_type] |= to_bb
+        mailbox[to_square] = code
+        self.key = key ^ ZOBRIST_PIECES[code][to_square]
+
+    def pop(self):
+        move, captured, self.castling_rights, self.ep_square, self.ep_key, self.halfmove_clock, self.key = self._stack.pop()
+        self.move_stack.pop()
+
+        turn = not self.turn
+        self.turn = turn
+        if turn == chess.BLACK:
+            self.fullmove_number -= 1
+
+        if not move:
+            return move
+
+        mailbox = self.mailbox
+        pieces = self.pieces
+        occupied_co = self.occupied_co
+        from_square = move & 63
+        to_square = (move >> 6) & 63
+        from_bb = BB_SQUARES[from_square]
+        to_bb = BB_SQUARES[to_square]
+        code = mailbox[to_square]
+
+        pieces[code & 7] ^= to_bb
+        occupied_co[turn] ^= from_bb | to_bb
+        if move >> 12:
+            code = PAWN | (code & 8)
+        piece_type = code & 7
+        pieces[piece_type] |= from_bb
+        mailbox[from_square] = code
+        mailbox[to_square] = captured
+
+        if captured:
+            pieces[captured & 7] |= to_bb
+            occupied_co[not turn] |= to_bb
+        elif piece_type == PAWN and (to_square - from_square) & 7:
+            # En passant
+            captured_square = to_square - 8 if turn == chess.WHITE else to_square + 8
+            captured_bb = BB_SQUARES[captured_square]
+            pieces[PAWN] |= captured_bb
+            occupied_co[not turn] |= captured_bb
+            mailbox[captured_square] = piece_code(PAWN, not turn)
+        elif piece_type == KING and (to_square - from_square == 2 or from_square - to_square == 2):
+            if to_square > from_square:
+                rook_from = to_square + 1
+                rook_to = to_square - 1
+            else:
+                rook_from = to_square - 2
+                rook_to = to_square + 1
+            rook_bb = BB_SQUARES[rook_from] | BB_SQUARES[rook_to]
+            pieces[ROOK] ^= rook_bb
+            occupied_co[turn] ^= rook_bb
+            mailbox[rook_to] = 0
+            mailbox[rook_from] = piece_code(ROOK, turn)
+
+        return move
+
+    # Own pieces that are the only piece between the king and an enemy slider
+    def slider_blockers(self, king, occupied):
+        pieces = self.pieces
+        them = self.occupied_co[not self.turn]
+        rooks_and_queens = pieces[ROOK] | pieces[QUEEN]
+        bishops_and_queens = pieces[BISHOP] | pieces[QUEEN]
+        snipers = ((BB_RANK_ATTACKS[king][0] & rooks_and_queens) | (BB_FILE_ATTACKS[king][0] & rooks_and_queens)
+                   | (BB_DIAG_ATTACKS[king][0] & bishops_and_queens)) & them
+
+        blockers = 0
+        while snipers:
+            sniper = snipers.bit_length() - 1
+            snipers ^= BB_SQUARES[sniper]
+            between = BB_BETWEEN[king][sniper] & occupied
+            if between and between & (between - 1) == 0:
+                blockers |= between
+        return blockers & self.occupied_co[self.turn]
+
+    def ep_skewered(self, king, capturer):
+        last_double = self.ep_square + (-8 if self.turn == chess.WHITE else 8)
+        occupancy = ((self.occupied_co[0] | self.occupied_co[1]) & ~BB_SQUARES[last_double] & ~BB_SQUARES[capturer]
+                     | BB_SQUARES[self.ep_square])
+
+        pieces = self.pieces
+        them = self.occupied_co[not self.turn]
+        if BB_RANK_ATTACKS[king][BB_RANK_MASKS[king] & occupancy] & them & (pieces[ROOK] | pieces[QUEEN]):
+            return True
+        if BB_DIAG_ATTACKS[king][BB_DIAG_MASKS[king] & occupancy] & them & (pieces[BISHOP] | pieces[QUEEN]):
+            return True
+        return False
+
+    # Legal moves as ints, in the order of chess.Board.generate_legal_moves
+    def generate_legal_moves(self, from_mask=BB_ALL, to_mask=BB_ALL):
+        turn = self.turn
+        us = self.occupied_co[turn]
+        occupied = self.occupied_co[0] | self.occupied_co[1]
+        moves = []
+
+        king_bb = self.pieces[KING] & us
+        if not king_bb:
+            self.generate_moves(moves, from_mask, to_mask, None, 0, True)
+            return moves
+
+        king = king_bb.bit_length() - 1
+        blockers = self.slider_blockers(king, occupied)
+        checkers = self.attackers_mask(not turn, king, occupied)
+        if not checkers:
+            self.generate_moves(moves, from_mask, to_mask, king, blockers, True)
+            return moves
+
+        # Evasions: king moves off the checking lines first
+        pieces = self.pieces
+        attacked = 0
+        sliders = checkers & (pieces[BISHOP] | pieces[ROOK] | pieces[QUEEN])
+        while sliders:
+            checker = sliders.bit_length() - 1
+            sliders ^= BB_SQUARES[checker]
+            attacked |= BB_RAYS[king][checker] & ~BB_SQUARES[checker]
+
+        if king_bb & from_mask:
+            targets = BB_KING_ATTACKS[king] & ~us & ~attacked & to_mask
+            while targets:
+                to_square = targets.bit_length() - 1
+                targets ^= BB_SQUARES[to_square]
+                if not self.attackers_mask(not turn, to_square, occupied):
+                    moves.append(king | to_square << 6)
+
+        checker = checkers.bit_length() - 1
+        if BB_SQUARES[checker] == checkers:
+            # Capture or block a single checker
+            target = BB_BETWEEN[king][checker] | checkers
+            self.generate_moves(moves, ~pieces[KING] & from_mask, target & to_mask, king, blockers, False)
+
+            # Capture the checking pawn en passant
+            ep_square = self.ep_square
+            if ep_square and not BB_SQUARES[ep_square] & target:
+                last_double = ep_square + (-8 if turn == chess.WHITE else 8)
+                if last_double == checker:
+                    self.generate_ep(moves, from_mask, to_mask, king, blockers)
+
+        return moves
+
+    # Pseudo-legal moves in python-chess's order, filtered as chess.Board._is_safe does
+    def generate_moves(self, moves, from_mask, to_mask, king, blockers, castling):
+        turn = self.turn
+        pieces = self.pieces
+        mailbox = self.mailbox
+        us = self.occupied_co[turn]
+        them = self.occupied_co[not turn]
+        occupied = us | them
+        pawns = pieces[PAWN]
+
+        # Pieces, from the highest square down
+        non_pawns = us & ~pawns & from_mask
+        while non_pawns:
+            from_square = non_pawns.bit_length() - 1
+            non_pawns ^= BB_SQUARES[from_square]
+            piece_type = mailbox[from_square] & 7
+
+            if piece_type == KNIGHT:
+                targets = BB_KNIGHT_ATTACKS[from_square]
+            elif piece_type == KING:
+                targets = BB_KING_ATTACKS[from_square]
+            else:
+                targets = 0
+                if piece_type != ROOK:
+                    targets = BB_DIAG_ATTACKS[from_square][BB_DIAG_MASKS[from_square] & occupied]
+                if piece_type != BISHOP:
+                    targets |= (BB_RANK_ATTACKS[from_square][BB_RANK_MASKS[from_square] & occupied]
+                                | BB_FILE_ATTACKS[from_square][BB_FILE_MASKS[from_square] & occupied])
+            targets &= ~us & to_mask
+
+            if from_square == king:
+                while targets:
+                    to_square = targets.bit_length() - 1
+                    targets ^= BB_SQUARES[to_square]
+                    if not self.attackers_mask(not turn, to_square, occupied):
+                        moves.append(from_square | to_square << 6)
+                continue
+
+            if blockers & BB_SQUARES[from_square]:
+                targets &= BB_RAYS[king][from_square]
+            while targets:
+                to_square = targets.bit_length() - 1
+                targets ^= BB_SQUARES[to_square]
+                moves.append(from_square | to_square << 6)
+
+        if castling and from_mask & pieces[KING]:
+            self.generate_castling(moves, to_mask, occupied)
+
+        pawns &= us & from_mask
+        if not pawns:
+            return
+
+        # Pawn captures
+        capturers = pawns
+        pawn_attacks = BB_PAWN_ATTACKS[turn]
+        while capturers:
+            from_square = capturers.bit_length() - 1
+            capturers ^= BB_SQUARES[from_square]
+            targets = pawn_attacks[from_square] & them & to_mask
+            if blockers & BB_SQUARES[from_square]:
+                targets &= BB_RAYS[king][from_square]
+            while targets:
+                to_square = targets.bit_length() - 1
+                targets ^= BB_SQUARES[to_square]
+                move = from_square | to_square << 6
+                if to_square < 8 or to_square >= 56:
+                    for promotion in PROMOTION_TYPES:
+                        moves.append(move | promotion << 12)
+                else:
+                    moves.append(move)
+
+        # Pushes
+        empty = ~occupied & BB_ALL
+        if turn == chess.WHITE:
+            single_moves = pawns << 8 & empty
+            double_moves = single_moves << 8 & empty & chess.BB_RANK_4
+            step = -8
+        else:
+            single_moves = pawns >> 8 & empty
+            double_moves = single_moves >> 8 & empty & chess.BB_RANK_5
+            step = 8
+        single_moves &= to_mask
+        double_moves &= to_mask
+
+        while single_moves:
+            to_square = single_moves.bit_length() - 1
+            single_moves ^= BB_SQUARES[to_square]
+            from_square = to_square + step
+            if blockers & BB_SQUARES[from_square] and not BB_RAYS[king][from_square] & BB_SQUARES[to_square]:
+                continue
+            move = from_square | to_square << 6
+            if to_square < 8 or to_square >= 56:
+                for promotion in PROMOTION_TYPES:
+                    moves.append(move | promotion << 12)
+            else:
+                moves.append(move)
+
+        while double_moves:
+            to_square = double_moves.bit_length() - 1
+            double_moves ^= BB_SQUARES[to_square]
+            from_square = to_square + 2 * step
+            if blockers & BB_SQUARES[from_square] and not BB_RAYS[king][from_square] & BB_SQUARES[to_square]:
+                continue
+            moves.append(from_square | to_square << 6)
+
+        if self.ep_square:
+            self.generate_ep(moves, from_mask, to_mask, king, blockers)
+
+    def generate_ep(self, moves, from_mask, to_mask, king, blockers):
+        ep_square = self.ep_square
+        ep_bb = BB_SQUARES[ep_square]
+        if not ep_bb & to_mask or ep_bb & (self.occupied_co[0] | self.occupied_co[1]):
+            return
+
+        turn = self.turn
+        capturers = (self.pieces[PAWN] & self.occupied_co[turn] & from_mask & BB_PAWN_ATTACKS[not turn][ep_square]
+                     & BB_EP_RANKS[turn])
+        while capturers:
+            from_square = capturers.bit_length() - 1
+            capturers ^= BB_SQUARES[from_square]
+            if king is not None:
+                if blockers & BB_SQUARES[from_square] and not BB_RAYS[king][from_square] & ep_bb:
+                    continue
+                if self.ep_skewered(king, from_square):
+                    continue
+            moves.append(from_square | ep_square << 6)
+
+    def generate_castling(self, moves, to_mask, occupied):
+        turn = self.turn
+        backrank = BB_BACKRANKS[turn]
+        king = self.occupied_co[turn] & self.pieces[KING] & backrank
+        king &= -king
+        if not king:
+            return
+
+        king_square = king.bit_length() - 1
+        candidates = self.castling_rights & backrank & to_mask
+        while candidates:
+            candidate = candidates.bit_length() - 1
+            candidates ^= BB_SQUARES[candidate]
+            rook = BB_SQUARES[candidate]
+
+            if rook < king:
+                king_to = chess.BB_FILE_C & backrank
+                rook_to = chess.BB_FILE_D & backrank
+            else:
+                king_to = chess.BB_FILE_G & backrank
+                rook_to = chess.BB_FILE_F & backrank
+            king_to_square = king_to.bit_length() - 1
+
+            king_path = BB_BETWEEN[king_square][king_to_square]
+            rook_path = BB_BETWEEN[candidate][rook_to.bit_length() - 1]
+            if (occupied ^ king ^ rook) & (king_path | rook_path | king_to | rook_to):
+                continue
+            if self.attacked_for_king(king_path | king, occupied ^ king):
+                continue
+            if self.attacked_for_king(king_to, occupied ^ king ^ rook ^ rook_to):
+                continue
+            moves.append(king_square | king_to_square << 6)
+
+    def attacked_for_king(self, path, occupied):
+        color = not self.turn
+        while path:
+            square = path.bit_length() - 1
+            path ^= BB_SQUARES[square]
+            if self.attackers_mask(color, square, occupied):
+                return True
+        return False
+
+    # Legal captures, en passant last, as chess.Board.generate_legal_captures
+    def generate_legal_captures(self):
+        moves = self.generate_legal_moves(BB_ALL, self.occupied_co[not self.turn])
+        if self.ep_square:
+            moves.extend(move for move in self.generate_legal_moves(BB_ALL, BB_SQUARES[self.ep_square])
+                         if self.is_en_passant(move))
+        return moves
+
+    def legal_move_count(self):
+        return len(self.generate_legal_moves())
+
+
+# Leaf nodes of the legal move tree to the given depth
+def perft(board, depth):
+    if depth < 1:
+        return 1
+
+    moves = board.generate_legal_moves()
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+    for move in moves:
+        board.push(move)
+        nodes += perft(board, depth - 1)
+        board.pop()
+    return nodes
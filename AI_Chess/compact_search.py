@@ -0,0 +1,183 @@
+import chess
+
+from compact_board import BB_ALL, PAWN, CompactBoard
+from eval_cache import MOBILITY_KEY, shared_eval_cache
+from evaluation import MATE_SCORE, byte_material_pst, legal_mobility
+from move_ordering import (CAPTURE_SCORE, HASH_MOVE_SCORE, KILLER_SCORES, LOSING_CAPTURE_SCORE, MAX_PLY, ORDER_SEE,
+                           SEE_VALUES, static_exchange)
+from negamax import Negamax
+from node_cache import shared_node_cache
+from transposition_table import pack_move, unpack_move
+
+# Boards the negamax core searches on
+BOARD_CHESS = 'chess'  # chess.Board and chess.Move, as the engines always did
+BOARD_COMPACT = 'compact'  # CompactBoard and int moves (see compact_board.py)
+
+
+# The value of both engines' static_evaluation (bitboard_evaluate, or IncrementalBoard.evaluate
+# with the board's mobility function) on a CompactBoard, given the number of legal moves and the
+# check status of the side to move
+def compact_evaluate(board, side_mobility, in_check, mobility=legal_mobility):
+    if not side_mobility:
+        if in_check:
+            return -MATE_SCORE if board.turn == chess.WHITE else MATE_SCORE
+        return 0
+
+    if mobility is not legal_mobility:
+        return byte_material_pst(board) + 2 * mobility(board)
+
+    board.turn = not board.turn  # Switch sides temporarily
+    other_mobility = board.legal_move_count()
+    board.turn = not board.turn  # Switch back
+
+    return byte_material_pst(board) + 2 * (side_mobility - other_mobility)
+
+
+# Type of the piece an int move captures (a pawn for en passant), or 0, as captured_piece_type
+def captured_type(board, move):
+    to_square = (move >> 6) & 63
+    code = board.mailbox[to_square]
+    if code:
+        return code & 7
+    if to_square == board.ep_square and board.mailbox[move & 63] & 7 == PAWN:
+        return PAWN
+    return 0
+
+
+# The negamax core on a CompactBoard copy of the root. The tree, the scores and the node counts
+# are those of Negamax on the chess.Board: the moves come in the same order, the ordering,
+# killers and history score them the same way and the keys are the same polyglot keys, so the
+# transposition table and the evaluation cache are shared with the chess.Board searches. Moves
+# are converted to chess.Move only at the root. The legal moves of every node, and the check
+# status the evaluation tells mate from stalemate with, come from the shared NodeCache (see
+# node_cache.py).
+class CompactNegamax(Negamax):
+
+    NULL_MOVE = 0
+
+    def __init__(self, context, engine_key, board, null_move=False):
+        Negamax.__init__(self, context, self.static_evaluation, engine_key, board.turn, null_move)
+        self.board = CompactBoard.from_board(board)
+
+        # Same cache keys as eval_key() on the chess.Board
+        self.mobility = getattr(board, 'mobility', legal_mobility)
+        self.eval_salt = engine_key
+        if self.mobility is not legal_mobility:
+            self.eval_salt ^= MOBILITY_KEY
+
+    def static_evaluation(self, board):
+        key = board.key ^ self.eval_salt
+        score = shared_eval_cache.probe(key)
+        if score is None:
+            _, moves, in_check = shared_node_cache.lookup(board)
+            score = compact_evaluate(board, len(moves), in_check, self.mobility)
+            shared_eval_cache.store(key, score)
+        return score
+
+    # Same contract as Negamax.search_root; board is the chess.Board the search started from
+    def search_root(self, board, depth, context, root_moves=None):
+        compact = self.board
+        root_ply = len(compact.move_stack)
+        if root_moves is not None:
+            root_moves = [pack_move(move) for move in root_moves]
+
+        try:
+            best_move, best_score, ordered = Negamax.search_root(self, compact, depth, context, root_moves)
+        finally:
+            # An aborted iteration leaves its moves on the compact board
+            while len(compact.move_stack) > root_ply:
+                compact.pop()
+
+        return unpack_move(best_move or 0), best_score, [unpack_move(move) for move in ordered]
+
+    def order_moves(self, board, hash_move, ply):
+        context = self.context
+        if context.timing:
+            moves = context.stats.timed_movegen(shared_node_cache.lookup, board)[1]
+        else:
+            moves = shared_node_cache.lookup(board)[1]
+
+        if context.orderer is not None:
+            return sorted(moves, key=lambda move: -self.score_move(board, move, hash_move, ply))
+
+        moves = list(moves)
+        if hash_move and hash_move in moves:
+            moves.remove(hash_move)
+            moves.insert(0, hash_move)
+        return moves
+
+    # MoveOrderer.score_move for int moves
+    def score_move(self, board, move, hash_move, ply):
+        if move == hash_move:
+            return HASH_MOVE_SCORE
+
+        orderer = self.context.orderer
+        captured = captured_type(board, move)
+        promotion = move >> 12
+        if captured or promotion:
+            if orderer.mode == ORDER_SEE:
+                exchange = static_exchange(board, move & 63, (move >> 6) & 63, promotion)
+                if exchange < 0:
+                    return LOSING_CAPTURE_SCORE + exchange
+                return CAPTURE_SCORE + exchange
+
+            return CAPTURE_SCORE + (captured + promotion) * 8 - (board.mailbox[move & 63] & 7)
+
+        if ply < MAX_PLY:
+            killers = orderer.killers[ply]
+            if move == killers[0]:
+                return KILLER_SCORES[0]
+            if move == killers[1]:
+                return KILLER_SCORES[1]
+
+        return orderer.history[(move & 63) << 6 | (move >> 6) & 63]
+
+    def record_cutoff(self, board, move, depth, ply):
+        if captured_type(board, move) or move >> 12:
+            return
+
+        orderer = self.context.orderer
+        orderer.add_killer(move, ply)
+        orderer.add_history_at((move & 63) << 6 | (move >> 6) & 63, depth)
+
+    def key(self, board):
+        return board.key ^ self.salt
+
+    def probe(self, tt, key):
+        return tt.probe_packed(key)
+
+    def hash_move(self, tt, key):
+        return tt.best_move_packed(key)
+
+    def store(self, tt, key, depth, score, flag, move):
+        tt.store_packed(key, depth, score, flag, move or 0)
+
+    def legal_moves(self, board):
+        return list(shared_node_cache.lookup(board)[1])
+
+    def is_promotion(self, move):
+        return move >> 12
+
+    def is_tactical(self, board, move):
+        return move >> 12 or board.is_capture(move)
+
+    # Legal captures (en passant included) and quiet promotions, as quiescence.tactical_moves
+    def tactical_moves(self, board):
+        moves = board.generate_legal_captures()
+
+        seventh_rank = chess.BB_RANK_7 if board.turn == chess.WHITE else chess.BB_RANK_2
+        promoting = board.pieces[PAWN] & board.occupied_co[board.turn] & seventh_rank
+        if promoting:
+            moves.extend(board.generate_legal_moves(promoting, ~board.occupied & BB_ALL))
+
+        return moves
+
+    def tactical_gain(self, board, move):
+        gain = SEE_VALUES[captured_type(board, move)]
+        promotion = move >> 12
+        if promotion:
+            gain += SEE_VALUES[promotion] - SEE_VALUES[PAWN]
+        return gain
+
+    def see(self, board, move):
+        return static_exchange(board, move & 63, (move >> 6) & 63, move >> 12)
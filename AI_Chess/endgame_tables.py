@@ -0,0 +1,721 @@
+import argparse
+import mmap
+import os
+import sys
+import time
+
+import chess
+
+from compact_board import (BB_DIAG_ATTACKS, BB_DIAG_MASKS, BB_FILE_ATTACKS, BB_FILE_MASKS, BB_KING_ATTACKS,
+                           BB_KNIGHT_ATTACKS, BB_PAWN_ATTACKS, BB_RANK_ATTACKS, BB_RANK_MASKS, BB_SQUARES, BISHOP, KING,
+                           KNIGHT, PAWN, QUEEN, ROOK, CompactBoard)
+from evaluation import MATE_SCORE
+
+# Tables are named after their material, strongest side first (KQvK, KRvKB, KPvK, ...), and
+# stored as <name>.egt in one directory
+TABLE_SUFFIX = '.egt'
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'endgame_tables')
+
+# Largest tables the generator builds (kings included). A 3 piece table takes seconds, a 4 piece
+# one tens of minutes.
+MAX_PIECES = 4
+
+# Pieces besides the king in the order of a table name, with the values that pick the stronger side
+PIECE_LETTERS = 'QRBNP'
+PIECE_TYPES = (QUEEN, ROOK, BISHOP, KNIGHT, PAWN)
+LETTER_VALUES = {'Q': 9, 'R': 5, 'B': 3, 'N': 3, 'P': 1}
+TABLE_ORDER = {QUEEN: 0, ROOK: 1, BISHOP: 2, KNIGHT: 3, PAWN: 4}  # Piece type -> index in PIECE_LETTERS
+
+# One byte per position, from the side to move's point of view: 0 is a draw (and an illegal
+# position), an odd value mates in that many plies and an even value is mated in two plies less
+DRAW = 0
+
+
+def decode_value(value):
+    if not value:
+        return 0, None
+    if value & 1:
+        return 1, value
+    return -1, value - 2
+
+
+# A table value as a negamax score at the given ply, on the search's own mate scale
+def table_score(value, ply):
+    if not value:
+        return 0
+    if value & 1:
+        return MATE_SCORE - ply - value
+    return -MATE_SCORE + ply + value - 2
+
+
+def value_text(value):
+    result, plies = decode_value(value)
+    if result > 0:
+        return 'win, mate in %d plies' % plies
+    if result < 0:
+        return 'loss, mated in %d plies' % plies
+    return 'draw'
+
+
+# Table name of the material (the piece letters of each side besides the king) and whether the
+# colours are swapped to put the stronger side first
+def material_name(white, black):
+    white = ''.join(sorted(white, key=PIECE_LETTERS.index))
+    black = ''.join(sorted(black, key=PIECE_LETTERS.index))
+
+    def strength(letters):
+        return sum(LETTER_VALUES[letter] for letter in letters), len(letters), [-PIECE_LETTERS.index(letter)
+                                                                                 for letter in letters]
+
+    if strength(black) > strength(white):
+        return 'K%svK%s' % (black, white), True
+    return 'K%svK%s' % (white, black), False
+
+
+def split_name(name):
+    if not name.startswith('K') or name.count('vK') != 1:
+        raise ValueError("Invalid table name: %r" % (name,))
+    white, black = name[1:].split('vK')
+    if any(letter not in PIECE_LETTERS for letter in white + black):
+        raise ValueError("Invalid table name: %r" % (name,))
+    return white, black
+
+
+# Material names of all tables of the given piece count (kings included) the generator supports
+def all_tables(pieces):
+    names = []
+    letters = [''.join(combination) for combination in _combinations(pieces - 2)]
+    for white in letters:
+        for black in [''.join(combination) for combination in _combinations(pieces - 2 - len(white))]:
+            if len(white) + len(black) != pieces - 2 or ('P' in white and 'P' in black):
+                continue
+            name = material_name(white, black)[0]
+            if name not in names:
+                names.append(name)
+    return names
+
+
+def _combinations(count):
+    combinations = [()]
+    for size in range(1, count + 1):
+        combinations.extend(_multisets(size, 0))
+    return combinations
+
+
+def _multisets(size, start):
+    if size == 0:
+        return [()]
+    return [(PIECE_LETTERS[index],) + rest for index in range(start, len(PIECE_LETTERS))
+            for rest in _multisets(size - 1, index)]
+
+
+# The eight symmetries of the board as square maps: mirror the files (bit 1), the ranks (bit 2)
+# and swap files and ranks (bit 4)
+def _transform(square, symmetry):
+    file, rank = chess.square_file(square), chess.square_rank(square)
+    if symmetry & 1:
+        file = 7 - file
+    if symmetry & 2:
+        rank = 7 - rank
+    if symmetry & 4:
+        file, rank = rank, file
+    return chess.square(file, rank)
+
+
+SYMMETRIES = [[_transform(square, symmetry) for square in chess.SQUARES] for symmetry in range(8)]
+
+# Squares of the white king in a table: the a1-d1-d4 triangle without pawns, files a to d with them
+TRIANGLE = [square for square in chess.SQUARES
+            if chess.square_file(square) < 4 and chess.square_rank(square) <= chess.square_file(square)]
+QUEEN_SIDE = [square for square in chess.SQUARES if chess.square_file(square) < 4]
+
+
+# Index of the positions of one material. A position is the squares of the white king, the black
+# king, the other white pieces and the other black pieces (in PIECE_LETTERS order) and the side
+# to move. The board is turned so the white king lands on the squares above (only mirrored left
+# to right when there are pawns); of two such turns the one with the lower index wins.
+class TableLayout:
+
+    def __init__(self, name):
+        white, black = split_name(name)
+        if 'P' in white and 'P' in black:
+            raise ValueError("%s: tables with pawns on both sides are not supported (en passant)" % name)
+
+        self.name = name
+        self.pieces = ([(KING, chess.WHITE), (KING, chess.BLACK)]
+                       + [(PIECE_TYPES[PIECE_LETTERS.index(letter)], chess.WHITE) for letter in white]
+                       + [(PIECE_TYPES[PIECE_LETTERS.index(letter)], chess.BLACK) for letter in black])
+        self.has_pawns = 'P' in white + black
+
+        if self.has_pawns:
+            self.symmetries = SYMMETRIES[:2]
+            self.king_squares = QUEEN_SIDE
+        else:
+            self.symmetries = SYMMETRIES
+            self.king_squares = TRIANGLE
+        self.king_index = [-1] * 64
+        for index, square in enumerate(self.king_squares):
+            self.king_index[square] = index
+
+        self.stride = 64 ** (len(self.pieces) - 1)
+        self.half = len(self.king_squares) * self.stride  # Positions with one side to move
+        self.size = 2 * self.half
+
+    def index(self, squares, turn):
+        best = -1
+        for symmetry in self.symmetries:
+            king = self.king_index[symmetry[squares[0]]]
+            if king < 0:
+                continue
+            index = king
+            for square in squares[1:]:
+                index = index * 64 + symmetry[square]
+            if best < 0 or index < best:
+                best = index
+        return best + self.half if turn == chess.WHITE else best
+
+    def position(self, index):
+        turn = index >= self.half
+        index %= self.half
+        squares = []
+        for _ in range(len(self.pieces) - 1):
+            squares.append(index & 63)
+            index >>= 6
+        squares.append(self.king_squares[index])
+        squares.reverse()
+        return squares, turn
+
+
+_tables = {}
+
+
+# Tables of a directory, one per path per process, mapped on first use
+def open_tables(directory):
+    tables = _tables.get(directory)
+    if tables is None:
+        tables = EndgameTables(directory)
+        _tables[directory] = tables
+    return tables
+
+
+def close_tables():
+    for tables in _tables.values():
+        tables.close()
+    _tables.clear()
+
+
+# The tables of one directory. Every file is mapped read-only, so the operating system pages in
+# the parts a search touches and all processes share them.
+class EndgameTables:
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.names = set()
+        self.max_pieces = 2
+        for filename in os.listdir(directory):
+            if filename.endswith(TABLE_SUFFIX):
+                name = filename[:-len(TABLE_SUFFIX)]
+                white, black = split_name(name)
+                self.names.add(name)
+                self.max_pieces = max(self.max_pieces, 2 + len(white) + len(black))
+        self.tables = {}  # name -> (TableLayout, mapped file)
+
+    def close(self):
+        for _, data in self.tables.values():
+            data.close()
+        self.tables.clear()
+
+    def table(self, name):
+        table = self.tables.get(name)
+        if table is None and name in self.names:
+            layout = TableLayout(name)
+            with open(os.path.join(self.directory, name + TABLE_SUFFIX), 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if len(data) != layout.size:
+                data.close()
+                raise ValueError("%s: %d bytes, expected %d" % (name, len(data), layout.size))
+            table = (layout, data)
+            self.tables[name] = table
+        return table
+
+    # Value of a position given as (piece_type, color, square) triples, or None without its table
+    def probe_pieces(self, pieces, turn):
+        kings = [None, None]
+        sides = ([], [])  # Indexed by colour
+        for piece_type, color, square in pieces:
+            if piece_type == KING:
+                kings[color] = square
+            else:
+                sides[color].append((TABLE_ORDER[piece_type], square))
+        white = sorted(sides[chess.WHITE])
+        black = sorted(sides[chess.BLACK])
+
+        name, flipped = material_name(''.join(PIECE_LETTERS[order] for order, _ in white),
+                                      ''.join(PIECE_LETTERS[order] for order, _ in black))
+        if name == 'KvK':
+            return DRAW
+
+        table = self.table(name)
+        if table is None:
+            return None
+
+        if flipped:
+            squares = [kings[chess.BLACK] ^ 56, kings[chess.WHITE] ^ 56]
+            squares.extend(square ^ 56 for _, square in black)
+            squares.extend(square ^ 56 for _, square in white)
+            turn = not turn
+        else:
+            squares = [kings[chess.WHITE], kings[chess.BLACK]]
+            squares.extend(square for _, square in white)
+            squares.extend(square for _, square in black)
+
+        layout, data = table
+        return data[layout.index(squares, turn)]
+
+    # Value of a chess.Board or CompactBoard position for the side to move, or None when it has
+    # too many pieces, castling rights, an en passant capture or no table
+    def probe(self, board):
+        occupied = board.occupied
+        if chess.popcount(occupied) > self.max_pieces or board.castling_rights:
+            return None
+        ep_square = board.ep_square
+        if ep_square is not None and BB_PAWN_ATTACKS[not board.turn][ep_square] & board.pawns & board.occupied_co[board.turn]:
+            return None
+
+        pieces = []
+        for color in chess.COLORS:
+            pieces.append((KING, color, board.king(color)))
+            for piece_type in PIECE_TYPES:
+                mask = board.pieces_mask(piece_type, color)
+                while mask:
+                    square = mask.bit_length() - 1
+                    mask ^= BB_SQUARES[square]
+                    pieces.append((piece_type, color, square))
+
+        return self.probe_pieces(pieces, board.turn)
+
+
+# Best move of a position by the tables: the fastest mate, else a draw, else the longest defence.
+# Returns (move, score, moves ordered best first) or None when a move leads out of the tables.
+def table_move(board, tables, root_moves=None):
+    if tables.probe(board) is None:
+        return None
+
+    ranked = []
+    for move in (root_moves if root_moves is not None else list(board.legal_moves)):
+        board.push(move)
+        value = tables.probe(board)
+        board.pop()
+        if value is None:
+            return None
+
+        result, plies = decode_value(value)
+        if result < 0:
+            rank = (MATE_SCORE - plies - 1, move)  # The opponent is mated
+        elif result > 0:
+            rank = (-MATE_SCORE + plies + 1, move)
+        else:
+            rank = (0, move)
+        ranked.append(rank)
+
+    if not ranked:
+        return None
+
+    ranked.sort(key=lambda item: -item[0])
+    return ranked[0][1], ranked[0][0], [move for _, move in ranked]
+
+
+# Called by the engines before searching: the table move of the context's tables, which also
+# becomes context.best_move, or None
+def probe_root(board, context, root_moves=None):
+    if context.endgame_tables is None:
+        return None
+
+    result = table_move(board, open_tables(context.endgame_tables), root_moves)
+    if result is None:
+        return None
+
+    context.best_move, context.best_score, context.root_order = result
+    if context.stats is not None:
+        context.stats.table_hits += 1
+    return context.best_move
+
+
+# Squares a piece attacks from a square with the pieces in occupied on the board
+def piece_attacks(piece_type, square, occupied):
+    if piece_type == KNIGHT:
+        return BB_KNIGHT_ATTACKS[square]
+    if piece_type == KING:
+        return BB_KING_ATTACKS[square]
+
+    attacks = 0
+    if piece_type != ROOK:
+        attacks |= BB_DIAG_ATTACKS[square][BB_DIAG_MASKS[square] & occupied]
+    if piece_type != BISHOP:
+        attacks |= (BB_RANK_ATTACKS[square][BB_RANK_MASKS[square] & occupied]
+                    | BB_FILE_ATTACKS[square][BB_FILE_MASKS[square] & occupied])
+    return attacks
+
+
+# Retrograde analysis of one table. Every legal position starts unknown, except the mates, the
+# stalemates and the positions a capture or promotion into a smaller table decides. Then, ply
+# by ply, the positions one move before a loss in n become wins in n + 1, and the ones whose moves
+# all lead to wins become losses in one ply more than the longest of them. What is left is drawn.
+# The positions before a resolved one come from taking back moves of the side that just moved
+# (no captures: those come from larger tables).
+class TableGenerator:
+
+    def __init__(self, name, tables):
+        self.layout = TableLayout(name)
+        self.tables = tables  # EndgameTables with the smaller tables this one converts into
+
+    def board(self, squares, turn):
+        board = CompactBoard()
+        for (piece_type, color), square in zip(self.layout.pieces, squares):
+            board.put(square, piece_type, color)
+        board.turn = turn
+        return board
+
+    # Whether a piece of color attacks square, the pieces standing on squares
+    def attacked(self, squares, color, square):
+        occupied = 0
+        for origin in squares:
+            occupied |= BB_SQUARES[origin]
+
+        for (piece_type, piece_color), origin in zip(self.layout.pieces, squares):
+            if piece_color != color:
+                continue
+            if piece_type == PAWN:
+                attacks = BB_PAWN_ATTACKS[color][origin]
+            else:
+                attacks = piece_attacks(piece_type, origin, occupied)
+            if attacks & BB_SQUARES[square]:
+                return True
+        return False
+
+    # Squares, side to move and board of a table index, or None for an illegal or duplicate index
+    def position(self, index):
+        layout = self.layout
+        squares, turn = layout.position(index)
+        if len(set(squares)) < len(squares):
+            return None
+        for (piece_type, _), square in zip(layout.pieces, squares):
+            if piece_type == PAWN and BB_SQUARES[square] & chess.BB_BACKRANKS:
+                return None
+        if layout.index(squares, turn) != index:
+            return None
+
+        board = self.board(squares, turn)
+        if board.attackers_mask(turn, board.king(not turn), board.occupied):
+            return None
+        return squares, turn, board
+
+    # Value of the position after a capture or promotion (from the smaller table), or None for a
+    # move that stays in this table
+    def conversion(self, board, squares, turn, move):
+        from_square = move & 63
+        to_square = (move >> 6) & 63
+        promotion = move >> 12
+        if not board.mailbox[to_square] and not promotion:
+            return None
+
+        pieces = []
+        for (piece_type, color), square in zip(self.layout.pieces, squares):
+            if square == to_square:
+                continue
+            if square == from_square:
+                square = to_square
+                if promotion:
+                    piece_type = promotion
+            pieces.append((piece_type, color, square))
+
+        value = self.tables.probe_pieces(pieces, not turn)
+        if value is None:
+            raise ValueError("%s needs a table this move converts into" % self.layout.name)
+        return value
+
+    def child(self, squares, turn, move):
+        after = squares[:]
+        after[squares.index(move & 63)] = (move >> 6) & 63
+        return self.layout.index(after, not turn)
+
+    # Value of every child of the position (from the other side's point of view), None while one
+    # is unresolved
+    def children(self, squares, turn, board, values, resolved):
+        children = []
+        for move in board.generate_legal_moves():
+            value = self.conversion(board, squares, turn, move)
+            if value is None:
+                child = self.child(squares, turn, move)
+                if not resolved[child]:
+                    return None
+                value = values[child]
+            children.append(value)
+        return children
+
+    # Squares of the positions one move back: the side not to move takes back a non-capture
+    def predecessors(self, squares, turn):
+        mover = not turn
+        occupied = 0
+        for square in squares:
+            occupied |= BB_SQUARES[square]
+
+        for piece, ((piece_type, color), square) in enumerate(zip(self.layout.pieces, squares)):
+            if color != mover:
+                continue
+
+            if piece_type == PAWN:
+                step = -8 if color == chess.WHITE else 8
+                origins = 0
+                origin = square + step
+                rank = chess.square_rank(origin)
+                if 1 <= rank <= 6 and not BB_SQUARES[origin] & occupied:
+                    origins |= BB_SQUARES[origin]
+                    if rank == (2 if color == chess.WHITE else 5) and not BB_SQUARES[origin + step] & occupied:
+                        origins |= BB_SQUARES[origin + step]
+            else:
+                origins = piece_attacks(piece_type, square, occupied) & ~occupied
+
+            while origins:
+                origin = origins.bit_length() - 1
+                origins ^= BB_SQUARES[origin]
+                before = squares[:]
+                before[piece] = origin
+                yield before
+
+    def generate(self, out=None):
+        layout = self.layout
+        values = bytearray(layout.size)
+        resolved = bytearray(layout.size)
+        losing = bytearray(layout.size)  # Scheduled as losses
+        pending = {}  # Plies -> indexes resolved at that distance
+
+        def schedule(plies, index):
+            pending.setdefault(plies, []).append(index)
+
+        start = time.perf_counter()
+        for index in range(layout.size):
+            position = self.position(index)
+            if position is None:
+                resolved[index] = 1
+                continue
+
+            squares, turn, board = position
+            moves = board.generate_legal_moves()
+            if not moves:
+                if board.is_check():
+                    schedule(0, index)
+                else:
+                    resolved[index] = 1  # Stalemate
+                continue
+
+            win = None
+            longest = -1
+            escape = False
+            for move in moves:
+                value = self.conversion(board, squares, turn, move)
+                if value is None or not value:
+                    escape = True
+                elif value & 1:
+                    longest = max(longest, value)
+                elif win is None or value - 1 < win:
+                    win = value - 1
+
+            if win is not None:
+                schedule(win, index)
+            elif not escape:
+                losing[index] = 1
+                schedule(longest + 1, index)
+
+        if out is not None:
+            out.write("  %s: %d positions set up in %.1f s\n" % (layout.name, layout.size, time.perf_counter() - start))
+            out.flush()
+
+        plies = 0
+        while pending:
+            for index in pending.pop(plies, ()):
+                if resolved[index]:
+                    continue
+                if plies > 253:
+                    raise ValueError("%s: distance to mate beyond one byte" % layout.name)
+                resolved[index] = 1
+                values[index] = plies if plies & 1 else plies + 2
+
+                squares, turn = layout.position(index)
+                for before in self.predecessors(squares, turn):
+                    if self.attacked(before, not turn, before[0] if turn == chess.WHITE else before[1]):
+                        continue  # The side to move here would be in check before the move
+                    previous = layout.index(before, not turn)
+                    if resolved[previous] or losing[previous]:
+                        continue
+
+                    if not plies & 1:
+                        schedule(plies + 1, previous)
+                        continue
+
+                    board = self.board(before, not turn)
+                    children = self.children(before, not turn, board, values, resolved)
+                    if children is not None and all(value & 1 for value in children):
+                        losing[previous] = 1
+                        schedule(max(children) + 1, previous)
+            plies += 1
+
+        if out is not None:
+            out.write("  %s: longest mate %d plies, %.1f s\n" % (layout.name, max(plies - 1, 0),
+                                                                  time.perf_counter() - start))
+            out.flush()
+        return values
+
+
+# Tables a capture or promotion in the named table leads into
+def conversions(name):
+    white, black = split_name(name)
+    names = set()
+    for side, other, swapped in ((white, black, False), (black, white, True)):
+        for index, letter in enumerate(side):
+            rest = side[:index] + side[index + 1:]
+            replacements = [rest]
+            if letter == 'P':
+                replacements = [rest + promotion for promotion in 'QRBN']
+            for replacement in replacements:
+                target = material_name(other, replacement) if swapped else material_name(replacement, other)
+                if target[0] != 'KvK':
+                    names.add(target[0])
+    # A promotion keeps the piece count, a capture lowers it
+    names.discard(name)
+    return sorted(names)
+
+
+# Build the named table in directory, and first every smaller table it needs that is missing.
+# Returns the names of the tables built.
+def generate_table(name, directory=DEFAULT_DIRECTORY, out=None):
+    name = material_name(*split_name(name))[0]
+    white, black = split_name(name)
+    if 2 + len(white) + len(black) > MAX_PIECES:
+        raise ValueError("%s: more than %d pieces" % (name, MAX_PIECES))
+
+    path = os.path.join(directory, name + TABLE_SUFFIX)
+    if os.path.exists(path):
+        return []
+
+    built = []
+    for target in conversions(name):
+        built.extend(generate_table(target, directory, out))
+
+    close_tables()  # See the tables just written
+    values = TableGenerator(name, open_tables(directory)).generate(out)
+
+    # Written whole and renamed, so a reader never maps a half-written table
+    with open(path + '.tmp', 'wb') as f:
+        f.write(values)
+    os.replace(path + '.tmp', path)
+    close_tables()
+
+    return built + [name]
+
+
+# Check every position of a table against its children (the value the best move gives). A table
+# that passes is exact: every mate distance follows from shorter ones down to the mates on the board.
+# Returns the number of positions that disagree.
+def verify_table(name, directory=DEFAULT_DIRECTORY, out=sys.stdout):
+    tables = open_tables(directory)
+    generator = TableGenerator(name, tables)
+    layout, data = tables.table(name)
+    resolved = bytearray(b'\x01') * layout.size
+
+    errors = 0
+    for index in range(layout.size):
+        position = generator.position(index)
+        if position is None:
+            continue
+
+        squares, turn, board = position
+        children = generator.children(squares, turn, board, data, resolved)
+        if not children:
+            expected = 2 if board.is_check() else DRAW
+        else:
+            losses = [value for value in children if value and not value & 1]
+            if losses:
+                expected = min(losses) - 1
+            elif DRAW in children:
+                expected = DRAW
+            else:
+                expected = max(children) + 3
+
+        if data[index] != expected:
+            errors += 1
+            if errors <= 10:
+                out.write("  %s: %s is %s, expected %s\n" % (name, board.fen(), value_text(data[index]),
+                                                             value_text(expected)))
+    return errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate, check and probe endgame tables of up to %d pieces."
+                                                 % MAX_PIECES)
+    parser.add_argument('--dir', default=DEFAULT_DIRECTORY, help="table directory (default %(default)s)")
+    commands = parser.add_subparsers(dest='command')
+
+    generate = commands.add_parser('generate', help="build tables and the smaller tables they need")
+    generate.add_argument('tables', nargs='*', help="material, e.g. KQvK KRvK KPvK")
+    generate.add_argument('--pieces', type=int, help="every table with this many pieces")
+
+    verify = commands.add_parser('verify', help="check tables against their children")
+    verify.add_argument('tables', nargs='*', help="material (default: every table of the directory)")
+
+    probe = commands.add_parser('probe', help="value and best move of a position")
+    probe.add_argument('fen', help="position")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'generate':
+        names = list(args.tables)
+        if args.pieces is not None:
+            if not 3 <= args.pieces <= MAX_PIECES:
+                parser.error("--pieces must be between 3 and %d" % MAX_PIECES)
+            names.extend(all_tables(args.pieces))
+        if not names:
+            parser.error("no tables given")
+
+        os.makedirs(args.dir, exist_ok=True)
+        for name in names:
+            try:
+                built = generate_table(name, args.dir, sys.stdout)
+            except ValueError as error:
+                parser.error(str(error))
+            for table in built:
+                print("Wrote %s" % os.path.join(args.dir, table + TABLE_SUFFIX))
+        return 0
+
+    if args.command == 'verify':
+        names = args.tables or sorted(open_tables(args.dir).names, key=lambda name: (len(name), name))
+        errors = 0
+        for name in names:
+            table_errors = verify_table(name, args.dir)
+            print("%-8s %s" % (name, 'ok' if not table_errors else '%d errors' % table_errors))
+            errors += table_errors
+        return 1 if errors else 0
+
+    if args.command == 'probe':
+        try:
+            board = chess.Board(args.fen)
+        except ValueError as error:
+            parser.error("invalid FEN %r: %s" % (args.fen, error))
+
+        tables = open_tables(args.dir)
+        value = tables.probe(board)
+        if value is None:
+            print("Not in the tables")
+            return 1
+        print("%s: %s" % (board.fen(), value_text(value)))
+        result = table_move(board, tables)
+        if result is not None and result[0] is not None:
+            print("Best move %s" % board.san(result[0]))
+        return 0
+
+    parser.print_help()
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,206 @@
+import threading
+
+from move_ordering import MoveOrderer
+from search_context import SearchAborted, SearchContext
+from transposition_table import shared_table
+
+
+# Runs find_best_move / find_best_move_2 on a background thread, one search at a time.
+# The search works on a copy of the board; the result is handed to on_result(search_id, move)
+# from the worker thread, unless the search was cancelled or replaced in the meantime.
+#
+# Between moves the thread can ponder on the opponent's time (start_ponder). predict(board)
+# returns the reply the last search expects (e.g. Minimax_w_AB.expected_reply) or None.
+# With a fixed depth the replies are answered one after another, the predicted one first;
+# with a time or node budget the predicted reply is searched without a budget until it is
+# played. start_search then answers at once, or turns the running ponder search into the
+# real one, with its transposition table, killers and history already warm. After a miss the
+# new search starts from the killers and history of the last ponder search, and each reply
+# pondered at a fixed depth from those of the reply before it.
+class EngineThread:
+
+    def __init__(self, search, on_result, tt=shared_table, predict=None):
+        self.search = search
+        self.on_result = on_result
+        self.tt = tt
+        self.predict = predict
+
+        self.lock = threading.Lock()
+        self.search_id = 0
+        self.context = None
+        self.thread = None
+        self.depth = None
+
+        # Pondering state
+        self.ponder_settings = None  # Settings of the search the ponder results are valid for
+        self.ponder_results = {}  # FEN after a reply -> answer found while pondering
+        self.ponder_fen = None  # Position the running ponder search is on
+        self.ponder_hit_id = None  # Search id the running ponder search now reports to
+        self.ponder_tables = None  # Killers and history of the last ponder search
+
+    # Start searching a copy of the board; any running search is cancelled first
+    def start_search(self, board, depth=None, time_limit_ms=None, node_limit=None, **options):
+        settings = search_settings(depth, time_limit_ms, node_limit, options)
+        fen = board.fen()
+        move = None
+        tables = None
+
+        with self.lock:
+            if self.ponder_settings == settings:
+                if fen == self.ponder_fen and self.ponder_hit_id is None:
+                    # Ponder hit: the running search goes on as the real one
+                    self.search_id += 1
+                    self.ponder_hit_id = self.search_id
+                    self.context.ponder_hit(time_limit_ms, node_limit)
+                    return self.search_id
+
+                move = self.ponder_results.get(fen)
+                tables = self.ponder_tables
+
+        if move is not None and move in board.legal_moves:
+            # Answered while pondering
+            self.cancel()
+            with self.lock:
+                self.search_id += 1
+                search_id = self.search_id
+            self.on_result(search_id, move)
+            return search_id
+
+        self.cancel()
+
+        context = SearchContext(tt=self.tt, time_limit_ms=time_limit_ms, node_limit=node_limit, **options)
+        context.previous_tables = tables
+        with self.lock:
+            self.search_id += 1
+            search_id = self.search_id
+            self.context = context
+            self.depth = depth
+
+        self.thread = threading.Thread(target=self._run, args=(search_id, board.copy(), depth, context), daemon=True)
+        self.thread.start()
+        return search_id
+
+    def _run(self, search_id, board, depth, context):
+        try:
+            move = self.search(board, depth=depth, context=context)
+        except SearchAborted:
+            return  # Cancelled during a fixed depth search
+
+        with self.lock:
+            if search_id != self.search_id or context.stopped:
+                return
+            self.context = None
+
+        self.on_result(search_id, move)
+
+    # Search the opponent's replies on the board while waiting for their move. Takes the
+    # settings the next start_search will use; other settings simply miss the ponder results.
+    def start_ponder(self, board, depth=None, time_limit_ms=None, node_limit=None, **options):
+        self.cancel()
+
+        replies = MoveOrderer().order(board, list(board.legal_moves))
+        if not replies:
+            return
+
+        predicted = self.predict(board) if self.predict is not None else None
+        if predicted in replies:
+            replies.remove(predicted)
+            replies.insert(0, predicted)
+
+        budget = time_limit_ms is not None or node_limit is not None
+        if budget:
+            replies = replies[:1]
+
+        with self.lock:
+            self.search_id += 1
+            search_id = self.search_id
+            self.ponder_settings = search_settings(depth, time_limit_ms, node_limit, options)
+            self.depth = depth
+
+        self.thread = threading.Thread(target=self._ponder, args=(search_id, board.copy(), replies, depth, budget, options),
+                                       daemon=True)
+        self.thread.start()
+
+    def _ponder(self, search_id, board, replies, depth, budget, options):
+        tables = None
+        for reply in replies:
+            board.push(reply)
+
+            # The budget only starts counting at the ponder hit
+            context = SearchContext(tt=self.tt, **options)
+            context.pondering = budget
+            context.previous_tables = tables
+            tables = context.tables
+            with self.lock:
+                if search_id != self.search_id:
+                    return
+                self.context = context
+                self.ponder_fen = board.fen()
+                self.ponder_tables = tables
+
+            try:
+                move = self.search(board, depth=depth, context=context)
+            except SearchAborted:
+                return
+
+            with self.lock:
+                hit_id = self.ponder_hit_id
+                if hit_id is not None and hit_id == self.search_id:
+                    self.context = None
+                    self.clear_ponder()
+                elif search_id != self.search_id or context.stopped:
+                    return
+                else:
+                    hit_id = None
+                    self.ponder_results[self.ponder_fen] = move
+                    self.ponder_fen = None
+                    self.context = None
+
+            if hit_id is not None:
+                self.on_result(hit_id, move)
+                return
+
+            board.pop()
+
+    def clear_ponder(self):
+        self.ponder_settings = None
+        self.ponder_results = {}
+        self.ponder_fen = None
+        self.ponder_hit_id = None
+        self.ponder_tables = None
+
+    # Stop the running search and drop its result. Waits for the worker to unwind so two
+    # searches never write to the shared transposition table at the same time.
+    def cancel(self):
+        with self.lock:
+            self.search_id += 1
+            context = self.context
+            self.context = None
+            thread = self.thread
+            self.clear_ponder()
+
+        if context is not None:
+            context.stop()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def is_thinking(self):
+        return self.context is not None and not self.is_pondering()
+
+    def is_pondering(self):
+        return self.context is not None and self.ponder_settings is not None and self.ponder_hit_id is None
+
+    # (depth being searched, nodes so far) of the running search, for a thinking indicator
+    def progress(self):
+        context = self.context
+        if context is None:
+            return 0, 0
+
+        if context.has_limits():
+            return context.completed_depth + 1, context.nodes
+        return self.depth, context.nodes
+
+
+# Everything that has to match for a ponder result to answer a search
+def search_settings(depth, time_limit_ms, node_limit, options):
+    return depth, time_limit_ms, node_limit, sorted(options.items())
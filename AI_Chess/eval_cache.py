@@ -0,0 +1,72 @@
+from array import array
+
+from evaluation import legal_mobility
+from transposition_table import MASK_64, position_key
+
+# Default size, shared by both engines
+EVAL_CACHE_SIZE_MB = 4
+
+# Bytes per entry: key (8) + score (8)
+EVAL_ENTRY_SIZE = 16
+
+# Key salt of positions evaluated with another mobility term than the legal move counts
+# (an IncrementalBoard with attack mobility scores the same position differently)
+MOBILITY_KEY = 0x6A09E667F3BCC908
+
+
+# Largest power of two number of entries that fits in the memory budget
+def table_entries(size_mb, entry_size):
+    entries = max(1, int(size_mb * 1024 * 1024) // entry_size)
+    return 1 << (entries.bit_length() - 1)
+
+
+# Key of the static evaluation of a position, salted per engine
+def eval_key(board, salt):
+    if getattr(board, 'mobility', legal_mobility) is not legal_mobility:
+        salt ^= MOBILITY_KEY
+    return position_key(board, salt)
+
+
+# Fixed-size cache of static evaluations, keyed on the Zobrist hash. Every slot holds the key
+# xor the score, so a slot half written by another thread reads as a miss and never returns
+# the score of a different position.
+class EvalCache:
+
+    def __init__(self, size_mb=EVAL_CACHE_SIZE_MB):
+        self.size_mb = size_mb
+        self.size = table_entries(size_mb, EVAL_ENTRY_SIZE)
+        self.mask = self.size - 1
+        self.clear()
+
+    def clear(self):
+        self.keys = array('Q', bytes(8 * self.size))
+        self.scores = array('q', bytes(8 * self.size))
+        self.hits = 0
+        self.misses = 0
+
+    # The cached score of the key, or None
+    def probe(self, key):
+        key &= MASK_64
+        index = key & self.mask
+        score = self.scores[index]
+
+        if self.keys[index] ^ (score & MASK_64) != key:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return score
+
+    def store(self, key, score):
+        key &= MASK_64
+        index = key & self.mask
+        self.scores[index] = score
+        self.keys[index] = key ^ (score & MASK_64)
+
+    def hit_rate(self):
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
+
+
+# Shared by both engines and all searches of the process, like the transposition table
+shared_eval_cache = EvalCache()
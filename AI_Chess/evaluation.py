@@ -0,0 +1,341 @@
+import chess
+
+# Material values (the king counts 0, as piece_values.get(chess.KING, 0) does in evaluate_board)
+PIECE_VALUES = [0, 100, 320, 330, 500, 900, 0]
+
+# Piece-square tables, indexed by square for white
+PAWN_TABLE = [
+    0, 0, 0, 0, 0, 0, 0, 0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5, 5, 10, 25, 25, 10, 5, 5,
+    0, 0, 0, 20, 20, 0, 0, 0,
+    5, -5, -10, 0, 0, -10, -5, 5,
+    5, 10, 10, -20, -20, 10, 10, 5,
+    0, 0, 0, 0, 0, 0, 0, 0
+]
+
+KNIGHT_TABLE = [
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20, 0, 0, 0, 0, -20, -40,
+    -30, 0, 10, 15, 15, 10, 0, -30,
+    -30, 5, 15, 20, 20, 15, 5, -30,
+    -30, 0, 15, 20, 20, 15, 0, -30,
+    -30, 5, 10, 15, 15, 10, 5, -30,
+    -40, -20, 0, 5, 5, 0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+]
+
+BISHOP_TABLE = [
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 10, 10, 5, 0, -10,
+    -10, 5, 5, 10, 10, 5, 5, -10,
+    -10, 0, 10, 10, 10, 10, 0, -10,
+    -10, 10, 10, 10, 10, 10, 10, -10,
+    -10, 5, 0, 0, 0, 0, 5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+]
+
+ROOK_TABLE = [
+    0, 0, 0, 0, 0, 0, 0, 0,
+    5, 10, 10, 10, 10, 10, 10, 5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    0, 0, 0, 5, 5, 0, 0, 0
+]
+
+QUEEN_TABLE = [
+    -20, -10, -10, -5, -5, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 5, 5, 5, 0, -10,
+    -5, 0, 5, 5, 5, 5, 0, -5,
+    0, 0, 5, 5, 5, 5, 0, -5,
+    -10, 5, 5, 5, 5, 5, 0, -10,
+    -10, 0, 5, 0, 0, 0, 0, -10,
+    -20, -10, -10, -5, -5, -10, -10, -20
+]
+
+KING_TABLE = [
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    20, 20, 0, 0, 0, 0, 20, 20,
+    20, 30, 10, 0, 0, 10, 30, 20
+]
+
+PIECE_TABLES = [None, PAWN_TABLE, KNIGHT_TABLE, BISHOP_TABLE, ROOK_TABLE, QUEEN_TABLE, KING_TABLE]
+
+MATE_SCORE = 100000
+
+# Mobility terms
+MOBILITY_LEGAL = 'legal'  # Legal move counts, as evaluate_board does
+MOBILITY_ATTACKS = 'attacks'  # Pseudo-legal attack bitboards, no move generation
+
+
+# Material + piece-square score of one piece, as evaluate_board adds it up.
+# evaluate_board returns white_score - black_score where black_score accumulates the black
+# pieces negatively, so both colours add to the result. Black looks its square up in the
+# reversed table at square_mirror(square), which is the same entry as table[square ^ 7].
+def _build_piece_square_scores():
+    scores = [None, None]
+    for color in chess.COLORS:
+        by_type = [None]
+        for piece_type in chess.PIECE_TYPES:
+            table = PIECE_TABLES[piece_type]
+            if color == chess.WHITE:
+                by_type.append([PIECE_VALUES[piece_type] + table[square] for square in chess.SQUARES])
+            else:
+                by_type.append([PIECE_VALUES[piece_type] + table[square ^ 7] for square in chess.SQUARES])
+        scores[color] = by_type
+    return scores
+
+
+# PIECE_SQUARE_SCORES[color][piece_type][square]
+PIECE_SQUARE_SCORES = _build_piece_square_scores()
+
+
+# Summed scores of the pieces on every combination of the eight squares of one bitboard byte
+def _build_piece_square_bytes():
+    tables = [None, None]
+    for color in chess.COLORS:
+        by_type = [None]
+        for piece_type in chess.PIECE_TYPES:
+            scores = PIECE_SQUARE_SCORES[color][piece_type]
+            by_byte = []
+            for byte in range(8):
+                table = [0] * 256
+                for bits in range(1, 256):
+                    low = bits & -bits
+                    table[bits] = table[bits ^ low] + scores[byte * 8 + low.bit_length() - 1]
+                by_byte.append(table)
+            by_type.append(by_byte)
+        tables[color] = by_type
+    return tables
+
+
+# PIECE_SQUARE_BYTES[color][piece_type][byte][bits]: material + piece-square score of the pieces
+# on the set bits of byte number byte (a rank) of the piece type's bitboard
+PIECE_SQUARE_BYTES = _build_piece_square_bytes()
+
+
+# Full material + piece-square score of a position
+def material_pst(board):
+    score = 0
+    for color in chess.COLORS:
+        color_scores = PIECE_SQUARE_SCORES[color]
+        for piece_type in chess.PIECE_TYPES:
+            table = color_scores[piece_type]
+            for square in chess.scan_reversed(board.pieces_mask(piece_type, color)):
+                score += table[square]
+    return score
+
+
+# material_pst from the byte tables: at most eight lookups per piece bitboard, one per
+# occupied rank, instead of one per piece
+def byte_material_pst(board):
+    score = 0
+    for color in chess.COLORS:
+        own = board.occupied_co[color]
+        tables = PIECE_SQUARE_BYTES[color]
+        for piece_type, pieces in ((chess.PAWN, board.pawns), (chess.KNIGHT, board.knights),
+                                   (chess.BISHOP, board.bishops), (chess.ROOK, board.rooks),
+                                   (chess.QUEEN, board.queens), (chess.KING, board.kings)):
+            pieces &= own
+            by_byte = tables[piece_type]
+            byte = 0
+            while pieces:
+                bits = pieces & 0xFF
+                if bits:
+                    score += by_byte[byte][bits]
+                pieces >>= 8
+                byte += 1
+    return score
+
+
+# Change of material_pst caused by a move, computed before the move is pushed
+def move_delta(board, move):
+    if not move:
+        return 0  # Null move
+
+    color = board.turn
+    from_square = move.from_square
+    to_square = move.to_square
+    piece_type = board.piece_type_at(from_square)
+    own = PIECE_SQUARE_SCORES[color]
+
+    if piece_type == chess.KING and board.is_castling(move):
+        rank = chess.square_rank(from_square)
+        if board.is_kingside_castling(move):
+            king_to = chess.square(6, rank)
+            rook_to = chess.square(5, rank)
+            rook_from = to_square if board.chess960 else chess.square(7, rank)
+        else:
+            king_to = chess.square(2, rank)
+            rook_to = chess.square(3, rank)
+            rook_from = to_square if board.chess960 else chess.square(0, rank)
+
+        return (own[chess.KING][king_to] - own[chess.KING][from_square]
+                + own[chess.ROOK][rook_to] - own[chess.ROOK][rook_from])
+
+    delta = own[move.promotion or piece_type][to_square] - own[piece_type][from_square]
+
+    if piece_type == chess.PAWN and to_square == board.ep_square and board.is_en_passant(move):
+        delta -= PIECE_SQUARE_SCORES[not color][chess.PAWN][to_square ^ 8]
+    else:
+        captured_type = board.piece_type_at(to_square)
+        if captured_type:
+            delta -= PIECE_SQUARE_SCORES[not color][captured_type][to_square]
+
+    return delta
+
+
+# Same value as evaluate_piece_mobility in the engine modules
+def legal_mobility(board):
+    side_mobility = board.legal_moves.count()
+    board.turn = not board.turn  # Switch sides temporarily
+    other_mobility = board.legal_moves.count()
+    board.turn = not board.turn  # Switch back
+
+    return side_mobility - other_mobility
+
+
+# Number of pseudo-legal destination squares of one side, from attack bitboards
+def side_attack_mobility(board, color):
+    occupied = board.occupied
+    own = board.occupied_co[color]
+    enemy = board.occupied_co[not color]
+    targets = ~own & chess.BB_ALL
+    popcount = chess.popcount
+    count = 0
+
+    for square in chess.scan_reversed(board.knights & own):
+        count += popcount(chess.BB_KNIGHT_ATTACKS[square] & targets)
+
+    for square in chess.scan_reversed((board.bishops | board.queens) & own):
+        count += popcount(chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied] & targets)
+
+    for square in chess.scan_reversed((board.rooks | board.queens) & own):
+        attacks = (chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied]
+                   | chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied])
+        count += popcount(attacks & targets)
+
+    for square in chess.scan_reversed(board.kings & own):
+        count += popcount(chess.BB_KING_ATTACKS[square] & targets)
+
+    # Pawns: single pushes to empty squares and captures of enemy pieces, all pawns at once
+    pawns = board.pawns & own
+    empty = ~occupied & chess.BB_ALL
+    if color == chess.WHITE:
+        count += popcount((pawns << 8) & empty)
+        count += popcount(((pawns & ~chess.BB_FILE_A) << 7) & enemy)
+        count += popcount(((pawns & ~chess.BB_FILE_H) << 9) & enemy)
+    else:
+        count += popcount((pawns >> 8) & empty)
+        count += popcount(((pawns & ~chess.BB_FILE_A) >> 9) & enemy)
+        count += popcount(((pawns & ~chess.BB_FILE_H) >> 7) & enemy)
+
+    return count
+
+
+# Mobility of the side to move minus the other side (the orientation of legal_mobility),
+# from attack bitboards. Reads the board only, so it is safe to call from several threads.
+def attack_mobility(board):
+    return side_attack_mobility(board, board.turn) - side_attack_mobility(board, not board.turn)
+
+
+MOBILITY_FUNCTIONS = {
+    MOBILITY_LEGAL: legal_mobility,
+    MOBILITY_ATTACKS: attack_mobility,
+}
+
+
+# Board that keeps the material + piece-square part of evaluate_board as running state.
+# Only push and pop keep the score current; call refresh() after editing the board directly.
+class IncrementalBoard(chess.Board):
+
+    def __init__(self, fen=chess.STARTING_FEN, *, chess960=False):
+        super().__init__(fen, chess960=chess960)
+        self.mobility = legal_mobility
+        self.refresh()
+
+    # Copy of any chess.Board, including its move stack
+    @classmethod
+    def from_board(cls, board):
+        incremental = cls(None, chess960=board.chess960)
+        incremental.set_fen(board.root().fen())
+        for move in board.move_stack:
+            chess.Board.push(incremental, move)
+        incremental.refresh()
+        return incremental
+
+    # Recompute the running score from scratch
+    def refresh(self):
+        self.material_score = material_pst(self)
+        self.score_stack = [None] * len(self.move_stack)
+
+    def push(self, move):
+        self.score_stack.append(self.material_score)
+        self.material_score += move_delta(self, move)
+        super().push(move)
+
+    def pop(self):
+        move = super().pop()
+        previous = self.score_stack.pop() if self.score_stack else None
+        self.material_score = previous if previous is not None else material_pst(self)
+        return move
+
+    def copy(self, *, stack=True):
+        board = super().copy(stack=stack)
+        board.mobility = self.mobility
+        board.material_score = self.material_score
+        board.score_stack = self.score_stack[len(self.score_stack) - len(board.move_stack):]
+        return board
+
+    # Exactly the value of evaluate_board, with the material and piece-square terms in O(1).
+    # King safety and center control are added to both sides in evaluate_board and cancel
+    # out; evaluate_pawn_structure only ever compares a pawn with its own square and is
+    # always 0, so neither needs to be computed here. The value differs from evaluate_board
+    # only when the board uses attack_mobility.
+    def evaluate(self):
+        if self.is_checkmate():
+            return -MATE_SCORE if self.turn == chess.WHITE else MATE_SCORE
+        elif self.is_stalemate():
+            return 0
+
+        return self.material_score + 2 * self.mobility(self)
+
+
+# Bit-for-bit the value of evaluate_board in both engine modules, without its per-call tables
+# and square loop. Material and piece-square terms come from the byte tables. King safety and
+# center control are added to both sides and cancel, and evaluate_pawn_structure is always 0,
+# so none of them changes the value. The legal moves of the side to move are counted once, for
+# the checkmate and stalemate test and for the mobility term.
+def bitboard_evaluate(board):
+    side_mobility = board.legal_moves.count()
+    if not side_mobility:
+        if board.is_check():
+            return -MATE_SCORE if board.turn == chess.WHITE else MATE_SCORE
+        return 0
+
+    board.turn = not board.turn  # Switch sides temporarily
+    other_mobility = board.legal_moves.count()
+    board.turn = not board.turn  # Switch back
+
+    return byte_material_pst(board) + 2 * (side_mobility - other_mobility)
+
+
+# The board a search runs on for the evaluation options of its SearchContext
+def search_board(board, context):
+    if not context.incremental_eval and context.mobility == MOBILITY_LEGAL:
+        return board
+
+    incremental = IncrementalBoard.from_board(board)
+    incremental.mobility = MOBILITY_FUNCTIONS[context.mobility]
+    return incremental
@@ -0,0 +1,49 @@
+import argparse
+import sys
+
+import chess
+
+# Engine entry points without the GUI: nothing here imports pygame or loads piece images,
+# so server workers start fast and need no display. Run AI_Chess.py for the GUI.
+from Minimax_w_AB import find_best_move
+from Minimax_w_AB_2 import find_best_move_2
+from search_context import SearchContext
+from transposition_table import shared_table
+
+# Search function of every engine, by the names used in parallel_search.ENGINES
+SEARCH_FUNCTIONS = {
+    'minimax_w_ab': find_best_move,
+    'minimax_w_ab_2': find_best_move_2,
+}
+
+
+# Best move in UCI notation for a FEN, e.g. best_move(fen, depth=2) or best_move(fen, time_limit_ms=500).
+# options are passed on to the SearchContext (mobility, quiescence, ...)
+def best_move(fen, engine='minimax_w_ab', depth=None, time_limit_ms=None, node_limit=None, **options):
+    board = chess.Board(fen)
+    context = SearchContext(tt=shared_table, time_limit_ms=time_limit_ms, node_limit=node_limit, **options)
+
+    move = SEARCH_FUNCTIONS[engine](board, depth=depth, context=context)
+    return move.uci() if move else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print the engine's move for a position, without the GUI.")
+    parser.add_argument('fen', nargs='?', default=chess.STARTING_FEN, help="position (default: start position)")
+    parser.add_argument('--engine', default='minimax_w_ab', choices=sorted(SEARCH_FUNCTIONS))
+    parser.add_argument('--depth', type=int, help="fixed search depth (default 2 without a budget)")
+    parser.add_argument('--time-limit', type=int, metavar='MS', help="time budget in milliseconds")
+    parser.add_argument('--nodes', type=int, help="node budget")
+    args = parser.parse_args(argv)
+
+    depth = args.depth
+    if depth is None and args.time_limit is None and args.nodes is None:
+        depth = 2
+
+    move = best_move(args.fen, args.engine, depth, args.time_limit, args.nodes)
+    print(move or '(none)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,189 @@
+import chess
+
+# Ordering modes for captures
+ORDER_MVV_LVA = 'mvv_lva'  # Most valuable victim, least valuable attacker
+ORDER_SEE = 'see'  # Static exchange evaluation; losing captures go after the quiet moves
+
+# Piece values used for exchanges (the king only ever captures last)
+SEE_VALUES = [0, 100, 320, 330, 500, 900, 20000]
+
+# Ordering bands, highest first
+HASH_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 28
+KILLER_SCORES = (1 << 27, (1 << 27) - 1)
+HISTORY_MAX = 1 << 26
+LOSING_CAPTURE_SCORE = -(1 << 28)
+
+# Deepest ply with killer slots
+MAX_PLY = 128
+
+# Capture killer slots per ply (Minimax_w_AB_2 remembers the last captures that were searched)
+CAPTURE_KILLERS = 3
+
+
+# Pieces of one colour attacking a square when only the pieces in occupied are on the board
+def attackers_mask(board, color, square, occupied):
+    queens_and_rooks = board.queens | board.rooks
+    queens_and_bishops = board.queens | board.bishops
+
+    attackers = (
+        (chess.BB_KING_ATTACKS[square] & board.kings)
+        | (chess.BB_KNIGHT_ATTACKS[square] & board.knights)
+        | (chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied] & queens_and_rooks)
+        | (chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied] & queens_and_rooks)
+        | (chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied] & queens_and_bishops)
+        | (chess.BB_PAWN_ATTACKS[not color][square] & board.pawns))
+
+    return attackers & board.occupied_co[color] & occupied
+
+
+# Type of the piece a move captures (a pawn for en passant), or 0 for quiet moves
+def captured_piece_type(board, move):
+    return captured_type(board, move.from_square, move.to_square)
+
+
+def captured_type(board, from_square, to_square):
+    if chess.BB_SQUARES[to_square] & board.occupied_co[not board.turn]:
+        return board.piece_type_at(to_square)
+    if to_square == board.ep_square and chess.BB_SQUARES[from_square] & board.pawns:
+        return chess.PAWN
+    return 0
+
+
+# Static exchange evaluation: material won by the side to move when both sides keep
+# recapturing on the target square with their least valuable attacker
+def see(board, move):
+    return static_exchange(board, move.from_square, move.to_square, move.promotion)
+
+
+# see() on the squares of a move; board only needs chess.Board's bitboard attributes
+def static_exchange(board, from_square, to_square, promotion):
+    captured = captured_type(board, from_square, to_square)
+
+    occupied = board.occupied ^ chess.BB_SQUARES[from_square]
+    if captured == chess.PAWN and to_square == board.ep_square and not board.piece_type_at(to_square):
+        occupied ^= chess.BB_SQUARES[to_square ^ 8]
+
+    gain = [SEE_VALUES[captured]]
+    piece_value = SEE_VALUES[board.piece_type_at(from_square)]
+    if promotion:
+        gain[0] += SEE_VALUES[promotion] - SEE_VALUES[chess.PAWN]
+        piece_value = SEE_VALUES[promotion]
+
+    side = not board.turn
+    while True:
+        attackers = attackers_mask(board, side, to_square, occupied)
+        if not attackers:
+            break
+
+        # Recapture with the least valuable attacker; x-rays appear as occupied shrinks
+        for piece_type in chess.PIECE_TYPES:
+            candidates = attackers & board.pieces_mask(piece_type, side)
+            if candidates:
+                break
+
+        gain.append(piece_value - gain[-1])
+        piece_value = SEE_VALUES[piece_type]
+        occupied ^= chess.BB_SQUARES[chess.lsb(candidates)]
+        side = not side
+
+    # Each side may stop recapturing when that is better for it
+    for d in range(len(gain) - 1, 0, -1):
+        gain[d - 1] = -max(-gain[d - 1], gain[d])
+
+    return gain[0]
+
+
+# Killer slots per ply and a from/to history of one search. Everything has a fixed size, so memory
+# stays flat over long sessions, and every SearchContext has its own tables, so concurrent
+# searches never share them. age() halves the history between iterations.
+class SearchTables:
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.capture_killers = [[None] * CAPTURE_KILLERS for _ in range(MAX_PLY)]
+        self.history = [0] * 4096  # Indexed by from_square * 64 + to_square
+
+    # Start from the killers and history of another search
+    def copy_from(self, other):
+        self.killers = [killers[:] for killers in other.killers]
+        self.capture_killers = [killers[:] for killers in other.capture_killers]
+        self.history = other.history[:]
+
+    def age(self):
+        self.history = [score // 2 for score in self.history]
+
+    def history_score(self, move):
+        return self.history[move.from_square * 64 + move.to_square]
+
+    def add_history(self, move, depth):
+        self.add_history_at(move.from_square * 64 + move.to_square, depth)
+
+    def add_history_at(self, index, depth):
+        self.history[index] += depth * depth
+        if self.history[index] >= HISTORY_MAX:
+            self.age()
+
+    def add_killer(self, move, ply):
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+
+    # Most recent first; a capture already in the slots is not added twice
+    def add_capture_killer(self, move, ply):
+        if ply < MAX_PLY:
+            killers = self.capture_killers[ply]
+            if move not in killers:
+                killers.insert(0, move)
+                killers.pop()
+
+
+# Hash move, then captures and promotions, then killers, then history
+class MoveOrderer(SearchTables):
+
+    def __init__(self, mode=ORDER_MVV_LVA):
+        if mode not in (ORDER_MVV_LVA, ORDER_SEE):
+            raise ValueError("Unknown move ordering: %r" % (mode,))
+
+        self.mode = mode
+        SearchTables.__init__(self)
+
+    def score_move(self, board, move, hash_move, ply):
+        if move == hash_move:
+            return HASH_MOVE_SCORE
+
+        captured = captured_piece_type(board, move)
+        if captured or move.promotion:
+            if self.mode == ORDER_SEE:
+                exchange = see(board, move)
+                if exchange < 0:
+                    return LOSING_CAPTURE_SCORE + exchange
+                return CAPTURE_SCORE + exchange
+
+            victim = captured + (move.promotion or 0)
+            return CAPTURE_SCORE + victim * 8 - board.piece_type_at(move.from_square)
+
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if move == killers[0]:
+                return KILLER_SCORES[0]
+            if move == killers[1]:
+                return KILLER_SCORES[1]
+
+        return self.history[move.from_square * 64 + move.to_square]
+
+    def order(self, board, moves, hash_move=None, ply=0):
+        return sorted(moves, key=lambda move: -self.score_move(board, move, hash_move, ply))
+
+    # A move caused a beta cut-off: remember quiet moves as killers and in the history
+    def record_cutoff(self, board, move, depth, ply):
+        if captured_piece_type(board, move) or move.promotion:
+            return
+
+        self.add_killer(move, ply)
+        self.add_history(move, depth)
@@ -0,0 +1,427 @@
+import chess
+
+from endgame_tables import open_tables, table_score
+from evaluation import MATE_SCORE
+from quiescence import DELTA_MARGIN, QUIESCENCE_CAPTURES, tactical_gain, tactical_moves
+from move_ordering import MAX_PLY, see
+from transposition_table import EXACT, LOWER, UPPER, BLACK_ROOT_KEY, NEGAMAX_KEY, position_key
+
+# Search modes
+SEARCH_NEGAMAX = 'negamax'  # Negamax with PVS, aspiration windows and null-move pruning (this module)
+SEARCH_MINIMAX = 'minimax'  # The engines' original min/max search
+
+INFINITE = 2 * MATE_SCORE
+
+# Scores beyond this are mates; they are stored in the transposition table relative to the node
+MATE_BOUND = MATE_SCORE - 1000
+
+# Half width of the first aspiration window around the previous iteration's score
+ASPIRATION_WINDOW = 50
+ASPIRATION_MIN_DEPTH = 2
+
+# Depth reduction of the null-move search (as in Minimax_w_AB_2)
+NULL_MOVE_REDUCTION = 2
+
+# Late move reductions: quiet moves after the first LMR_FULL_DEPTH_MOVES are searched LMR_REDUCTION
+# plies shallower (one more after LMR_DEEP_MOVES) and searched again at full depth if they beat alpha
+LMR_MIN_DEPTH = 3
+LMR_FULL_DEPTH_MOVES = 3
+LMR_DEEP_MOVES = 8
+LMR_REDUCTION = 1
+
+# Futility pruning: at these remaining depths quiet moves are skipped when the static evaluation
+# plus the margin cannot reach alpha
+FUTILITY_MARGINS = (0, 200, 350)
+
+# Razoring: at these remaining depths a static evaluation this far below alpha drops into quiescence
+RAZOR_MARGINS = (0, 300, 500, 700)
+
+
+# Key salt of an engine's negamax entries. The engines score positions for the side to move at
+# the root, so the same position searched for White and for Black has different scores.
+def negamax_salt(engine_key, root_turn):
+    return engine_key ^ NEGAMAX_KEY ^ (BLACK_ROOT_KEY if root_turn == chess.BLACK else 0)
+
+
+def score_to_tt(score, ply):
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_tt(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+# The side to move has something besides pawns and the king (null moves are unsafe in zugzwang
+# prone pawn endings)
+def has_pieces(board):
+    own = board.occupied_co[board.turn]
+    return bool(own & ~(board.pawns | board.kings))
+
+
+# Single negamax core for find_best_move and find_best_move_2.
+#
+# evaluate(board) is the engine's static evaluation. The min/max search maximizes it for the side
+# to move at the root and minimizes it for the other side; here it is negated on the other
+# side's nodes, which gives the same values at every depth. On top of plain alpha-beta the core
+# searches every move after the first with a zero window (PVS), searches the root inside an
+# aspiration window around the previous iteration's score and, with null_move=True, prunes with
+# a reduced null-move search outside of PV nodes, checks and pawn endings. The context switches
+# lmr, futility and razoring turn on the reductions and pruning near the leaves; each is counted
+# in the SearchStats. With context.endgame_tables, positions the tables hold are scored from
+# them (exact mate distances or draws) without searching further. Everything that touches moves
+# or keys goes through the methods below search(), so a subclass can run the same core on
+# another board (see compact_search.py).
+class Negamax:
+
+    NULL_MOVE = chess.Move.null()
+
+    def __init__(self, context, evaluate, engine_key, root_turn, null_move=False):
+        self.context = context
+        self.evaluate_board = evaluate
+        self.root_turn = root_turn
+        self.salt = negamax_salt(engine_key, root_turn)
+        self.null_move = null_move
+        self.endgames = open_tables(context.endgame_tables) if context.endgame_tables is not None else None
+
+    def evaluate(self, board):
+        context = self.context
+        if context.timing:
+            score = context.stats.timed_eval(self.evaluate_board, board)
+        else:
+            score = self.evaluate_board(board)
+        return score if board.turn == self.root_turn else -score
+
+    def order_moves(self, board, hash_move, ply):
+        context = self.context
+        if context.timing:
+            moves = context.stats.timed_movegen(list, board.legal_moves)
+        else:
+            moves = list(board.legal_moves)
+
+        if context.orderer is not None:
+            return context.orderer.order(board, moves, hash_move, ply)
+
+        if hash_move is not None and hash_move in moves:
+            moves.remove(hash_move)
+            moves.insert(0, hash_move)
+        return moves
+
+    # Same contract as the engines' search_root: (best_move, best_score, moves ordered best first)
+    def search_root(self, board, depth, context, root_moves=None):
+        tt = context.tt
+        key = self.key(board) if tt is not None else None
+
+        if root_moves is None:
+            moves = self.order_moves(board, self.hash_move(tt, key) if tt is not None else None, 0)
+        else:
+            moves = list(root_moves)
+
+        if not moves:
+            return None, (-MATE_SCORE if board.is_check() else 0), []
+
+        # Aspiration window around the previous iteration's score, widened on a fail
+        previous = context.best_score
+        delta = ASPIRATION_WINDOW
+        if depth >= ASPIRATION_MIN_DEPTH and previous is not None and abs(previous) < MATE_BOUND:
+            alpha = max(-INFINITE, previous - delta)
+            beta = min(INFINITE, previous + delta)
+        else:
+            alpha = -INFINITE
+            beta = INFINITE
+
+        while True:
+            best_move, best_score, scored_moves = self.root_pass(board, depth, moves, alpha, beta)
+
+            if best_score <= alpha and alpha > -INFINITE:
+                alpha = max(-INFINITE, alpha - delta)
+            elif best_score >= beta and beta < INFINITE:
+                beta = min(INFINITE, beta + delta)
+            else:
+                break
+
+            delta *= 2
+            if context.stats is not None:
+                context.stats.aspiration_researches += 1
+
+        if tt is not None:
+            self.store(tt, key, depth, best_score, EXACT, best_move)
+
+        # Best move first, the others by their (bound) scores; the stable sort keeps ties in order
+        scored_moves.sort(key=lambda item: -item[0])
+        ordered = [best_move] + [move for _, move in scored_moves if move != best_move]
+
+        return best_move, best_score, ordered
+
+    def root_pass(self, board, depth, moves, alpha, beta):
+        best_move = moves[0]
+        best_score = -INFINITE
+        scored_moves = []
+
+        for index, move in enumerate(moves):
+            board.push(move)
+            if index == 0:
+                score = -self.search(board, depth - 1, -beta, -alpha, 1)
+            else:
+                score = -self.search(board, depth - 1, -alpha - 1, -alpha, 1)
+                if alpha < score < beta:
+                    self.count_research()
+                    score = -self.search(board, depth - 1, -beta, -alpha, 1)
+            board.pop()
+
+            scored_moves.append((score, move))
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+
+        return best_move, best_score, scored_moves
+
+    def count_research(self):
+        if self.context.stats is not None:
+            self.context.stats.pvs_researches += 1
+
+    # Plies to take off a late move; 0 for the first moves, captures, promotions, killers and checks
+    def reduction(self, board, move, depth, index, ply):
+        if depth < LMR_MIN_DEPTH or index < LMR_FULL_DEPTH_MOVES:
+            return 0
+        if self.is_tactical(board, move):
+            return 0
+        if ply < MAX_PLY and move in self.context.tables.killers[ply]:
+            return 0
+        if board.gives_check(move):
+            return 0
+
+        reduction = LMR_REDUCTION + 1 if index >= LMR_DEEP_MOVES else LMR_REDUCTION
+        return min(reduction, depth - 2)
+
+    def search(self, board, depth, alpha, beta, ply, allow_null=True):
+        context = self.context
+        context.count_node()
+
+        if depth <= 0:
+            return self.quiescence(board, alpha, beta, ply)
+
+        endgames = self.endgames
+        if endgames is not None and chess.popcount(board.occupied) <= endgames.max_pieces:
+            value = endgames.probe(board)
+            if value is not None:
+                if context.stats is not None:
+                    context.stats.table_hits += 1
+                return table_score(value, ply)
+
+        pv_node = beta - alpha > 1
+        tt = context.tt
+
+        # Probe the transposition table; PV nodes only take the move
+        key = None
+        hash_move = None
+        if tt is not None:
+            key = self.key(board)
+            entry = self.probe(tt, key)
+
+            if entry is not None:
+                tt_depth, tt_score, tt_flag, hash_move = entry
+
+                if tt_depth >= depth and not pv_node:
+                    tt_score = score_from_tt(tt_score, ply)
+                    if tt_flag == EXACT:
+                        return tt_score
+                    if tt_flag == LOWER and tt_score >= beta:
+                        return tt_score
+                    if tt_flag == UPPER and tt_score <= alpha:
+                        return tt_score
+
+        in_check = board.is_check()
+
+        static_eval = None
+        if not pv_node and not in_check and ((context.futility and depth < len(FUTILITY_MARGINS))
+                                             or (context.razoring and depth < len(RAZOR_MARGINS))):
+            static_eval = self.evaluate(board)
+
+        # Razoring: far below alpha near the leaves, only captures can save the position
+        if context.razoring and static_eval is not None and depth < len(RAZOR_MARGINS):
+            if static_eval + RAZOR_MARGINS[depth] <= alpha:
+                score = self.quiescence(board, alpha, alpha + 1, ply)
+                if score <= alpha:
+                    if context.stats is not None:
+                        context.stats.razoring_cutoffs += 1
+                    return score
+
+        # Futility: no quiet move can lift the static evaluation to alpha
+        futile = (context.futility and static_eval is not None and depth < len(FUTILITY_MARGINS)
+                  and static_eval + FUTILITY_MARGINS[depth] <= alpha)
+
+        # Null move: if passing still fails high, a real move will too
+        if (self.null_move and allow_null and not pv_node and not in_check and depth > NULL_MOVE_REDUCTION
+                and has_pieces(board)):
+            board.push(self.NULL_MOVE)
+            score = -self.search(board, depth - 1 - NULL_MOVE_REDUCTION, -beta, -beta + 1, ply + 1, False)
+            board.pop()
+
+            if score >= beta:
+                if context.stats is not None:
+                    context.stats.null_move_cutoffs += 1
+                return beta  # Mate scores found after passing are not proven
+
+        moves = self.order_moves(board, hash_move, ply)
+        if not moves:
+            return -MATE_SCORE + ply if in_check else 0
+
+        alpha_orig = alpha
+        best_score = -INFINITE
+        best_move = None
+
+        for index, move in enumerate(moves):
+            if futile and index > 0 and not self.is_tactical(board, move) and not board.gives_check(move):
+                if context.stats is not None:
+                    context.stats.futility_pruned += 1
+                continue
+
+            reduction = 0
+            if context.lmr and index > 0 and not in_check:
+                reduction = self.reduction(board, move, depth, index, ply)
+
+            board.push(move)
+            if index == 0:
+                score = -self.search(board, depth - 1, -beta, -alpha, ply + 1)
+            else:
+                # Zero window: only prove the move is not better than alpha
+                score = -self.search(board, depth - 1 - reduction, -alpha - 1, -alpha, ply + 1)
+                if reduction:
+                    if context.stats is not None:
+                        context.stats.lmr_reductions += 1
+                    if score > alpha:
+                        if context.stats is not None:
+                            context.stats.lmr_researches += 1
+                        score = -self.search(board, depth - 1, -alpha - 1, -alpha, ply + 1)
+                if alpha < score < beta:
+                    self.count_research()
+                    score = -self.search(board, depth - 1, -beta, -alpha, ply + 1)
+            board.pop()
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    if context.orderer is not None:
+                        self.record_cutoff(board, move, depth, ply)
+                    if context.stats is not None:
+                        context.stats.record_cutoff(index)
+                    break
+
+        if tt is not None:
+            if best_score <= alpha_orig:
+                flag = UPPER
+            elif best_score >= beta:
+                flag = LOWER
+            else:
+                flag = EXACT
+            self.store(tt, key, depth, score_to_tt(best_score, ply), flag, best_move)
+
+        return best_score
+
+    # Captures (and promotions) until the position is quiet; all evasions when in check.
+    # context.quiescence selects the move source: legal captures as the engines always did, or
+    # generated captures with delta and SEE pruning (see quiescence.py).
+    def quiescence(self, board, alpha, beta, ply):
+        context = self.context
+        context.count_node()
+        context.qnodes += 1
+
+        in_check = board.is_check()
+        captures_only = context.quiescence == QUIESCENCE_CAPTURES
+
+        if in_check:
+            moves = self.legal_moves(board)
+            if not moves:
+                return -MATE_SCORE + ply
+            best_score = -INFINITE
+            stand_pat = None
+        else:
+            stand_pat = self.evaluate(board)
+            if stand_pat >= beta:
+                return stand_pat
+            if stand_pat > alpha:
+                alpha = stand_pat
+            best_score = stand_pat
+
+            if captures_only:
+                moves = self.tactical_moves(board)
+            else:
+                moves = [move for move in self.legal_moves(board) if board.is_capture(move)]
+
+        # Most valuable victim first
+        gain = self.tactical_gain
+        moves.sort(key=lambda move: -gain(board, move))
+
+        for move in moves:
+            if stand_pat is not None and captures_only:
+                if stand_pat + gain(board, move) + DELTA_MARGIN <= alpha:
+                    context.delta_pruned += 1
+                    continue
+
+                if not self.is_promotion(move) and self.see(board, move) < 0:
+                    context.see_pruned += 1
+                    continue
+
+            board.push(move)
+            score = -self.quiescence(board, -beta, -alpha, ply + 1)
+            board.pop()
+
+            if score > best_score:
+                best_score = score
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+
+        return best_score
+
+    # Board and move primitives of the core
+
+    def key(self, board):
+        return position_key(board, self.salt)
+
+    def probe(self, tt, key):
+        return tt.probe(key)
+
+    def hash_move(self, tt, key):
+        return tt.best_move(key)
+
+    def store(self, tt, key, depth, score, flag, move):
+        tt.store(key, depth, score, flag, move)
+
+    def legal_moves(self, board):
+        return list(board.legal_moves)
+
+    def is_promotion(self, move):
+        return move.promotion
+
+    # Captures and promotions
+    def is_tactical(self, board, move):
+        return move.promotion or board.is_capture(move)
+
+    def tactical_moves(self, board):
+        return tactical_moves(board)
+
+    def tactical_gain(self, board, move):
+        return tactical_gain(board, move)
+
+    def see(self, board, move):
+        return see(board, move)
+
+    def record_cutoff(self, board, move, depth, ply):
+        self.context.orderer.record_cutoff(board, move, depth, ply)
@@ -0,0 +1,46 @@
+# Default number of entries; an entry with its move tuple takes about 1.3 KB in the middle game
+NODE_CACHE_ENTRIES = 1 << 14
+
+
+# Fixed-size cache of the legal moves and the check status of positions, keyed on the Zobrist key
+# of a CompactBoard. Move ordering, evaluation and quiescence share one entry per position, so a
+# node generates its moves once, and the next iteration finds them again. Every slot holds one
+# (key, moves, in_check) tuple, replaced whole, so threads sharing the cache never see half an
+# entry. No moves means the game is over: checkmate when in check, stalemate otherwise. The
+# plain check test stays on the board: most quiescence nodes stop at the stand pat and never
+# need their moves. Only CompactNegamax (board='compact', the default) uses the cache; searches
+# on a chess.Board, and the engines' original minimax, do not.
+class NodeCache:
+
+    def __init__(self, entries=NODE_CACHE_ENTRIES):
+        self.size = 1 << (max(1, entries).bit_length() - 1)
+        self.mask = self.size - 1
+        self.clear()
+
+    def clear(self):
+        self.entries = [None] * self.size
+        self.hits = 0
+        self.misses = 0
+
+    # (key, moves, in_check) of the board, computed and stored on a miss. The moves are a tuple
+    # in generation order.
+    def lookup(self, board):
+        key = board.key
+        index = key & self.mask
+        entry = self.entries[index]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        entry = (key, tuple(board.generate_legal_moves()), board.is_check())
+        self.entries[index] = entry
+        return entry
+
+    def hit_rate(self):
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
+
+
+# Shared by both engines and all compact searches of the process, like the evaluation cache
+shared_node_cache = NodeCache()
@@ -0,0 +1,59 @@
+import chess.polyglot
+
+# How a move is picked from the book entries of a position
+BOOK_BEST = 'best'  # Highest weight; the first entry on a tie
+BOOK_WEIGHTED = 'weighted'  # At random, in proportion to the weights
+
+# Polyglot books (book_builder.py makes one from PGN files) are read with chess.polyglot's memory
+# mapped reader, one per path, opened on first use. The file is mapped read-only and served from
+# the page cache, so every process using the same book (pool workers included) shares one copy.
+_readers = {}
+
+
+def open_book(path):
+    reader = _readers.get(path)
+    if reader is None:
+        reader = chess.polyglot.MemoryMappedReader(path)
+        _readers[path] = reader
+    return reader
+
+
+def close_books():
+    for reader in _readers.values():
+        reader.close()
+    _readers.clear()
+
+
+# Book move of the board (a binary search on the polyglot key of the mapped file), or None when
+# the position is not in the book. root_moves limits the choice to those moves.
+def book_move(board, path, selection=BOOK_BEST, root_moves=None, rng=None):
+    if selection not in (BOOK_BEST, BOOK_WEIGHTED):
+        raise ValueError("Unknown book selection: %r" % (selection,))
+
+    reader = open_book(path)
+    exclude_moves = []
+    if root_moves is not None:
+        exclude_moves = [move for move in board.legal_moves if move not in root_moves]
+
+    try:
+        if selection == BOOK_WEIGHTED:
+            return reader.weighted_choice(board, exclude_moves=exclude_moves, random=rng).move
+        return reader.find(board, exclude_moves=exclude_moves).move
+    except IndexError:
+        return None
+
+
+# Called by the engines before searching: the book move of the context's book, which also
+# becomes context.best_move, or None
+def probe_book(board, context, root_moves=None):
+    if context.book is None:
+        return None
+
+    move = book_move(board, context.book, context.book_selection, root_moves)
+    if move is not None:
+        context.best_move = move
+        context.best_score = None
+        context.root_order = [move]
+        if context.stats is not None:
+            context.stats.book_hits += 1
+    return move
@@ -0,0 +1,202 @@
+import importlib
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import chess
+
+from endgame_tables import open_tables, table_move
+from move_ordering import MoveOrderer
+from opening_book import BOOK_BEST, book_move
+from search_context import SearchAborted, SearchContext
+from transposition_table import shared_table
+
+# Engine modules by name, with their find_best_move-style entry point
+ENGINES = {
+    'minimax_w_ab': ('Minimax_w_AB', 'find_best_move'),
+    'minimax_w_ab_2': ('Minimax_w_AB_2', 'find_best_move_2'),
+}
+
+# Seconds between two looks at a cancel request, in the workers and in the process waiting for them
+CANCEL_POLL_INTERVAL = 0.02
+
+# Pool kept alive between moves so workers keep their imports and transposition tables
+_pool = None
+_pool_workers = 0
+
+# Set to stop the searches of the pool's workers; the workers get it from the pool initializer
+_cancel = None
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def get_pool(workers):
+    global _pool, _pool_workers
+
+    if _pool is None or _pool_workers != workers:
+        shutdown_pool()
+        cancel = multiprocessing.Event()
+        _pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(cancel,))
+        _pool_workers = workers
+        init_worker(cancel)
+
+    return _pool
+
+
+def init_worker(cancel):
+    global _cancel
+    _cancel = cancel
+
+
+def shutdown_pool():
+    global _pool, _pool_workers
+
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+        _pool = None
+        _pool_workers = 0
+
+
+def engine_function(engine):
+    module_name, function_name = ENGINES[engine]
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+# Board with the same history as the given one, rebuilt from its root position and moves
+def rebuild_board(root_fen, uci_moves, chess960=False):
+    board = chess.Board(root_fen, chess960=chess960)
+    for uci in uci_moves:
+        board.push_uci(uci)
+    return board
+
+
+# Runs in a worker: search a share of the root moves with the worker's own transposition table.
+# Returns ([(depth, uci, score), ...] for every completed depth, nodes); the list is empty when
+# not even the first iteration finished. The search stops early once cancelled() is true (by
+# default: the pool's cancel event is set).
+def search_root_moves(engine, root_fen, uci_stack, chess960, uci_root_moves, depth, time_limit_ms, options,
+                      cancelled=None):
+    if cancelled is None and _cancel is not None:
+        cancelled = _cancel.is_set
+
+    board = rebuild_board(root_fen, uci_stack, chess960)
+    root_moves = [chess.Move.from_uci(uci) for uci in uci_root_moves]
+
+    results = []
+
+    def record(board, context):
+        score = context.best_score
+        if score is None:
+            score = -math.inf
+        results.append((context.completed_depth, context.best_move.uci(), score))
+
+    context = SearchContext(tt=shared_table, time_limit_ms=time_limit_ms, **options)
+    context.on_iteration = record
+
+    done = threading.Event()
+
+    def watch():
+        while not done.wait(CANCEL_POLL_INTERVAL):
+            if cancelled():
+                context.stop()
+                return
+
+    if cancelled is not None:
+        threading.Thread(target=watch, daemon=True).start()
+
+    try:
+        move = engine_function(engine)(board, depth=depth, context=context, root_moves=root_moves)
+    except SearchAborted:
+        move = None  # A fixed-depth minimax search has no finished iteration to fall back on
+    finally:
+        done.set()
+
+    # The fixed-depth minimax search completes its single depth without iterations
+    if not results and move is not None and context.completed_depth:
+        record(board, context)
+
+    return results, context.nodes
+
+
+# The best move of the workers' results at the deepest depth every worker completed. Chunks hold
+# different numbers of moves and reach different depths in the same time, so only scores of the
+# same depth are compared. Every worker's list must hold at least one result.
+def best_common_result(chunk_results):
+    if not chunk_results:
+        return None
+
+    depth = min(results[-1][0] for results in chunk_results)
+    best = None
+    for results in chunk_results:
+        for result_depth, uci, score in results:
+            if result_depth == depth and (best is None or score > best[1]):
+                best = (uci, score)
+    return best
+
+
+# Split the root moves over a process pool and keep the best result.
+# With a fixed depth every worker searches its moves to that depth. With time_limit_ms each
+# worker deepens its own moves, and the best score at the deepest depth all workers completed wins.
+# options are passed on to the SearchContext of every worker (mobility, quiescence, ...). When
+# context (a SearchContext of the caller) is stopped, the workers stop too and the results they
+# completed so far decide.
+def parallel_find_best_move(board, depth=None, time_limit_ms=None, workers=None, engine='minimax_w_ab', options=None,
+                            context=None):
+    if depth is None and time_limit_ms is None:
+        raise ValueError("parallel_find_best_move needs a depth or a time_limit_ms")
+
+    workers = workers or default_workers()
+    options = options or {}
+
+    # Book and table moves need no workers
+    if options.get('book') is not None:
+        move = book_move(board, options['book'], options.get('book_selection', BOOK_BEST))
+        if move is not None:
+            return move
+    if options.get('endgame_tables') is not None:
+        result = table_move(board, open_tables(options['endgame_tables']))
+        if result is not None:
+            return result[0]
+
+    # Cheap ordering first, then deal the moves round-robin so every worker gets good candidates
+    moves = MoveOrderer().order(board, list(board.legal_moves))
+    if not moves:
+        return None
+
+    root_fen = board.root().fen()
+    uci_stack = [move.uci() for move in board.move_stack]
+
+    if workers == 1 or len(moves) == 1:
+        results = search_root_moves(engine, root_fen, uci_stack, board.chess960, [move.uci() for move in moves],
+                                    depth, time_limit_ms, options,
+                                    lambda: context is not None and context.stopped)[0]
+        return chess.Move.from_uci(results[-1][1]) if results else moves[0]
+
+    chunks = [moves[i::workers] for i in range(min(workers, len(moves)))]
+
+    pool = get_pool(workers)
+    _cancel.clear()
+    futures = [
+        pool.submit(search_root_moves, engine, root_fen, uci_stack, board.chess960,
+                    [move.uci() for move in chunk], depth, time_limit_ms, options)
+        for chunk in chunks
+    ]
+
+    pending = futures
+    while pending:
+        pending = wait(pending, timeout=CANCEL_POLL_INTERVAL)[1]
+        if context is not None and context.stopped:
+            _cancel.set()
+
+    chunk_results = [future.result()[0] for future in futures]
+
+    # Workers that completed nothing have no score to compare; the others still do
+    best = best_common_result([results for results in chunk_results if results])
+    if best is None:
+        return moves[0]
+
+    return chess.Move.from_uci(best[0])
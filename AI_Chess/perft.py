@@ -0,0 +1,203 @@
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import chess
+
+import compact_board
+from compact_board import CompactBoard
+from parallel_search import default_workers
+from transposition_table import pack_move, unpack_move
+
+# Move generators
+GENERATOR_CHESS = 'chess'  # chess.Board.generate_legal_moves
+GENERATOR_COMPACT = 'compact'  # CompactBoard.generate_legal_moves (see compact_board.py)
+GENERATORS = (GENERATOR_CHESS, GENERATOR_COMPACT)
+
+DEFAULT_DEPTH = 3
+
+# Standard positions with their published leaf counts by depth (chessprogramming.org "Perft Results")
+KNOWN_POSITIONS = [
+    ('startpos', chess.STARTING_FEN,
+     [20, 400, 8902, 197281, 4865609, 119060324]),
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+     [48, 2039, 97862, 4085603, 193690690]),
+    ('position3', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+     [14, 191, 2812, 43238, 674624, 11030083]),
+    ('position4', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+     [6, 264, 9467, 422333, 15833292]),
+    ('position5', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+     [44, 1486, 62379, 2103487, 89941194]),
+    ('position6', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+     [46, 2079, 89890, 3894594, 164075551]),
+]
+
+
+# Leaf nodes of the legal move tree of a chess.Board to the given depth
+def chess_perft(board, depth):
+    if depth < 1:
+        return 1
+    if depth == 1:
+        return board.legal_moves.count()
+
+    nodes = 0
+    for move in board.generate_legal_moves():
+        board.push(move)
+        nodes += chess_perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+
+# Root moves of the position in generation order, as UCI strings
+def root_moves(fen, generator):
+    if generator == GENERATOR_COMPACT:
+        return [unpack_move(move).uci() for move in CompactBoard.from_fen(fen).generate_legal_moves()]
+    return [move.uci() for move in chess.Board(fen).generate_legal_moves()]
+
+
+# Leaf nodes below one root move (runs in a worker with workers > 1)
+def perft_after(fen, uci, depth, generator):
+    move = chess.Move.from_uci(uci)
+    if generator == GENERATOR_COMPACT:
+        board = CompactBoard.from_fen(fen)
+        board.push(pack_move(move))
+        return compact_board.perft(board, depth - 1)
+
+    board = chess.Board(fen)
+    board.push(move)
+    return chess_perft(board, depth - 1)
+
+
+# Leaf nodes split by root move: [(uci, nodes), ...] in generation order. With workers > 1 the
+# root moves are spread over a process pool.
+def divide(fen, depth, generator=GENERATOR_COMPACT, workers=1):
+    if depth < 1:
+        raise ValueError("divide needs a depth of at least 1")
+
+    moves = root_moves(fen, generator)
+    if workers > 1 and len(moves) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(moves))) as pool:
+            counts = list(pool.map(perft_after, [fen] * len(moves), moves, [depth] * len(moves),
+                                   [generator] * len(moves)))
+    else:
+        counts = [perft_after(fen, uci, depth, generator) for uci in moves]
+
+    return list(zip(moves, counts))
+
+
+# Leaf nodes of one position; returns (nodes, seconds, divide or None)
+def run_perft(fen, depth, generator=GENERATOR_COMPACT, workers=1, split=False):
+    start = time.perf_counter()
+    if split or workers > 1:
+        counts = divide(fen, depth, generator, workers)
+        nodes = sum(count for _, count in counts)
+    else:
+        counts = None
+        if generator == GENERATOR_COMPACT:
+            nodes = compact_board.perft(CompactBoard.from_fen(fen), depth)
+        else:
+            nodes = chess_perft(chess.Board(fen), depth)
+
+    return nodes, time.perf_counter() - start, counts if split else None
+
+
+# Run every generator on every position and check the counts against the known values and
+# against each other. Returns the number of mismatches.
+def run_suite(positions, depth, generators, workers=1, split=False, out=sys.stdout):
+    mismatches = 0
+
+    out.write("  %-10s %-8s %5s %12s %9s %11s\n" % ('position', 'movegen', 'depth', 'nodes', 'seconds', 'nodes/s'))
+    for name, fen, known in positions:
+        expected = known[depth - 1] if known and depth <= len(known) else None
+        results = {}
+
+        for generator in generators:
+            nodes, seconds, counts = run_perft(fen, depth, generator, workers, split)
+            results[generator] = (nodes, counts)
+
+            status = ''
+            if expected is not None:
+                status = 'ok' if nodes == expected else 'MISMATCH (expected %d)' % expected
+                if nodes != expected:
+                    mismatches += 1
+            out.write("  %-10s %-8s %5d %12d %9.2f %11d  %s\n" % (
+                name, generator, depth, nodes, seconds, int(nodes / seconds) if seconds > 0 else 0, status))
+            out.flush()
+
+        if len(results) > 1:
+            mismatches += compare_generators(results, out)
+
+        if split:
+            generator = generators[0]
+            for uci, count in results[generator][1]:
+                out.write("    %-6s %d\n" % (uci, count))
+
+    return mismatches
+
+
+# Totals and root moves whose counts differ between the generators; returns the number of differences
+def compare_generators(results, out):
+    generators = sorted(results)
+    reference = generators[0]
+    differences = 0
+
+    for generator in generators[1:]:
+        if results[generator][0] != results[reference][0]:
+            out.write("    %s and %s disagree: %d vs %d\n" % (
+                reference, generator, results[reference][0], results[generator][0]))
+            differences += 1
+
+        if results[reference][1] is None or results[generator][1] is None:
+            continue
+        expected = dict(results[reference][1])
+        actual = dict(results[generator][1])
+        for uci in sorted(set(expected) | set(actual)):
+            if expected.get(uci) != actual.get(uci):
+                out.write("    %-6s %s %s, %s %s\n" % (uci, reference, expected.get(uci), generator, actual.get(uci)))
+                differences += 1
+
+    return differences
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count leaf nodes of the legal move tree (perft) and compare the "
+                                                 "move generators.")
+    parser.add_argument('fen', nargs='*', help="positions (default: the standard positions with known counts)")
+    parser.add_argument('--depth', type=int, default=DEFAULT_DEPTH, help="depth (default %(default)s)")
+    parser.add_argument('--generator', action='append', choices=GENERATORS,
+                        help="move generator (repeatable, default: both)")
+    parser.add_argument('--divide', action='store_true', help="print the leaf nodes below every root move")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="processes to split the root moves over (0: one per CPU, default 1)")
+    args = parser.parse_args(argv)
+
+    if args.depth < 1:
+        parser.error("--depth must be at least 1")
+
+    if args.fen:
+        positions = []
+        for index, fen in enumerate(args.fen, 1):
+            try:
+                fen = chess.Board(fen).fen()
+            except ValueError as error:
+                parser.error("invalid FEN %r: %s" % (fen, error))
+            known = [entry[2] for entry in KNOWN_POSITIONS if entry[1] == fen]
+            positions.append(('fen%d' % index, fen, known[0] if known else None))
+    else:
+        positions = KNOWN_POSITIONS
+
+    generators = args.generator or list(GENERATORS)
+    workers = args.workers or default_workers()
+
+    mismatches = run_suite(positions, args.depth, generators, workers, args.divide)
+    if mismatches:
+        print("%d mismatch(es)" % mismatches)
+        return 1
+
+    print("All counts match")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
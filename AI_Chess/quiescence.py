@@ -0,0 +1,80 @@
+import chess
+
+from move_ordering import SEE_VALUES, captured_piece_type, see
+
+# Quiescence modes
+QUIESCENCE_LEGAL = 'legal'  # Filter all legal moves for captures, as the engines always did
+QUIESCENCE_CAPTURES = 'captures'  # Generate captures and promotions only, with delta and SEE pruning
+
+# Safety margin on top of the captured material before a capture is pruned as hopeless
+DELTA_MARGIN = 200
+
+
+# Legal captures (en passant included) and quiet promotions
+def tactical_moves(board):
+    moves = list(board.generate_legal_captures())
+
+    seventh_rank = chess.BB_RANK_7 if board.turn == chess.WHITE else chess.BB_RANK_2
+    promoting = board.pawns & board.occupied_co[board.turn] & seventh_rank
+    if promoting:
+        moves.extend(board.generate_legal_moves(promoting, ~board.occupied & chess.BB_ALL))
+
+    return moves
+
+
+# Material a capture or promotion wins at most
+def tactical_gain(board, move):
+    gain = SEE_VALUES[captured_piece_type(board, move)]
+    if move.promotion:
+        gain += SEE_VALUES[move.promotion] - SEE_VALUES[chess.PAWN]
+    return gain
+
+
+# Same scoring convention as the engines' quiescence_search (stand pat on evaluate(board),
+# negated scores for the replies), but without full legal move generation. When in check all
+# evasions are searched; otherwise captures that cannot reach alpha even with DELTA_MARGIN,
+# and captures that lose material by static exchange, are skipped.
+def capture_quiescence(board, alpha, beta, context, evaluate):
+    context.count_node()
+    context.qnodes += 1
+
+    if context.timing:
+        stand_pat = context.stats.timed_eval(evaluate, board)
+    else:
+        stand_pat = evaluate(board)
+
+    if stand_pat >= beta:
+        return beta
+
+    if alpha < stand_pat:
+        alpha = stand_pat
+
+    in_check = board.is_check()
+    if in_check:
+        moves = list(board.legal_moves)
+    else:
+        moves = tactical_moves(board)
+
+    # Most valuable victim first
+    moves.sort(key=lambda move: -tactical_gain(board, move))
+
+    for move in moves:
+        if not in_check:
+            if stand_pat + tactical_gain(board, move) + DELTA_MARGIN <= alpha:
+                context.delta_pruned += 1
+                continue
+
+            if not move.promotion and see(board, move) < 0:
+                context.see_pruned += 1
+                continue
+
+        board.push(move)
+        score = -capture_quiescence(board, -beta, -alpha, context, evaluate)
+        board.pop()
+
+        if score >= beta:
+            return beta
+        if score > alpha:
+            alpha = score
+
+    return alpha
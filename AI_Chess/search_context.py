@@ -0,0 +1,171 @@
+import time
+
+from move_ordering import MoveOrderer, SearchTables
+
+# Deepest iteration tried when only a time or node budget is given
+MAX_DEPTH = 64
+
+# How many nodes are searched between two clock reads
+TIME_CHECK_INTERVAL = 16
+
+
+# Raised inside the search when the budget runs out; caught by the iterative deepening driver
+class SearchAborted(Exception):
+    pass
+
+
+class SearchContext:
+
+    def __init__(self, tt=None, time_limit_ms=None, node_limit=None, incremental_eval=False, mobility='attacks',
+                 move_ordering='mvv_lva', quiescence='legal', search='negamax', lmr=False, futility=False, razoring=False,
+                 board='compact', book=None, book_selection='best', endgame_tables=None, stats=None):
+        self.tt = tt
+        self.stats = stats  # Optional SearchStats
+        self.timing = stats is not None and stats.timing
+        self.incremental_eval = incremental_eval  # Search on an IncrementalBoard
+        # 'attacks' (attack bitboards, leaves the board alone) or 'legal' for the legal move counts of
+        # evaluate_board (see evaluation.py)
+        self.mobility = mobility
+        self.quiescence = quiescence  # 'legal' or 'captures' (see quiescence.py)
+        self.search = search  # 'negamax' or 'minimax' for the engines' original search (see negamax.py)
+        # 'chess' or 'compact': the board the negamax core searches on (see compact_search.py). Only
+        # 'compact' shares legal moves and check status through the NodeCache (see node_cache.py);
+        # the 'chess' board and search='minimax' still generate them wherever they are needed.
+        self.board = board
+        self.book = book  # Polyglot opening book file, or None
+        self.book_selection = book_selection  # 'best' or 'weighted' (see opening_book.py)
+        self.endgame_tables = endgame_tables  # Directory of endgame tables, or None (see endgame_tables.py)
+        # Late move reductions, futility pruning and razoring of the negamax core
+        self.lmr = lmr
+        self.futility = futility
+        self.razoring = razoring
+
+        # 'mvv_lva', 'see' or None for the engines' original ordering (see move_ordering.py)
+        self.orderer = MoveOrderer(move_ordering) if move_ordering is not None else None
+        # Killers and history of this search; the orderer's own tables when there is one
+        self.tables = self.orderer if self.orderer is not None else SearchTables()
+        self.previous_tables = None  # Killers and history of an earlier search to start from (see engine_thread.py)
+        self.root_ply = 0
+        self.time_limit_ms = time_limit_ms
+        self.node_limit = node_limit
+
+        self.nodes = 0
+        self.qnodes = 0
+        self.delta_pruned = 0
+        self.see_pruned = 0
+        self.stopped = False
+        self.pondering = False  # No budget until ponder_hit(), see engine_thread.py
+        self.infinite = False  # Deepen without a budget until stop() (UCI "go infinite" / "go depth")
+        self.on_iteration = None  # Called as on_iteration(board, context) after every completed iteration
+        self.start_time = time.perf_counter()
+        self.deadline = None
+        if time_limit_ms is not None:
+            self.deadline = self.start_time + time_limit_ms / 1000.0
+
+        # Results of the last completed iteration
+        self.completed_depth = 0
+        self.best_move = None
+        self.best_score = None
+        self.root_order = None
+
+    # Whether the search deepens iteratively instead of searching a fixed depth once
+    def has_limits(self):
+        return self.infinite or self.pondering or self.deadline is not None or self.node_limit is not None
+
+    # The position searched while pondering was reached: the budget starts counting now
+    # (may be called from another thread while the search runs)
+    def ponder_hit(self, time_limit_ms=None, node_limit=None):
+        if node_limit is not None:
+            self.node_limit = self.nodes + node_limit
+        if time_limit_ms is not None:
+            self.time_limit_ms = time_limit_ms
+            self.deadline = time.perf_counter() + time_limit_ms / 1000.0
+        self.pondering = False
+
+    # Restart the clock and the node budget for a new search. A stop() request is kept, so a
+    # search cancelled before it started returns at once; use a new context after stopping.
+    def start(self):
+        self.timing = self.stats is not None and self.stats.timing
+        if self.previous_tables is not None:
+            self.tables.copy_from(self.previous_tables)
+            self.tables.age()  # The earlier search counts less, like an older iteration
+        else:
+            self.tables.clear()
+
+        self.nodes = 0
+        self.qnodes = 0
+        self.delta_pruned = 0
+        self.see_pruned = 0
+        self.start_time = time.perf_counter()
+        if self.time_limit_ms is not None:
+            self.deadline = self.start_time + self.time_limit_ms / 1000.0
+
+        self.completed_depth = 0
+        self.best_move = None
+        self.best_score = None
+        self.root_order = None
+
+    # Ask a running search to return as soon as possible (may be called from another thread)
+    def stop(self):
+        self.stopped = True
+
+    # Distance of the board from the root of the search
+    def ply(self, board):
+        return len(board.move_stack) - self.root_ply
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.start_time) * 1000.0
+
+    # Count a searched node and abort when the budget is spent
+    def count_node(self):
+        self.nodes += 1
+
+        if self.stopped:
+            raise SearchAborted()
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise SearchAborted()
+        if self.deadline is not None and self.nodes % TIME_CHECK_INTERVAL == 0:
+            if time.perf_counter() >= self.deadline:
+                raise SearchAborted()
+
+
+# Deepen one ply at a time until max_depth or the budget of the context runs out.
+# search_root(board, depth, context, root_moves) returns (best_move, best_score, moves ordered best first)
+def iterative_deepening(board, max_depth, context, search_root, root_moves=None):
+    root_ply = len(board.move_stack)
+    first_moves = root_moves
+
+    for depth in range(1, max_depth + 1):
+        if depth > 1:
+            context.tables.age()  # Older iterations count less
+
+        try:
+            best_move, best_score, ordered_moves = search_root(board, depth, context, root_moves)
+        except SearchAborted:
+            # Unwind the moves the aborted iteration left on the board
+            while len(board.move_stack) > root_ply:
+                board.pop()
+            break
+
+        context.completed_depth = depth
+        context.best_move = best_move
+        context.best_score = best_score
+        context.root_order = ordered_moves
+        if context.stats is not None:
+            context.stats.record_iteration(depth, context, best_move, best_score)
+        if context.on_iteration is not None:
+            context.on_iteration(board, context)
+
+        # The next iteration searches the principal variation first
+        root_moves = ordered_moves
+
+        if best_move is None:
+            break  # No legal moves
+
+    if context.best_move is None:
+        # Not even the first iteration finished: fall back to any legal move
+        for move in first_moves or board.legal_moves:
+            context.best_move = move
+            break
+
+    return context.best_move
@@ -0,0 +1,194 @@
+import json
+import time
+
+from eval_cache import shared_eval_cache
+from node_cache import shared_node_cache
+
+
+# Optional statistics of one search. The engines only touch it when a SearchStats is passed in,
+# and only time evaluation and move generation when timing=True (two clock reads per call).
+class SearchStats:
+
+    def __init__(self, timing=False):
+        self.timing = timing
+        self.reset()
+
+    def reset(self):
+        self.nodes = 0
+        self.qnodes = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.null_move_cutoffs = 0
+        self.pvs_researches = 0
+        self.aspiration_researches = 0
+        self.lmr_reductions = 0
+        self.lmr_researches = 0
+        self.futility_pruned = 0
+        self.razoring_cutoffs = 0
+        self.book_hits = 0
+        self.table_hits = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.eval_cache_probes = 0
+        self.eval_cache_hits = 0
+        self.node_cache_probes = 0
+        self.node_cache_hits = 0
+        self.eval_calls = 0
+        self.eval_time = 0.0
+        self.movegen_calls = 0
+        self.movegen_time = 0.0
+        self.elapsed_ms = 0.0
+        self.completed_depth = 0
+        self.best_move = None
+        self.best_score = None
+        self.iterations = []
+
+        self._tt_hits_start = 0
+        self._tt_probes_start = 0
+        self._cache_start = (0, 0, 0, 0)
+
+    # Hits and probes of the shared evaluation and node caches so far
+    @staticmethod
+    def _cache_counts():
+        return (shared_eval_cache.hits, shared_eval_cache.hits + shared_eval_cache.misses,
+                shared_node_cache.hits, shared_node_cache.hits + shared_node_cache.misses)
+
+    # Called by the engines when the search starts and ends
+    def begin(self, context):
+        self.reset()
+        if context.tt is not None:
+            self._tt_hits_start = context.tt.hits
+            self._tt_probes_start = context.tt.hits + context.tt.misses
+        self._cache_start = self._cache_counts()
+
+    def finish(self, context):
+        self.nodes = context.nodes
+        self.qnodes = context.qnodes
+        self.elapsed_ms = context.elapsed_ms()
+        self.completed_depth = context.completed_depth
+        self.best_move = context.best_move.uci() if context.best_move else None
+        self.best_score = context.best_score
+
+        if context.tt is not None:
+            self.tt_hits = context.tt.hits - self._tt_hits_start
+            self.tt_probes = context.tt.hits + context.tt.misses - self._tt_probes_start
+
+        counts = [now - start for now, start in zip(self._cache_counts(), self._cache_start)]
+        (self.eval_cache_hits, self.eval_cache_probes, self.node_cache_hits, self.node_cache_probes) = counts
+
+    # One completed iteration (or the single fixed-depth search)
+    def record_iteration(self, depth, context, best_move, best_score):
+        self.iterations.append({
+            'depth': depth,
+            'nodes': context.nodes,
+            'qnodes': context.qnodes,
+            'elapsed_ms': round(context.elapsed_ms(), 3),
+            'best_move': best_move.uci() if best_move else None,
+            'score': best_score,
+        })
+
+    def record_cutoff(self, move_index):
+        self.cutoffs += 1
+        if move_index == 0:
+            self.first_move_cutoffs += 1
+
+    def timed_eval(self, evaluate, board):
+        start = time.perf_counter()
+        score = evaluate(board)
+        self.eval_time += time.perf_counter() - start
+        self.eval_calls += 1
+        return score
+
+    def timed_movegen(self, generate, *args):
+        start = time.perf_counter()
+        moves = generate(*args)
+        self.movegen_time += time.perf_counter() - start
+        self.movegen_calls += 1
+        return moves
+
+    def first_move_cutoff_ratio(self):
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    # Counters of the pruning and reduction techniques (see negamax.py)
+    def pruning(self):
+        return {
+            'null_move_cutoffs': self.null_move_cutoffs,
+            'lmr_reductions': self.lmr_reductions,
+            'lmr_researches': self.lmr_researches,
+            'futility_pruned': self.futility_pruned,
+            'razoring_cutoffs': self.razoring_cutoffs,
+        }
+
+    def eval_cache_hit_rate(self):
+        return self.eval_cache_hits / self.eval_cache_probes if self.eval_cache_probes else 0.0
+
+    def node_cache_hit_rate(self):
+        return self.node_cache_hits / self.node_cache_probes if self.node_cache_probes else 0.0
+
+    def nps(self):
+        return int(self.nodes * 1000 / self.elapsed_ms) if self.elapsed_ms > 0 else 0
+
+    # Nodes of each iteration divided by the nodes of the one before
+    def branching_factors(self):
+        factors = []
+        previous_total = 0
+        previous_nodes = 0
+        for iteration in self.iterations:
+            nodes = iteration['nodes'] - previous_total
+            if previous_nodes:
+                factors.append(round(nodes / previous_nodes, 3))
+            previous_total = iteration['nodes']
+            previous_nodes = nodes
+        return factors
+
+    def as_dict(self):
+        return {
+            'nodes': self.nodes,
+            'qnodes': self.qnodes,
+            'qnode_share': self.qnodes / self.nodes if self.nodes else 0.0,
+            'nps': self.nps(),
+            'elapsed_ms': round(self.elapsed_ms, 3),
+            'completed_depth': self.completed_depth,
+            'best_move': self.best_move,
+            'best_score': self.best_score,
+            'cutoffs': self.cutoffs,
+            'first_move_cutoffs': self.first_move_cutoffs,
+            'first_move_cutoff_ratio': self.first_move_cutoff_ratio(),
+            'null_move_cutoffs': self.null_move_cutoffs,
+            'pvs_researches': self.pvs_researches,
+            'aspiration_researches': self.aspiration_researches,
+            'lmr_reductions': self.lmr_reductions,
+            'lmr_researches': self.lmr_researches,
+            'futility_pruned': self.futility_pruned,
+            'razoring_cutoffs': self.razoring_cutoffs,
+            'book_hits': self.book_hits,
+            'table_hits': self.table_hits,
+            'tt_probes': self.tt_probes,
+            'tt_hits': self.tt_hits,
+            'eval_cache_probes': self.eval_cache_probes,
+            'eval_cache_hits': self.eval_cache_hits,
+            'eval_cache_hit_rate': self.eval_cache_hit_rate(),
+            'node_cache_probes': self.node_cache_probes,
+            'node_cache_hits': self.node_cache_hits,
+            'node_cache_hit_rate': self.node_cache_hit_rate(),
+            'eval_calls': self.eval_calls,
+            'eval_time_ms': round(self.eval_time * 1000, 3),
+            'movegen_calls': self.movegen_calls,
+            'movegen_time_ms': round(self.movegen_time * 1000, 3),
+            'branching_factors': self.branching_factors(),
+            'iterations': self.iterations,
+        }
+
+    def to_json(self, indent=None):
+        # Infinite scores (mate seen by the min/max search) are not valid JSON numbers
+        def finite(value):
+            if isinstance(value, float) and value in (float('inf'), float('-inf')):
+                return str(value)
+            return value
+
+        data = self.as_dict()
+        data['best_score'] = finite(data['best_score'])
+        for iteration in data['iterations']:
+            iteration['score'] = finite(iteration['score'])
+
+        return json.dumps(data, indent=indent)
@@ -0,0 +1,68 @@
+import random
+
+import chess
+import chess.polyglot
+import pytest
+
+from compact_board import CompactBoard
+from perft import KNOWN_POSITIONS
+from transposition_table import pack_move, unpack_move
+
+GAMES = 4
+PLIES = 60
+
+
+def assert_same_position(compact, board):
+    assert compact.key == chess.polyglot.zobrist_hash(board)
+    assert compact.fen() == board.fen()
+    assert compact.is_check() == board.is_check()
+
+    # Same moves in the same order, which the searches rely on to build the same trees
+    assert [unpack_move(move) for move in compact.generate_legal_moves()] == list(board.generate_legal_moves())
+    assert compact.legal_move_count() == board.legal_moves.count()
+    assert ({unpack_move(move) for move in compact.generate_legal_captures()}
+            == set(board.generate_legal_captures()))
+
+
+# Random games from the perft positions (castling, en passant, promotions and pins), checking
+# every position on the way and again while taking the moves back
+@pytest.mark.parametrize('name, fen', [(name, fen) for name, fen, _ in KNOWN_POSITIONS])
+def test_random_games_match_chess_board(name, fen):
+    rng = random.Random(name)
+    for _ in range(GAMES):
+        board = chess.Board(fen)
+        compact = CompactBoard.from_board(board)
+        keys = []
+
+        for _ in range(PLIES):
+            assert_same_position(compact, board)
+            moves = list(board.legal_moves)
+            if not moves:
+                break
+
+            move = rng.choice(moves)
+            assert compact.gives_check(pack_move(move)) == board.gives_check(move)
+            keys.append(compact.key)
+            board.push(move)
+            compact.push(pack_move(move))
+
+        while keys:
+            assert unpack_move(compact.pop()) == board.pop()
+            assert compact.key == keys.pop()
+            assert_same_position(compact, board)
+
+
+def test_null_move_and_copy():
+    board = chess.Board(KNOWN_POSITIONS[1][1])
+    compact = CompactBoard.from_board(board)
+    copy = compact.copy()
+
+    board.push(chess.Move.null())
+    compact.push(0)
+    assert_same_position(compact, board)
+    assert copy.key != compact.key
+
+    board.pop()
+    compact.pop()
+    assert_same_position(compact, board)
+    assert copy.key == compact.key
@@ -0,0 +1,73 @@
+import io
+
+import chess
+import pytest
+
+import Minimax_w_AB
+from endgame_tables import DRAW, close_tables, decode_value, generate_table, open_tables, table_move, verify_table
+from evaluation import MATE_SCORE
+from search_context import SearchContext
+from search_stats import SearchStats
+
+MATE_IN_ONE = 'k7/8/1K6/8/8/8/8/7R w - - 0 1'
+
+
+# A KRvK table, generated once for the module (about 10 s)
+@pytest.fixture(scope='module')
+def directory(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('endgame_tables'))
+    assert generate_table('KRvK', path) == ['KRvK']
+    assert generate_table('KRvK', path) == []  # Already there
+    yield path
+    close_tables()
+
+
+def test_table_verifies(directory):
+    assert verify_table('KRvK', directory, io.StringIO()) == 0
+
+
+# The longest win is mate in 16 moves, as in published KRvK tables
+def test_longest_mate(directory):
+    _, data = open_tables(directory).table('KRvK')
+    values = set(bytes(data))
+    assert max(value for value in values if value & 1) == 31
+    assert max(value for value in values if value and not value & 1) == 34
+
+
+@pytest.mark.parametrize('fen, value', [
+    (MATE_IN_ONE, 1),
+    ('k6R/8/1K6/8/8/8/8/8 b - - 1 1', 2),  # Checkmated
+    ('k7/1R6/8/8/8/8/8/7K b - - 0 1', DRAW),  # The rook hangs
+    ('K7/8/1k6/8/8/8/8/7r b - - 0 1', 1),  # Colours swapped: KvKR
+    ('K6r/8/1k6/8/8/8/8/8 w - - 1 1', 2),
+])
+def test_probe(directory, fen, value):
+    assert open_tables(directory).probe(chess.Board(fen)) == value
+
+
+def test_probe_outside_the_tables(directory):
+    tables = open_tables(directory)
+    assert tables.probe(chess.Board()) is None
+    assert tables.probe(chess.Board('k7/8/1K6/8/8/8/8/7Q w - - 0 1')) is None  # No KQvK table
+    assert tables.probe(chess.Board('4k3/8/8/8/8/8/8/R3K3 w Q - 0 1')) is None  # Castling rights
+
+
+# Following the table moves mates in exactly the number of plies the table gives
+def test_table_moves_mate(directory):
+    tables = open_tables(directory)
+    board = chess.Board('8/8/8/4k3/8/8/8/R3K3 w - - 0 1')
+    result, plies = decode_value(tables.probe(board))
+    assert result == 1
+
+    for _ in range(plies):
+        board.push(table_move(board, tables)[0])
+    assert board.is_checkmate()
+
+
+def test_engine_plays_table_move_without_searching(directory):
+    stats = SearchStats()
+    context = SearchContext(endgame_tables=directory, stats=stats)
+    assert Minimax_w_AB.find_best_move(chess.Board(MATE_IN_ONE), 3, context=context) == chess.Move.from_uci('h1h8')
+    assert context.best_score == MATE_SCORE - 1
+    assert context.nodes == 0
+    assert stats.table_hits == 1
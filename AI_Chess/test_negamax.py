@@ -0,0 +1,43 @@
+import chess
+import pytest
+
+import Minimax_w_AB
+import Minimax_w_AB_2
+from evaluation import MATE_SCORE
+from search_context import SearchContext
+from transposition_table import TranspositionTable
+
+ENGINES = [Minimax_w_AB.find_best_move, Minimax_w_AB_2.find_best_move_2]
+
+# Quick positions of benchmark_positions.txt: opening, mate in one, promotion and two endings
+POSITIONS = [
+    chess.STARTING_FEN,
+    'r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4',
+    '8/2P5/8/8/8/2k5/8/4K3 w - - 0 1',
+    '8/8/8/4k3/8/8/4P3/3K4 w - - 0 1',
+    '8/5pk1/6p1/8/3R4/6P1/r5PK/8 w - - 0 1',
+]
+
+
+# (move, score, nodes) of a depth 3 search on its own transposition table
+def search(engine, fen, **options):
+    context = SearchContext(tt=TranspositionTable(1), **options)
+    move = engine(chess.Board(fen), 3, context=context)
+    return move, context.best_score, context.nodes
+
+
+# CompactNegamax searches the same tree as Negamax on the chess.Board
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('fen', POSITIONS)
+@pytest.mark.parametrize('mobility', ['attacks', 'legal'])
+def test_compact_board_searches_the_same_tree(engine, fen, mobility):
+    assert search(engine, fen, board='compact', mobility=mobility) == search(engine, fen, board='chess',
+                                                                             mobility=mobility)
+
+
+def test_mate_in_one_is_found():
+    fen = 'r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4'
+    for engine in ENGINES:
+        move, score, _ = search(engine, fen)
+        assert move == chess.Move.from_uci('h5f7')
+        assert score == MATE_SCORE - 1
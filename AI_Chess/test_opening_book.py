@@ -0,0 +1,80 @@
+import random
+
+import chess
+import pytest
+
+import Minimax_w_AB
+from book_builder import build_book
+from opening_book import BOOK_WEIGHTED, book_move, close_books
+from search_context import SearchContext
+from search_stats import SearchStats
+
+GAMES = """
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bc4 Bc5 4. O-O Nf6 1-0
+
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bc4 Bc5 4. O-O d6 1-0
+
+[Result "0-1"]
+
+1. e4 c5 0-1
+
+[Result "1/2-1/2"]
+
+1. d4 d5 2. c4 e6 1/2-1/2
+
+[Result "0-1"]
+
+1. d4 d5 2. c4 c6 0-1
+"""
+
+ITALIAN = 'r1bqk1nr/pppp1ppp/2n5/2b1p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4'
+
+
+@pytest.fixture
+def book(tmp_path):
+    pgn = tmp_path / 'games.pgn'
+    pgn.write_text(GAMES)
+    path = str(tmp_path / 'book.bin')
+    build_book([str(pgn)], path)
+    yield path
+    close_books()
+
+
+def test_book_moves(book):
+    # 1. e4 scored 4 points in three games, 1. d4 1 point in two
+    assert book_move(chess.Board(), book) == chess.Move.from_uci('e2e4')
+    # Black's 1... d5 scored 3 points in two games
+    after_d4 = chess.Board('rnbqkbnr/pppppppp/8/8/3P4/8/PPP1PPPP/RNBQKBNR b KQkq - 0 1')
+    assert book_move(after_d4, book) == chess.Move.from_uci('d7d5')
+    # Castling is stored as the king taking its rook and read back as the king move
+    assert book_move(chess.Board(ITALIAN), book) == chess.Move.from_uci('e1g1')
+
+
+def test_positions_out_of_the_book(book):
+    # 1... e5 only ever lost and 1... c5 was played once
+    assert book_move(chess.Board('rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1'), book) is None
+    # 2... c6 and 2... e6 were played once each
+    assert book_move(chess.Board('rnbqkbnr/ppp1pppp/8/3p4/2PP4/8/PP2PPPP/RNBQKBNR b KQkq - 0 2'), book) is None
+
+
+def test_root_moves_and_weighted_choice(book):
+    board = chess.Board()
+    d4 = chess.Move.from_uci('d2d4')
+    assert book_move(board, book, root_moves=[d4]) == d4
+    assert book_move(board, book, root_moves=[chess.Move.from_uci('g1f3')]) is None
+
+    rng = random.Random(1)
+    moves = {book_move(board, book, BOOK_WEIGHTED, rng=rng) for _ in range(50)}
+    assert moves == {chess.Move.from_uci('e2e4'), d4}
+
+
+def test_engine_plays_book_move_without_searching(book):
+    stats = SearchStats()
+    context = SearchContext(book=book, stats=stats)
+    assert Minimax_w_AB.find_best_move(chess.Board(), 3, context=context) == chess.Move.from_uci('e2e4')
+    assert context.nodes == 0
+    assert stats.book_hits == 1
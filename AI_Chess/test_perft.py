@@ -0,0 +1,25 @@
+import pytest
+
+from perft import GENERATOR_CHESS, GENERATOR_COMPACT, GENERATORS, KNOWN_POSITIONS, divide, run_perft
+
+# Depth 4 of the other positions takes seconds to minutes in Python; perft.py runs them
+DEPTH_4_POSITIONS = ('startpos', 'position3', 'position4')
+
+
+@pytest.mark.parametrize('generator', GENERATORS)
+@pytest.mark.parametrize('name, fen, known', KNOWN_POSITIONS)
+def test_depth_3(generator, name, fen, known):
+    assert run_perft(fen, 3, generator)[0] == known[2]
+
+
+@pytest.mark.parametrize('generator', GENERATORS)
+@pytest.mark.parametrize('name, fen, known', [position for position in KNOWN_POSITIONS
+                                              if position[0] in DEPTH_4_POSITIONS])
+def test_depth_4(generator, name, fen, known):
+    assert run_perft(fen, 4, generator)[0] == known[3]
+
+
+# Both generators split the same leaf counts over the same root moves
+@pytest.mark.parametrize('name, fen, known', KNOWN_POSITIONS)
+def test_divide_matches(name, fen, known):
+    assert divide(fen, 2, GENERATOR_COMPACT) == divide(fen, 2, GENERATOR_CHESS)
@@ -0,0 +1,307 @@
+import argparse
+import math
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import chess
+import chess.pgn
+
+from batch_analysis import guess_format, read_positions
+from benchmark import parse_options
+from parallel_search import ENGINES, default_workers, engine_function
+from search_context import SearchContext
+from transposition_table import TT_SIZE_MB, TranspositionTable
+from uci import allocate_time
+
+# Games longer than this are adjudicated as draws
+DEFAULT_MAX_PLIES = 300
+
+# Random plies from the start position when no openings file is given
+DEFAULT_RANDOM_PLIES = 4
+
+# SPRT defaults: H0 elo <= 0 against H1 elo >= 5, 5% error each way
+DEFAULT_ELO0 = 0.0
+DEFAULT_ELO1 = 5.0
+DEFAULT_ALPHA = 0.05
+DEFAULT_BETA = 0.05
+
+
+# "minimax_w_ab" or "minimax_w_ab(mobility=legal)"
+def config_name(config):
+    if not config['options']:
+        return config['engine']
+    return '%s(%s)' % (config['engine'], ','.join('%s=%s' % item for item in sorted(config['options'].items())))
+
+
+# "10+0.1" -> (10000, 100): base time and increment in milliseconds
+def parse_time_control(text):
+    base, _, increment = text.partition('+')
+    return int(float(base) * 1000), int(float(increment or 0) * 1000)
+
+
+# Openings as FENs: positions of the file (FEN, EPD or PGN), or random plies from the start position
+def make_openings(count, path=None, random_plies=DEFAULT_RANDOM_PLIES, rng=None):
+    rng = rng or random.Random()
+
+    if path is not None:
+        with open(path) as handle:
+            fens = [fen for _, fen, error in read_positions(handle, guess_format(path)) if error is None]
+        if not fens:
+            raise ValueError("%s: no valid opening positions" % path)
+        rng.shuffle(fens)
+        return [fens[i % len(fens)] for i in range(count)]
+
+    openings = []
+    while len(openings) < count:
+        board = chess.Board()
+        for _ in range(random_plies):
+            moves = list(board.legal_moves)
+            if not moves:
+                break
+            board.push(rng.choice(moves))
+        if not board.is_game_over():
+            openings.append(board.fen())
+    return openings
+
+
+# Depth and time limit of the next search for the side to move
+def move_budget(config, board, movetime_ms, clocks, increment_ms):
+    if clocks is not None:
+        params = {'wtime': clocks[chess.WHITE], 'btime': clocks[chess.BLACK], 'winc': increment_ms, 'binc': increment_ms}
+        return config['depth'], allocate_time(board, params)
+    if movetime_ms is not None:
+        return config['depth'], movetime_ms
+    return config['depth'] or 2, None
+
+
+# Runs in a worker: play one game and return its result, PGN text and length
+def play_game(round_number, opening_fen, white, black, movetime_ms, time_control, max_plies, hash_mb):
+    board = chess.Board(opening_fen)
+    configs = {chess.WHITE: white, chess.BLACK: black}
+    tables = {chess.WHITE: TranspositionTable(hash_mb), chess.BLACK: TranspositionTable(hash_mb)}
+
+    clocks = None
+    increment_ms = 0
+    if time_control is not None:
+        clocks = {chess.WHITE: time_control[0], chess.BLACK: time_control[0]}
+        increment_ms = time_control[1]
+
+    result = None
+    termination = None
+    while result is None:
+        if board.is_game_over(claim_draw=True):
+            result = board.result(claim_draw=True)
+            break
+        if len(board.move_stack) >= max_plies:
+            result, termination = '1/2-1/2', 'adjudication'
+            break
+
+        turn = board.turn
+        config = configs[turn]
+        depth, time_limit_ms = move_budget(config, board, movetime_ms, clocks, increment_ms)
+        context = SearchContext(tt=tables[turn], time_limit_ms=time_limit_ms, **config['options'])
+
+        start = time.perf_counter()
+        move = engine_function(config['engine'])(board, depth=depth, context=context)
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+
+        if clocks is not None:
+            clocks[turn] -= elapsed_ms
+            if clocks[turn] < 0:
+                result, termination = ('0-1' if turn == chess.WHITE else '1-0'), 'time forfeit'
+                break
+            clocks[turn] += increment_ms
+
+        if move is None or not board.is_legal(move):
+            result, termination = ('0-1' if turn == chess.WHITE else '1-0'), 'illegal move'
+            break
+
+        board.push(move)
+
+    game = chess.pgn.Game.from_board(board)
+    game.headers['Event'] = 'Self-play match'
+    game.headers['Round'] = str(round_number)
+    game.headers['White'] = config_name(white)
+    game.headers['Black'] = config_name(black)
+    game.headers['Result'] = result
+    if termination is not None:
+        game.headers['Termination'] = termination
+
+    return {'round': round_number, 'result': result, 'plies': len(board.move_stack), 'pgn': str(game)}
+
+
+def logistic(elo):
+    return 1.0 / (1.0 + 10.0 ** (-elo / 400.0))
+
+
+def elo_from_score(score):
+    if score <= 0.0:
+        return -math.inf
+    if score >= 1.0:
+        return math.inf
+    return 400.0 * math.log10(score / (1.0 - score))
+
+
+# Wins, draws and losses of the first engine
+class MatchStats:
+
+    def __init__(self):
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+
+    def add(self, score):
+        if score == 1.0:
+            self.wins += 1
+        elif score == 0.5:
+            self.draws += 1
+        else:
+            self.losses += 1
+
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    def score(self):
+        return (self.wins + 0.5 * self.draws) / self.games() if self.games() else 0.5
+
+    # Variance of a single game's score
+    def variance(self):
+        games = self.games()
+        if not games:
+            return 0.0
+        score = self.score()
+        return (self.wins * (1.0 - score) ** 2 + self.draws * (0.5 - score) ** 2 + self.losses * score ** 2) / games
+
+    # Elo difference with its 95% confidence interval
+    def elo(self):
+        games = self.games()
+        score = self.score()
+        margin = 1.96 * math.sqrt(self.variance() / games) if games else 0.0
+        return elo_from_score(score), elo_from_score(score - margin), elo_from_score(score + margin)
+
+    # Log-likelihood ratio of H1 (elo1) against H0 (elo0), normal approximation of the game scores
+    def llr(self, elo0, elo1):
+        variance = self.variance()
+        if variance == 0.0:
+            return 0.0
+        score0 = logistic(elo0)
+        score1 = logistic(elo1)
+        return self.games() * (score1 - score0) * (2 * self.score() - score0 - score1) / (2 * variance)
+
+    def report(self):
+        elo, lower, upper = self.elo()
+        return "games %d: +%d =%d -%d, score %.1f%%, elo %+.1f [%+.1f, %+.1f]" % (
+            self.games(), self.wins, self.draws, self.losses, 100.0 * self.score(), elo, lower, upper)
+
+
+def sprt_bounds(alpha, beta):
+    return math.log(beta / (1.0 - alpha)), math.log((1.0 - beta) / alpha)
+
+
+# Play the games on a process pool; every opening is played twice with the colors swapped.
+# Returns the MatchStats and the SPRT decision ('H0', 'H1' or None)
+def run_match(first, second, games, openings, movetime_ms=None, time_control=None, max_plies=DEFAULT_MAX_PLIES,
+              hash_mb=TT_SIZE_MB, workers=None, pgn_out=None, sprt=None, out=sys.stdout):
+    workers = workers or default_workers()
+    stats = MatchStats()
+    decision = None
+
+    if sprt is not None:
+        elo0, elo1, alpha, beta = sprt
+        lower_bound, upper_bound = sprt_bounds(alpha, beta)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for round_number in range(1, games + 1):
+            opening = openings[(round_number - 1) // 2]
+            white, black = (first, second) if round_number % 2 else (second, first)
+            pending.add(pool.submit(play_game, round_number, opening, white, black, movetime_ms, time_control,
+                                    max_plies, hash_mb))
+
+        while pending and decision is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                game = future.result()
+                # The first engine has white in the odd rounds
+                points = {'1-0': 1.0, '0-1': 0.0}.get(game['result'], 0.5)
+                stats.add(points if game['round'] % 2 else 1.0 - points)
+
+                if pgn_out is not None:
+                    pgn_out.write(game['pgn'] + "\n\n")
+                    pgn_out.flush()
+
+                line = "round %d %s (%d plies)  %s" % (game['round'], game['result'], game['plies'], stats.report())
+                if sprt is not None:
+                    llr = stats.llr(elo0, elo1)
+                    line += "  LLR %.2f [%.2f, %.2f]" % (llr, lower_bound, upper_bound)
+                    if llr >= upper_bound:
+                        decision = 'H1'
+                    elif llr <= lower_bound:
+                        decision = 'H0'
+                out.write(line + "\n")
+                out.flush()
+
+        # Early stop: drop the games that did not start yet
+        for future in pending:
+            future.cancel()
+
+    return stats, decision
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play a self-play match between two engine configurations.")
+    parser.add_argument('--first', default='minimax_w_ab', choices=sorted(ENGINES), help="engine under test")
+    parser.add_argument('--second', default='minimax_w_ab_2', choices=sorted(ENGINES), help="reference engine")
+    parser.add_argument('--first-option', action='append', metavar='KEY=VALUE', help="SearchContext option of --first")
+    parser.add_argument('--second-option', action='append', metavar='KEY=VALUE', help="SearchContext option of --second")
+    parser.add_argument('--games', type=int, default=100, help="number of games (default %(default)s)")
+    parser.add_argument('--depth', type=int, help="search depth of both engines")
+    parser.add_argument('--first-depth', type=int, help="search depth of --first")
+    parser.add_argument('--second-depth', type=int, help="search depth of --second")
+    parser.add_argument('--movetime', type=int, metavar='MS', help="time per move in milliseconds")
+    parser.add_argument('--tc', metavar='SECONDS+INCREMENT', help="game clock, e.g. 10+0.1")
+    parser.add_argument('--openings', help="FEN, EPD or PGN file of opening positions")
+    parser.add_argument('--random-plies', type=int, default=DEFAULT_RANDOM_PLIES,
+                        help="random opening plies without --openings (default %(default)s)")
+    parser.add_argument('--seed', type=int, default=1, help="seed of the opening sampling (default %(default)s)")
+    parser.add_argument('--max-plies', type=int, default=DEFAULT_MAX_PLIES, help="draw adjudication (default %(default)s)")
+    parser.add_argument('--hash', type=int, default=TT_SIZE_MB, help="transposition table MB per engine")
+    parser.add_argument('--workers', type=int, default=default_workers(), help="games in parallel (default %(default)s)")
+    parser.add_argument('--pgn', help="write the games to this PGN file")
+    parser.add_argument('--elo0', type=float, default=DEFAULT_ELO0, help="SPRT H0 (default %(default)s)")
+    parser.add_argument('--elo1', type=float, default=DEFAULT_ELO1, help="SPRT H1 (default %(default)s)")
+    parser.add_argument('--alpha', type=float, default=DEFAULT_ALPHA)
+    parser.add_argument('--beta', type=float, default=DEFAULT_BETA)
+    parser.add_argument('--no-sprt', action='store_true', help="play all games without the SPRT stop")
+    args = parser.parse_args(argv)
+
+    first = {'engine': args.first, 'depth': args.first_depth or args.depth, 'options': parse_options(args.first_option)}
+    second = {'engine': args.second, 'depth': args.second_depth or args.depth, 'options': parse_options(args.second_option)}
+    time_control = parse_time_control(args.tc) if args.tc else None
+
+    try:
+        openings = make_openings((args.games + 1) // 2, args.openings, args.random_plies, random.Random(args.seed))
+    except ValueError as error:
+        parser.error(str(error))
+    sprt = None if args.no_sprt else (args.elo0, args.elo1, args.alpha, args.beta)
+
+    print("%s vs %s, %d games" % (config_name(first), config_name(second), args.games))
+    pgn_out = open(args.pgn, 'w') if args.pgn else None
+    try:
+        stats, decision = run_match(first, second, args.games, openings, args.movetime, time_control, args.max_plies,
+                                    args.hash, args.workers, pgn_out, sprt)
+    finally:
+        if pgn_out is not None:
+            pgn_out.close()
+
+    print(stats.report())
+    if decision is not None:
+        print("SPRT: %s accepted (elo0 %.1f, elo1 %.1f)" % (decision, args.elo0, args.elo1))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,210 @@
+import chess
+import chess.polyglot
+from array import array
+
+# Bound types stored with every entry (0 marks an empty slot)
+EXACT = 1
+LOWER = 2
+UPPER = 3
+
+# Replacement policies
+REPLACE_ALWAYS = 'always'  # The newest result always wins the slot
+REPLACE_DEPTH = 'depth'  # Keep the deeper result unless the stored one is from an older search
+
+# Default table size shared by both engines
+TT_SIZE_MB = 16
+
+# Bytes per entry: key (8) + score (8) + depth (1) + flag (1) + move (2) + age (1)
+ENTRY_SIZE = 21
+
+# Key salts so the two engines and the two sides of the min/max search never share entries
+ENGINE_1_KEY = 0x3C6EF372FE94F82B
+ENGINE_2_KEY = 0xA54FF53A5F1D36F1
+MAXIMIZING_KEY = 0x510E527FADE682D1
+
+# Salts of the negamax core (negamax.py), which scores positions for the side to move at the root
+NEGAMAX_KEY = 0x9B05688C2B3E6C1F
+BLACK_ROOT_KEY = 0x1F83D9ABFB41BD6B
+
+MASK_64 = (1 << 64) - 1
+
+
+# Zobrist hash of the position, optionally mixed with a salt
+def position_key(board, salt=0):
+    return chess.polyglot.zobrist_hash(board) ^ salt
+
+
+# Pack a move into 16 bits: from (6) | to (6) | promotion (3)
+def pack_move(move):
+    if move is None:
+        return 0
+    return move.from_square | (move.to_square << 6) | ((move.promotion or 0) << 12)
+
+
+def unpack_move(packed):
+    if packed == 0:
+        return None
+    return chess.Move(packed & 63, (packed >> 6) & 63, (packed >> 12) or None)
+
+
+class TranspositionTable:
+
+    def __init__(self, size_mb=TT_SIZE_MB, replacement=REPLACE_DEPTH):
+        if replacement not in (REPLACE_ALWAYS, REPLACE_DEPTH):
+            raise ValueError("Unknown replacement policy: %r" % (replacement,))
+
+        self.size_mb = size_mb
+        self.replacement = replacement
+
+        # Largest power of two number of entries that fits in the memory budget
+        entries = max(1, int(size_mb * 1024 * 1024) // ENTRY_SIZE)
+        self.size = 1 << (entries.bit_length() - 1)
+        self.mask = self.size - 1
+
+        self.keys = array('Q', bytes(8 * self.size))
+        self.scores = array('d', bytes(8 * self.size))
+        self.depths = array('b', bytes(self.size))
+        self.flags = array('B', bytes(self.size))
+        self.moves = array('H', bytes(2 * self.size))
+        self.ages = array('B', bytes(self.size))
+
+        self.age = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    # Start a new search: entries from previous searches become easier to replace
+    def new_search(self):
+        self.age = (self.age + 1) & 0xFF
+
+    def clear(self):
+        self.keys = array('Q', bytes(8 * self.size))
+        self.scores = array('d', bytes(8 * self.size))
+        self.depths = array('b', bytes(self.size))
+        self.flags = array('B', bytes(self.size))
+        self.moves = array('H', bytes(2 * self.size))
+        self.ages = array('B', bytes(self.size))
+        self.age = 0
+        self.reset_stats()
+
+    # Return (depth, score, flag, move) for the key, or None
+    def probe(self, key):
+        entry = self.probe_packed(key)
+        if entry is None:
+            return None
+        return entry[0], entry[1], entry[2], unpack_move(entry[3])
+
+    # probe() with the move as packed by pack_move (the int moves of compact_board.py)
+    def probe_packed(self, key):
+        key &= MASK_64
+        index = key & self.mask
+        flag = self.flags[index]
+
+        if flag == 0:
+            self.misses += 1
+            return None
+
+        if self.keys[index] != key:
+            # Slot taken by a different position
+            self.collisions += 1
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return self.depths[index], self.scores[index], flag, self.moves[index]
+
+    # Only the best move of the entry, without touching the hit counters
+    def best_move(self, key):
+        return unpack_move(self.best_move_packed(key))
+
+    def best_move_packed(self, key):
+        key &= MASK_64
+        index = key & self.mask
+
+        if self.flags[index] == 0 or self.keys[index] != key:
+            return 0
+
+        return self.moves[index]
+
+    # Stored best moves from the board on, at most max_length of them. The salt of the root is
+    # given and toggle is mixed in every ply (MAXIMIZING_KEY for the engines' min/max recursion,
+    # 0 for negamax); the walk stops at a missing or illegal move or a repeated position.
+    def principal_variation(self, board, salt, max_length, toggle=MAXIMIZING_KEY):
+        moves = []
+        seen = set()
+
+        while len(moves) < max_length:
+            key = position_key(board, salt)
+            if key in seen:
+                break
+            seen.add(key)
+
+            move = self.best_move(key)
+            if move is None or not board.is_legal(move):
+                break
+
+            board.push(move)
+            moves.append(move)
+            salt ^= toggle
+
+        for _ in moves:
+            board.pop()
+
+        return moves
+
+    def store(self, key, depth, score, flag, move=None):
+        self.store_packed(key, depth, score, flag, pack_move(move))
+
+    def store_packed(self, key, depth, score, flag, packed):
+        key &= MASK_64
+        index = key & self.mask
+        old_flag = self.flags[index]
+        same_position = self.keys[index] == key
+
+        if old_flag != 0 and not same_position and self.replacement == REPLACE_DEPTH:
+            if self.ages[index] == self.age and depth < self.depths[index]:
+                return
+
+        if old_flag != 0 and not same_position:
+            self.overwrites += 1
+
+        # Keep the previous best move if this result did not produce one
+        if packed == 0 and same_position:
+            packed = self.moves[index]
+
+        self.keys[index] = key
+        self.scores[index] = score
+        self.depths[index] = max(-128, min(127, depth))
+        self.flags[index] = flag
+        self.moves[index] = packed
+        self.ages[index] = self.age
+        self.stores += 1
+
+    # Number of used slots in a sample, in permille (like the UCI hashfull)
+    def hashfull(self, sample=1000):
+        sample = min(sample, self.size)
+        used = sum(1 for i in range(sample) if self.flags[i] != 0 and self.ages[i] == self.age)
+        return used * 1000 // sample
+
+    def stats(self):
+        probes = self.hits + self.misses
+        return {
+            'size_mb': self.size_mb,
+            'entries': self.size,
+            'replacement': self.replacement,
+            'hits': self.hits,
+            'misses': self.misses,
+            'collisions': self.collisions,
+            'stores': self.stores,
+            'overwrites': self.overwrites,
+            'hit_rate': self.hits / probes if probes else 0.0,
+        }
+
+
+# Table shared by find_best_move and find_best_move_2
+shared_table = TranspositionTable()
@@ -0,0 +1,351 @@
+import importlib
+import math
+import os
+import sys
+import threading
+
+import chess
+
+from endgame_tables import open_tables
+from evaluation import MATE_SCORE
+from negamax import MATE_BOUND
+from opening_book import BOOK_BEST, BOOK_WEIGHTED, open_book
+from parallel_search import ENGINES, parallel_find_best_move
+from search_context import SearchContext
+from transposition_table import TT_SIZE_MB, TranspositionTable, shared_table
+
+ENGINE_NAME = 'Basic Chess AI'
+ENGINE_AUTHOR = 'Lefteris97'
+
+DEFAULT_ENGINE = 'minimax_w_ab_2'
+MAX_HASH_MB = 1024
+MAX_THREADS = 64
+
+# Time management
+MOVE_OVERHEAD_MS = 50  # Kept back for the GUI and the last iteration overshooting the deadline
+DEFAULT_MOVES_TO_GO = 30  # Moves left to plan for when the GUI does not send movestogo
+MIN_TIME_MS = 10
+
+# "go" parameters followed by a number
+GO_NUMBERS = ('wtime', 'btime', 'winc', 'binc', 'movestogo', 'depth', 'nodes', 'movetime')
+
+
+# Time for this move from the "go" parameters; None when the search has no time limit
+def allocate_time(board, params):
+    if 'movetime' in params:
+        return max(MIN_TIME_MS, params['movetime'] - MOVE_OVERHEAD_MS)
+
+    white = board.turn == chess.WHITE
+    remaining = params.get('wtime' if white else 'btime')
+    if remaining is None:
+        return None
+
+    increment = params.get('winc' if white else 'binc', 0)
+    moves_to_go = max(1, params.get('movestogo', DEFAULT_MOVES_TO_GO))
+    budget = remaining / moves_to_go + increment * 3 / 4
+
+    return max(MIN_TIME_MS, int(min(budget, remaining - MOVE_OVERHEAD_MS)))
+
+
+# The negamax core scores a mate in n plies MATE_SCORE - n; the min/max search (search=minimax)
+# scores every mate MATE_SCORE and may return infinity
+def uci_score(score):
+    if score is None:
+        return 'cp 0'
+    if MATE_BOUND <= abs(score) < MATE_SCORE:
+        plies = MATE_SCORE - abs(score)
+        return 'mate %d' % ((plies + 1) // 2 if score > 0 else -((plies + 1) // 2))
+    if math.isinf(score) or abs(score) >= MATE_SCORE:
+        return 'cp %d' % (MATE_SCORE if score > 0 else -MATE_SCORE)
+    return 'cp %d' % int(score)
+
+
+# UCI front-end for find_best_move / find_best_move_2. The main thread reads the commands and
+# the search runs on its own thread, so "stop" and "ponderhit" act on a running search at once.
+# With Threads > 1 timed and fixed depth searches use parallel_find_best_move; "stop" cancels
+# them as well, but they report no info lines. "go infinite" / "go ponder" always use one thread.
+class UciEngine:
+
+    def __init__(self, out=sys.stdout):
+        self.out = out
+        self.output_lock = threading.Lock()
+
+        self.board = chess.Board()
+        self.tt = shared_table
+        self.engine = DEFAULT_ENGINE
+        self.threads = 1
+        self.book = None  # Polyglot book file
+        self.book_selection = BOOK_BEST
+        self.endgame_tables = None  # Directory of endgame tables
+
+        self.context = None
+        self.thread = None
+        self.release = threading.Event()  # Set when bestmove may be sent (not before stop in infinite/ponder mode)
+        self.ponder_limits = (None, None)  # (time_limit_ms, node_limit) of a ponder search, applied at ponderhit
+
+    def send(self, line):
+        with self.output_lock:
+            self.out.write(line + "\n")
+            self.out.flush()
+
+    def module(self):
+        return importlib.import_module(ENGINES[self.engine][0])
+
+    # Read commands until "quit" or the end of the input. The file descriptor is read directly:
+    # forked pool workers (Threads > 1) close sys.stdin on startup, which would wait forever for
+    # the lock held by a sys.stdin.readline() blocked on this thread.
+    def run(self, fd=0):
+        pending = b''
+        running = True
+
+        while running:
+            chunk = os.read(fd, 4096)
+            if not chunk:
+                break
+
+            pending += chunk
+            lines = pending.split(b'\n')
+            pending = lines.pop()
+            for line in lines:
+                if not self.handle(line.decode('utf-8', 'replace')):
+                    running = False
+                    break
+
+        self.stop()
+
+    # Handle one command; returns False on "quit"
+    def handle(self, line):
+        tokens = line.split()
+        if not tokens:
+            return True
+        command = tokens[0]
+
+        if command == 'uci':
+            self.send('id name %s' % ENGINE_NAME)
+            self.send('id author %s' % ENGINE_AUTHOR)
+            self.send('option name Hash type spin default %d min 1 max %d' % (TT_SIZE_MB, MAX_HASH_MB))
+            self.send('option name Threads type spin default 1 min 1 max %d' % MAX_THREADS)
+            self.send('option name Ponder type check default false')
+            self.send('option name BookFile type string default <empty>')
+            self.send('option name BookSelection type combo default %s var %s var %s' % (
+                BOOK_BEST, BOOK_BEST, BOOK_WEIGHTED))
+            self.send('option name EndgameTables type string default <empty>')
+            self.send('option name Engine type combo default %s %s' % (
+                DEFAULT_ENGINE, ' '.join('var %s' % name for name in sorted(ENGINES))))
+            self.send('uciok')
+        elif command == 'isready':
+            self.send('readyok')
+        elif command == 'setoption':
+            self.set_option(tokens[1:])
+        elif command == 'ucinewgame':
+            self.stop()
+            self.tt.clear()
+            self.board = chess.Board()
+        elif command == 'position':
+            self.stop()
+            self.set_position(tokens[1:])
+        elif command == 'go':
+            self.go(tokens[1:])
+        elif command == 'stop':
+            self.stop()
+        elif command == 'ponderhit':
+            self.ponder_hit()
+        elif command == 'quit':
+            return False
+        else:
+            self.send('info string unknown command %s' % command)
+
+        return True
+
+    def set_option(self, tokens):
+        if 'name' not in tokens:
+            return
+        start = tokens.index('name') + 1
+        end = tokens.index('value') if 'value' in tokens else len(tokens)
+        name = ' '.join(tokens[start:end]).lower()
+        value = ' '.join(tokens[end + 1:])
+
+        try:
+            if name == 'hash':
+                self.stop()
+                self.tt = TranspositionTable(max(1, min(MAX_HASH_MB, int(value))))
+            elif name == 'threads':
+                self.threads = max(1, min(MAX_THREADS, int(value)))
+            elif name == 'engine' and value in ENGINES:
+                self.engine = value
+            elif name == 'bookfile':
+                self.book = None
+                if value and value != '<empty>':
+                    open_book(value)  # A missing or malformed file fails here, not in the search
+                    self.book = value
+            elif name == 'bookselection' and value in (BOOK_BEST, BOOK_WEIGHTED):
+                self.book_selection = value
+            elif name == 'endgametables':
+                self.endgame_tables = None
+                if value and value != '<empty>':
+                    open_tables(value)  # A missing directory or a bad table name fails here
+                    self.endgame_tables = value
+            elif name != 'ponder':
+                self.send('info string unknown option %s' % name)
+        except ValueError:
+            self.send('info string invalid value %s for %s' % (value, name))
+        except OSError as error:
+            self.send('info string cannot open %s: %s' % (value, error))
+
+    # position [startpos | fen <fen>] [moves <move> ...]
+    def set_position(self, tokens):
+        moves = []
+        if 'moves' in tokens:
+            moves = tokens[tokens.index('moves') + 1:]
+            tokens = tokens[:tokens.index('moves')]
+
+        try:
+            if tokens and tokens[0] == 'fen':
+                board = chess.Board(' '.join(tokens[1:]))
+            else:
+                board = chess.Board()
+
+            for uci in moves:
+                board.push_uci(uci)
+        except ValueError as error:
+            self.send('info string invalid position: %s' % error)
+            return
+
+        self.board = board
+
+    def go(self, tokens):
+        self.stop()
+
+        params = {}
+        for i, token in enumerate(tokens):
+            if token in GO_NUMBERS and i + 1 < len(tokens):
+                try:
+                    params[token] = int(tokens[i + 1])
+                except ValueError:
+                    pass
+        infinite = 'infinite' in tokens
+        ponder = 'ponder' in tokens
+
+        depth = params.get('depth')
+        node_limit = params.get('nodes')
+        time_limit_ms = None if infinite else allocate_time(self.board, params)
+
+        context = SearchContext(tt=self.tt, book=self.book, book_selection=self.book_selection,
+                                endgame_tables=self.endgame_tables)
+        context.infinite = time_limit_ms is None and node_limit is None
+        context.on_iteration = self.send_info
+        if ponder:
+            # The budget starts at ponderhit
+            context.pondering = True
+            self.ponder_limits = (time_limit_ms, node_limit)
+        else:
+            context.time_limit_ms = time_limit_ms
+            context.node_limit = node_limit
+
+        self.release.clear()
+        if not infinite and not ponder:
+            self.release.set()
+
+        workers = self.threads
+        if infinite or ponder or (depth is None and time_limit_ms is None):
+            workers = 1
+
+        self.context = context
+        self.thread = threading.Thread(target=self.search, args=(self.board.copy(), depth, time_limit_ms, context, workers),
+                                       daemon=True)
+        self.thread.start()
+
+    # Runs on the search thread. A bestmove is always sent: when the search fails, the failure is
+    # reported as an info string and the first legal move (or 0000) is played.
+    def search(self, board, depth, time_limit_ms, context, workers):
+        module = self.module()
+
+        try:
+            if workers > 1:
+                move = parallel_find_best_move(board, depth=depth, time_limit_ms=time_limit_ms, workers=workers,
+                                               engine=self.engine,
+                                               options={'book': self.book, 'book_selection': self.book_selection,
+                                                        'endgame_tables': self.endgame_tables},
+                                               context=context)
+            else:
+                move = getattr(module, ENGINES[self.engine][1])(board, depth=depth, context=context)
+        except Exception as error:
+            self.send('info string search failed: %s: %s' % (type(error).__name__, error))
+            move = next(iter(board.legal_moves), None)
+            reply = None
+        else:
+            reply = self.ponder_move(module, board, move)
+
+        # No bestmove before stop or ponderhit while pondering or searching infinitely
+        self.release.wait()
+
+        if move is None:
+            self.send('bestmove 0000')
+        elif reply is not None:
+            self.send('bestmove %s ponder %s' % (move.uci(), reply.uci()))
+        else:
+            self.send('bestmove %s' % move.uci())
+
+    # The expected reply to move from the principal variation, or None
+    def ponder_move(self, module, board, move):
+        if move is None:
+            return None
+
+        try:
+            pv = module.principal_variation(board, tt=self.tt)
+            if len(pv) >= 2 and pv[0] == move:
+                return pv[1]
+
+            board.push(move)
+            reply = module.expected_reply(board, tt=self.tt)
+            board.pop()
+            return reply
+        except Exception as error:
+            self.send('info string no ponder move: %s: %s' % (type(error).__name__, error))
+            return None
+
+    # Called on the search thread after every completed iteration
+    def send_info(self, board, context):
+        if context.best_move is None:
+            return  # No legal moves
+
+        elapsed_ms = context.elapsed_ms()
+        pv = self.module().principal_variation(board, context.completed_depth, tt=self.tt)
+        if not pv or pv[0] != context.best_move:
+            pv = [context.best_move] if context.best_move else []
+
+        self.send('info depth %d score %s nodes %d nps %d time %d hashfull %d pv %s' % (
+            context.completed_depth, uci_score(context.best_score), context.nodes,
+            int(context.nodes * 1000 / elapsed_ms) if elapsed_ms > 0 else 0, int(elapsed_ms),
+            self.tt.hashfull(), ' '.join(move.uci() for move in pv)))
+
+    def ponder_hit(self):
+        context = self.context
+        if context is None or not context.pondering:
+            return
+
+        context.ponder_hit(*self.ponder_limits)
+        self.release.set()
+
+    # Stop the running search; it still sends its bestmove
+    def stop(self):
+        context = self.context
+        thread = self.thread
+
+        if context is not None:
+            context.stop()
+        self.release.set()
+        if thread is not None:
+            thread.join()
+
+        self.context = None
+        self.thread = None
+
+
+def main():
+    UciEngine().run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())